@@ -2,18 +2,130 @@ import os
 
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json
-from typing import Dict, List, Callable, Tuple, Union
+from typing import Any, Dict, List, Callable, Optional, Set, Tuple, Union
 
 from AU2 import BASE_WRITE_LOCATION
 from AU2.database.model import PersistentFile, Assassin
+from AU2.database.model.LazyDatabase import load_lazily
+from AU2.database.model.codec import decode_assassin, encode_assassin, join_records
+
+
+class _AssassinIndex:
+    """
+    Lookups of assassin identifiers by secret id, pseudonym, email, and city watch / hidden status.
+    Kept up to date by `AssassinsDatabase.mark_dirty`, which is called whenever an assassin changes.
+    """
+    def __init__(self, assassins: Dict[str, Assassin]):
+        self.by_secret_id: Dict[str, str] = {}
+        self.by_pseudonym: Dict[str, Set[str]] = {}
+        self.by_email: Dict[str, Set[str]] = {}
+        self.city_watch: Set[str] = set()
+        self.hidden: Set[str] = set()
+        # what each assassin is currently indexed under, so that it can be removed again
+        self.entries: Dict[str, Tuple[str, Set[str], str, bool, bool]] = {}
+        for (identifier, assassin) in assassins.items():
+            self.add(identifier, assassin)
+
+    def add(self, identifier: str, assassin: Assassin):
+        entry = (
+            assassin._secret_id,
+            {p.lower() for p in assassin.pseudonyms if p},
+            assassin.email.lower(),
+            assassin.is_city_watch,
+            assassin.hidden,
+        )
+        (secret_id, pseudonyms, email, is_city_watch, hidden) = self.entries[identifier] = entry
+        self.by_secret_id[secret_id] = identifier
+        for p in pseudonyms:
+            self.by_pseudonym.setdefault(p, set()).add(identifier)
+        self.by_email.setdefault(email, set()).add(identifier)
+        if is_city_watch:
+            self.city_watch.add(identifier)
+        if hidden:
+            self.hidden.add(identifier)
+
+    def remove(self, identifier: str):
+        if identifier not in self.entries:
+            return
+        (secret_id, pseudonyms, email, _, _) = self.entries.pop(identifier)
+        if self.by_secret_id.get(secret_id) == identifier:
+            del self.by_secret_id[secret_id]
+        for p in pseudonyms:
+            self.by_pseudonym[p].discard(identifier)
+            if not self.by_pseudonym[p]:
+                del self.by_pseudonym[p]
+        self.by_email[email].discard(identifier)
+        if not self.by_email[email]:
+            del self.by_email[email]
+        self.city_watch.discard(identifier)
+        self.hidden.discard(identifier)
 
 
 @dataclass_json
 @dataclass
 class AssassinsDatabase(PersistentFile):
     WRITE_LOCATION = os.path.join(BASE_WRITE_LOCATION, "AssassinsDatabase.json")
+    JOURNALED = True
+    RECORDS_FIELD = "assassins"
+    SQL_TABLE = "assassins"
     assassins: Dict[str, Assassin]
 
+    # an _AssassinIndex, built on first use
+    _index = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_index", None)
+        return state
+
+    def mark_dirty(self, key: Optional[str] = None):
+        super().mark_dirty(key)
+        if self._index is None:
+            return
+        if key is None:
+            self._index = None
+        else:
+            self._index.remove(key)
+            if key in self.assassins:
+                self._index.add(key, self.assassins[key])
+
+    def _get_index(self) -> _AssassinIndex:
+        if self._index is None:
+            self._index = _AssassinIndex(self.assassins)
+        return self._index
+
+    def get_by_secret_id(self, secret_id: Union[str, int]) -> Optional[Assassin]:
+        """
+        Returns the assassin with the given secret id (as used in pseudonym codes such as [P12]), if there is one.
+        """
+        identifier = self._get_index().by_secret_id.get(str(secret_id))
+        return None if identifier is None else self.assassins[identifier]
+
+    def get_by_pseudonym(self, pseudonym: str) -> List[Assassin]:
+        """
+        Returns the assassins who have the given pseudonym, ignoring case.
+        """
+        return [self.assassins[i] for i in sorted(self._get_index().by_pseudonym.get(pseudonym.lower(), ()))]
+
+    def get_by_email(self, email: str) -> List[Assassin]:
+        """
+        Returns the assassins with the given email address, ignoring case.
+        """
+        return [self.assassins[i] for i in sorted(self._get_index().by_email.get(email.lower(), ()))]
+
+    def get_city_watch_identifiers(self, include_hidden: bool = False) -> Set[str]:
+        """
+        Returns the identifiers of all city watch members (optionally including hidden ones).
+        """
+        index = self._get_index()
+        return set(index.city_watch) if include_hidden else index.city_watch - index.hidden
+
+    def get_hidden_identifiers(self) -> Set[str]:
+        """
+        Returns the identifiers of all hidden assassins.
+        """
+        return set(self._get_index().hidden)
+
     def add(self, assassin: Assassin):
         """
         Adds an assassin to the database.
@@ -105,6 +217,29 @@ class AssassinsDatabase(PersistentFile):
             )
         ])
 
+    def _dump(self) -> str:
+        return join_records("assassins", self._encode_records())
+
+    @classmethod
+    def _from_raw(cls, raw: Dict[str, Any]) -> "AssassinsDatabase":
+        return cls({identifier: decode_assassin(a) for (identifier, a) in cls._raw_records(raw).items()})
+
+    def _encode_records(self) -> Dict[str, str]:
+        return {identifier: encode_assassin(a) for (identifier, a) in self.assassins.items()}
+
+    def _encode_record(self, key: str) -> Optional[str]:
+        return encode_assassin(self.assassins[key]) if key in self.assassins else None
+
+    @classmethod
+    def _raw_records(cls, raw: Dict[str, Any]) -> Dict[str, Any]:
+        return raw.get("assassins", {})
+
+    def _apply_record(self, key: str, value: Optional[Any]):
+        if value is None:
+            self.assassins.pop(key, None)
+        else:
+            self.assassins[key] = decode_assassin(value)
+
     def _refresh(self):
         """
         Forces a refresh of the underlying database
@@ -113,7 +248,10 @@ class AssassinsDatabase(PersistentFile):
             self.assassins = {}
             return
 
-        self.assassins = self.load().assassins
+        loaded = self.load()
+        self.assassins = loaded.assassins
+        self._adopt_journal(loaded)
 
 
-ASSASSINS_DATABASE = AssassinsDatabase.load()
+# loaded on first use, so that importing AU2.database doesn't read the whole database
+ASSASSINS_DATABASE = load_lazily(AssassinsDatabase)
@@ -1,21 +1,252 @@
+import bisect
+import datetime
+import itertools
 import os
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
 
 from dataclasses_json import dataclass_json
 
 from AU2.database import BASE_WRITE_LOCATION
 from AU2.database.model import PersistentFile, Event
+from AU2.database.model.LazyDatabase import load_lazily
+from AU2.database.model.codec import decode_event, encode_event, join_records
+
+
+# (datetime, position, identifier), where events with the same datetime are ordered by their position in
+# EventsDatabase.events, as a stable sort would
+ChronologicalKey = Tuple[datetime.datetime, int, str]
+
+# (generation of the index, number of changes it had seen), see EventsDatabase.get_change_token
+ChangeToken = Tuple[int, int]
+
+# numbers each _EventIndex built, so that change tokens from an index that has since been rebuilt can be recognised
+_generations = itertools.count()
+
+
+# what an event is currently indexed under, so that it can be removed again
+_IndexEntry = NamedTuple("_IndexEntry", (
+    ("chronological", ChronologicalKey),
+    # (numerical secret id, identifier)
+    ("by_creation", Tuple[int, str]),
+    ("killers", FrozenSet[str]),
+    ("victims", FrozenSet[str]),
+    # everyone in `assassins` or `kills`, or who wrote a report
+    ("participants", FrozenSet[str]),
+))
+
+
+def _entry(identifier: str, event: Event, position: int) -> _IndexEntry:
+    killers = frozenset(killer for (killer, _) in event.kills)
+    victims = frozenset(victim for (_, victim) in event.kills)
+    return _IndexEntry(
+        (event.datetime, position, identifier),
+        (event.get_numerical_id(), identifier),
+        killers,
+        victims,
+        frozenset(event.assassins).union(killers, victims, (assassin for (assassin, _, _) in event.reports)),
+    )
+
+
+def _add_to(index: Dict[str, Set[str]], players: FrozenSet[str], identifier: str):
+    for player in players:
+        index.setdefault(player, set()).add(identifier)
+
+
+def _remove_from(index: Dict[str, Set[str]], players: FrozenSet[str], identifier: str):
+    for player in players:
+        index[player].discard(identifier)
+        if not index[player]:
+            del index[player]
+
+
+class _EventIndex:
+    """
+    The identifiers of all events, sorted by datetime and by secret id, and the events each player killed, died or
+    took part in.
+    Kept up to date by `EventsDatabase.mark_dirty`, which is called whenever an event changes.
+    """
+    def __init__(self, events: Dict[str, Event]):
+        self.entries: Dict[str, _IndexEntry] = {
+            identifier: _entry(identifier, event, position)
+            for (position, (identifier, event)) in enumerate(events.items())
+        }
+        self.chronological: List[ChronologicalKey] = sorted(e.chronological for e in self.entries.values())
+        self.by_creation: List[Tuple[int, str]] = sorted(e.by_creation for e in self.entries.values())
+        self.next_position = len(events)
+        self.generation = next(_generations)
+        # the numerical secret ids of the events added, changed or removed since the index was built, in that order
+        self.changed_ids: List[int] = []
+
+        # maps from player identifier to event identifiers
+        self.kills_by: Dict[str, Set[str]] = {}
+        self.deaths_of: Dict[str, Set[str]] = {}
+        self.involving: Dict[str, Set[str]] = {}
+        for (identifier, entry) in self.entries.items():
+            self._add_players(identifier, entry)
+
+    def _add_players(self, identifier: str, entry: _IndexEntry):
+        _add_to(self.kills_by, entry.killers, identifier)
+        _add_to(self.deaths_of, entry.victims, identifier)
+        _add_to(self.involving, entry.participants, identifier)
+
+    def add(self, identifier: str, event: Event, position: Optional[int] = None):
+        if position is None:
+            position = self.next_position
+            self.next_position += 1
+        entry = self.entries[identifier] = _entry(identifier, event, position)
+        bisect.insort(self.chronological, entry.chronological)
+        bisect.insort(self.by_creation, entry.by_creation)
+        self._add_players(identifier, entry)
+
+    def remove(self, identifier: str) -> Optional[int]:
+        """
+        Removes an event from the index, returning its position.
+        """
+        if identifier not in self.entries:
+            return None
+        entry = self.entries.pop(identifier)
+        del self.chronological[bisect.bisect_left(self.chronological, entry.chronological)]
+        del self.by_creation[bisect.bisect_left(self.by_creation, entry.by_creation)]
+        _remove_from(self.kills_by, entry.killers, identifier)
+        _remove_from(self.deaths_of, entry.victims, identifier)
+        _remove_from(self.involving, entry.participants, identifier)
+        return entry.chronological[1]
+
+    def update(self, identifier: str, event: Optional[Event]):
+        entry = self.entries.get(identifier)
+        if event is not None:
+            self.changed_ids.append(event.get_numerical_id())
+        elif entry is not None:
+            self.changed_ids.append(entry.by_creation[0])
+        if event is None:
+            self.remove(identifier)
+            return
+        if entry is not None and entry == _entry(identifier, event, entry.chronological[1]):
+            return
+        self.add(identifier, event, self.remove(identifier))
+
+    def in_order(self, identifiers: Set[str]) -> List[str]:
+        """
+        Sorts some event identifiers chronologically (in the same order as `chronological`).
+        """
+        return sorted(identifiers, key=lambda i: self.entries[i].chronological)
 
 
 @dataclass_json
 @dataclass
 class EventsDatabase(PersistentFile):
     WRITE_LOCATION = os.path.join(BASE_WRITE_LOCATION, "EventsSummary.json")
+    JOURNALED = True
+    RECORDS_FIELD = "events"
+    SQL_TABLE = "events"
 
     # map from identifier to event
     events: Dict[str, Event]
 
+    # an _EventIndex, built on first use
+    _index = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_index", None)
+        return state
+
+    def mark_dirty(self, key: Optional[str] = None):
+        super().mark_dirty(key)
+        if self._index is None:
+            return
+        if key is None:
+            self._index = None
+        else:
+            self._index.update(key, self.events.get(key))
+
+    def _get_index(self) -> _EventIndex:
+        if self._index is None:
+            self._index = _EventIndex(self.events)
+        return self._index
+
+    def iter_chronological(self,
+                           start: Optional[datetime.datetime] = None,
+                           end: Optional[datetime.datetime] = None) -> Iterator[Event]:
+        """
+        Iterates over events in the order they occurred (events with the same datetime are given in the order they
+        were added), without sorting them all.
+
+        Args:
+            start: if given, only events at or after this time are included
+            end: if given, only events at or before this time are included
+        """
+        index = self._get_index().chronological
+        lo = 0 if start is None else bisect.bisect_left(index, (start,))
+        hi = len(index) if end is None else bisect.bisect_right(index, (end, float("inf")))
+        # iterate over a copy, so that callers can edit events as they go
+        for (_, _, identifier) in index[lo:hi]:
+            yield self.events[identifier]
+
+    def iter_by_creation(self,
+                         upto: Optional[Union[int, float]] = None,
+                         after: Optional[Union[int, float]] = None) -> Iterator[Event]:
+        """
+        Iterates over events in the order they were created (i.e. by secret id).
+
+        Args:
+            upto: if given, only events whose secret id is at most this are included
+            after: if given, only events whose secret id is greater than this are included
+        """
+        index = self._get_index().by_creation
+        lo = 0 if after is None else bisect.bisect_left(index, (after + 1,))
+        hi = len(index) if upto is None else bisect.bisect_left(index, (upto + 1,))
+        for (_, identifier) in index[lo:hi]:
+            yield self.events[identifier]
+
+    def get_change_token(self) -> ChangeToken:
+        """
+        Returns a token for the events as they are now, which `earliest_change_since` can later be asked about.
+        """
+        index = self._get_index()
+        return index.generation, len(index.changed_ids)
+
+    def earliest_change_since(self, token: ChangeToken) -> Optional[float]:
+        """
+        Returns the lowest secret id (see Event.get_numerical_id) of the events added, changed or removed since `token`
+        was got, or None if there have been no changes. If the events may all have changed (e.g. they were reloaded),
+        returns -inf.
+        """
+        index = self._get_index()
+        (generation, seen) = token
+        if generation != index.generation:
+            return float("-inf")
+        return min(index.changed_ids[seen:], default=None)
+
+    def get_kills_by(self, assassin: str) -> List[Event]:
+        """
+        Returns the events in which an assassin (given by identifier) killed someone, in chronological order.
+        """
+        index = self._get_index()
+        return [self.events[i] for i in index.in_order(index.kills_by.get(assassin, set()))]
+
+    def get_deaths_of(self, assassin: str) -> List[Event]:
+        """
+        Returns the events in which an assassin (given by identifier) was killed, in chronological order.
+        """
+        index = self._get_index()
+        return [self.events[i] for i in index.in_order(index.deaths_of.get(assassin, set()))]
+
+    def get_events_involving(self, assassin: str) -> List[Event]:
+        """
+        Returns the events an assassin (given by identifier) took part in, killed or died in, or wrote a report for,
+        in chronological order.
+        """
+        index = self._get_index()
+        return [self.events[i] for i in index.in_order(index.involving.get(assassin, set()))]
+
+    def get_victims(self) -> Set[str]:
+        """
+        Returns the identifiers of every assassin who has been killed in some event.
+        """
+        return set(self._get_index().deaths_of)
+
     def add(self, event: Event):
         """
         Adds an event to the database
@@ -28,6 +259,29 @@ class EventsDatabase(PersistentFile):
         """
         return self.events.get(identifier, None)
 
+    def _dump(self) -> str:
+        return join_records("events", self._encode_records())
+
+    @classmethod
+    def _from_raw(cls, raw: Dict[str, Any]) -> "EventsDatabase":
+        return cls({identifier: decode_event(e) for (identifier, e) in cls._raw_records(raw).items()})
+
+    def _encode_records(self) -> Dict[str, str]:
+        return {identifier: encode_event(e) for (identifier, e) in self.events.items()}
+
+    def _encode_record(self, key: str) -> Optional[str]:
+        return encode_event(self.events[key]) if key in self.events else None
+
+    @classmethod
+    def _raw_records(cls, raw: Dict[str, Any]) -> Dict[str, Any]:
+        return raw.get("events", {})
+
+    def _apply_record(self, key: str, value: Optional[Any]):
+        if value is None:
+            self.events.pop(key, None)
+        else:
+            self.events[key] = decode_event(value)
+
     def _refresh(self):
         """
         Forces a refresh of the underlying database
@@ -36,6 +290,9 @@ class EventsDatabase(PersistentFile):
             self.events = {}
             return
 
-        self.events = self.load().events
+        loaded = self.load()
+        self.events = loaded.events
+        self._adopt_journal(loaded)
 
-EVENTS_DATABASE = EventsDatabase.load()
+# loaded on first use, so that importing AU2.database doesn't read the whole database
+EVENTS_DATABASE = load_lazily(EventsDatabase)
@@ -1,10 +1,12 @@
+import json
 import os
-from dataclasses import dataclass, field
-from typing import Dict, Any
+from dataclasses import dataclass, field, fields
+from typing import Dict, Any, Optional
 
 from dataclasses_json import dataclass_json
 
 from AU2.database import BASE_WRITE_LOCATION
+from AU2.database.model.LazyDatabase import load_lazily
 from AU2.database.model.PersistentFile import PersistentFile
 
 
@@ -26,6 +28,8 @@ class GenericStateDatabase(PersistentFile):
     arb_int_state: Dict[str, int] = field(default_factory=dict)
 
     WRITE_LOCATION = os.path.join(BASE_WRITE_LOCATION, "GenericState.json")
+    JOURNALED = True
+    SQL_TABLE = "generic_state"
 
     def __post_init__(self):
         if not isinstance(self.uniqueId, int):
@@ -41,6 +45,18 @@ class GenericStateDatabase(PersistentFile):
         self.uniqueId += 1
         return str(t)
 
+    # each top-level field is journaled as its own record
+    def _encode_records(self) -> Dict[str, str]:
+        return {k: json.dumps(v) for (k, v) in self.to_dict(encode_json=False).items()}
+
+    @classmethod
+    def _raw_records(cls, raw: Dict[str, Any]) -> Dict[str, Any]:
+        return raw
+
+    def _apply_record(self, key: str, value: Optional[Any]):
+        if key in (f.name for f in fields(self)) and value is not None:
+            setattr(self, key, value)
+
     def _refresh(self):
         """
         Forces a refresh of underlying state
@@ -55,6 +71,8 @@ class GenericStateDatabase(PersistentFile):
         self.plugin_map = loaded.plugin_map
         self.arb_state = loaded.arb_state
         self.arb_int_state = loaded.arb_int_state
+        self._adopt_journal(loaded)
 
 
-GENERIC_STATE_DATABASE = GenericStateDatabase.load()
+# loaded on first use, so that importing AU2.database doesn't read the whole database
+GENERIC_STATE_DATABASE = load_lazily(GenericStateDatabase)
@@ -1,18 +1,70 @@
 import os
+from typing import Dict
 
 from AU2 import BASE_WRITE_LOCATION
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.EventsDatabase import EVENTS_DATABASE
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
+from AU2.database.model.atomic_files import group_commit
+from AU2.database.model.sqlite_storage import SQLITE_STORAGE
 
 if not os.path.exists(BASE_WRITE_LOCATION):
     os.makedirs(BASE_WRITE_LOCATION, exist_ok=True)
 
 
-def save_all_databases():
-    ASSASSINS_DATABASE.save()
-    EVENTS_DATABASE.save()
-    GENERIC_STATE_DATABASE.save()
+def save_all_databases() -> Dict[str, float]:
+    """
+    Saves all the databases together. Each file is written atomically, and the files being rewritten are only
+    replaced once all of them have been written, but this isn't all-or-nothing: journaled changes are appended
+    straight away, and a crash while the files are being replaced can leave some of them replaced.
+
+    Returns:
+        how long (in seconds) writing each file took, plus the "total" time taken.
+    """
+    with group_commit() as timings:
+        ASSASSINS_DATABASE.save()
+        EVENTS_DATABASE.save()
+        GENERIC_STATE_DATABASE.save()
+    return timings
+
+
+def compact_all_databases():
+    """
+    Folds the journals into the database files themselves.
+    Call this before copying or uploading the .json files in BASE_WRITE_LOCATION,
+    since the journals are not copied along with them.
+    """
+    with group_commit():
+        ASSASSINS_DATABASE.compact()
+        EVENTS_DATABASE.compact()
+        GENERIC_STATE_DATABASE.compact()
+
+
+def discard_journals():
+    """
+    Deletes the journals of all databases.
+    Call this after replacing the .json files in BASE_WRITE_LOCATION (e.g. when restoring a backup) and before
+    refreshing the databases, so that changes made since the last compaction aren't replayed onto the new files.
+    """
+    ASSASSINS_DATABASE.discard_journal()
+    EVENTS_DATABASE.discard_journal()
+    GENERIC_STATE_DATABASE.discard_journal()
+
+
+def set_sqlite_storage(enabled: bool):
+    """
+    Switches between storing the databases in .json files and in SQLite, migrating their contents.
+    The .json files are kept up to date either way, as they are what gets backed up and uploaded.
+    """
+    if enabled == SQLITE_STORAGE.active():
+        return
+    compact_all_databases()
+    if enabled:
+        SQLITE_STORAGE.create({
+            db.SQL_TABLE: db._encode_records() for db in (ASSASSINS_DATABASE, EVENTS_DATABASE, GENERIC_STATE_DATABASE)
+        })
+    else:
+        SQLITE_STORAGE.delete()
 
 
 # if __name__ == "__main__":
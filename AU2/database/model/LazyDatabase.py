@@ -0,0 +1,97 @@
+import os
+import threading
+from dataclasses import fields
+from typing import Type, TypeVar
+
+from AU2.database.model.PersistentFile import PersistentFile
+
+D = TypeVar("D", bound=PersistentFile)
+
+_lock = threading.RLock()
+
+
+class LazyDatabase:
+    """
+    Mixed into a database class to make a stand-in for its singleton (e.g. EVENTS_DATABASE) that loads it from disk
+    the first time one of its fields is used, rather than when its module is imported. See `load_lazily`.
+
+    A database that hasn't been loaded can't have changed, so saving it does nothing. Its methods and class-level
+    constants (e.g. WRITE_LOCATION, discard_journal) are inherited as usual, and only load it if they use its fields.
+    """
+    # the database class this stands in for
+    _database_class: Type[PersistentFile]
+
+    def __getattr__(self, name):
+        # only called for names that aren't set yet, i.e. the fields of the database
+        if name.startswith("__"):
+            raise AttributeError(name)
+        _load(self)
+        return getattr(self, name)
+
+    def __setattr__(self, name, value):
+        _load(self)
+        setattr(self, name, value)
+
+    def __delattr__(self, name):
+        _load(self)
+        delattr(self, name)
+
+    def __eq__(self, other):
+        # (the dataclass's __eq__ only compares databases of exactly the same class)
+        _load(self)
+        return self == other
+
+    def __reduce_ex__(self, protocol):
+        # pickle as the database itself (e.g. in coredumps)
+        _load(self)
+        return self.__reduce_ex__(protocol)
+
+    def save(self):
+        pass
+
+    def compact(self):
+        # the file is only out of date if the database changed since it was last compacted
+        if self.uses_sqlite() or os.path.exists(self.journal_location()):
+            _load(self)
+            self.compact()
+
+    def _refresh(self):
+        if not self.TEST_MODE:
+            # loading is all that refreshing would do
+            _load(self)
+            return
+        # tests start from an empty database, so there's no need to read the real one first
+        with _lock:
+            if isinstance(self, LazyDatabase):
+                _become(self, self._database_class({}))
+        self._refresh()
+
+
+def load_lazily(cls: Type[D]) -> D:
+    """
+    Returns a database of class `cls` that is only loaded from disk when first used.
+    Until then it is an instance of a subclass of `cls`; loading turns it into an ordinary instance of `cls`.
+    """
+    lazy_class = type(cls.__name__, (LazyDatabase, cls), {"_database_class": cls, "__module__": cls.__module__})
+    return object.__new__(lazy_class)
+
+
+def is_loaded(database: PersistentFile) -> bool:
+    return not isinstance(database, LazyDatabase)
+
+
+def _load(database: LazyDatabase):
+    with _lock:
+        if isinstance(database, LazyDatabase):
+            _become(database, database._database_class.load())
+
+
+def _become(database: LazyDatabase, loaded: PersistentFile):
+    """
+    Turns a database that hasn't been loaded into a copy of `loaded`.
+    """
+    object.__setattr__(database, "__class__", type(loaded))
+    for f in fields(loaded):
+        # (assigned rather than copied, so that changes are reported to `database` rather than `loaded`)
+        setattr(database, f.name, getattr(loaded, f.name))
+    database._adopt_journal(loaded)
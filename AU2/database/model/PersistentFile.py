@@ -1,31 +1,322 @@
+import hashlib
+import json
 import os
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from dataclasses_json import dataclass_json
 
+from AU2.database.model.atomic_files import after_commit, append_durably, write_atomically
+from AU2.database.model.change_tracking import RecordDict, track
+from AU2.database.model.sqlite_storage import SQLITE_STORAGE
+
+
+def _snapshot_hash(dump: str) -> str:
+    return hashlib.sha1(dump.encode("utf-8")).hexdigest()
+
 
 @dataclass_json
 class PersistentFile:
     WRITE_LOCATION = ""
     TEST_MODE = False
 
+    # Databases that set JOURNALED append changed records to a journal file next to WRITE_LOCATION on `save`,
+    # instead of rewriting the whole file. Once the journal grows past JOURNAL_COMPACTION_THRESHOLD records the next
+    # save folds it back into the snapshot at WRITE_LOCATION.
+    JOURNALED = False
+    JOURNAL_SUFFIX = ".journal"
+    JOURNAL_COMPACTION_THRESHOLD = 1000
+    # for journaled databases that hold their records in a single dict (e.g. EventsDatabase.events),
+    # the name of that field; otherwise each field is treated as a record
+    RECORDS_FIELD: Optional[str] = None
+    # journaled databases that set SQL_TABLE are stored in that table of SQLITE_STORAGE instead, if it is enabled.
+    # The .json file is then only written by `compact`, as an export for backups and uploads.
+    SQL_TABLE: Optional[str] = None
+
+    # for records, called whenever they are modified (set by the database holding them)
+    _on_change: Optional[Callable[[], None]] = None
+    # for databases, whether every record should be assumed to have changed since the last save
+    _all_dirty = False
+
     def __hash__(self):
         return hash(self.get_id())
 
+    def __getstate__(self):
+        # don't drag the owning database along when pickling a record
+        state = dict(self.__dict__)
+        state.pop("_on_change", None)
+        return state
+
+    def __setattr__(self, name, value):
+        if name not in self.__dataclass_fields__:
+            object.__setattr__(self, name, value)
+            return
+        # swap dicts and lists for tracked equivalents so that in-place edits are noticed too
+        if not self.JOURNALED:
+            value = track(value, self._changed)
+        elif name == self.RECORDS_FIELD:
+            value = RecordDict(value, self.mark_dirty)
+        else:
+            value = track(value, partial(self.mark_dirty, name))
+        object.__setattr__(self, name, value)
+
+        if not self.JOURNALED:
+            self._changed()
+        elif name == self.RECORDS_FIELD:
+            self.mark_dirty()
+        else:
+            self.mark_dirty(name)
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+    def mark_dirty(self, key: Optional[str] = None):
+        """
+        Records that this database needs saving.
+        Changes made through the database's fields and the records in them are picked up automatically, so this only
+        needs to be called after modifying something that isn't a dict, list or dataclass field.
+
+        Args:
+            key: the record that changed, if known. If None, every record is assumed to have changed.
+        """
+        if key is None:
+            self._all_dirty = True
+        else:
+            self.__dict__.setdefault("_dirty_keys", set()).add(key)
+
+    def is_dirty(self) -> bool:
+        """
+        Returns whether this database has changed since it was last loaded or saved.
+        """
+        return self._all_dirty or bool(self.__dict__.get("_dirty_keys"))
+
+    def _clear_dirty(self):
+        self._all_dirty = False
+        self.__dict__.pop("_dirty_keys", None)
+
     @classmethod
     def toggle_test_mode(cls, test_mode: bool):
         cls.TEST_MODE = test_mode
 
+    @classmethod
+    def uses_sqlite(cls) -> bool:
+        return cls.SQL_TABLE is not None and SQLITE_STORAGE.active()
+
+    @classmethod
+    def journal_location(cls) -> str:
+        return cls.WRITE_LOCATION + cls.JOURNAL_SUFFIX
+
+    def _dump(self) -> str:
+        """
+        Returns the JSON of this whole file. Subclasses may override this (along with `_from_raw`) with something
+        faster than dataclasses_json, as long as it produces exactly the same output as `to_json`.
+        """
+        return self.to_json()
+
+    @classmethod
+    def _from_raw(cls, raw: Dict[str, Any]) -> "PersistentFile":
+        """
+        Builds this file from its parsed JSON.
+        """
+        return cls.from_dict(raw)
+
+    def _encode_records(self) -> Dict[str, str]:
+        """
+        Returns the JSON encoding of each independently journaled record of this file, keyed by a string that is
+        unique within the file. Journaled subclasses must override this, `_raw_records` and `_apply_record`.
+        """
+        raise NotImplementedError
+
+    def _encode_record(self, key: str) -> Optional[str]:
+        """
+        Returns the JSON encoding of a single record, or None if it doesn't exist.
+        Subclasses with many records should override this with something that doesn't encode all of them.
+        """
+        return self._encode_records().get(key)
+
+    @classmethod
+    def _raw_records(cls, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Splits a decoded snapshot into records, keyed in the same way as `_encode_records`.
+        """
+        raise NotImplementedError
+
+    def _apply_record(self, key: str, value: Optional[Any]):
+        """
+        Replays a single journal record onto this object. `value` is the decoded JSON of the record, or None if the
+        record was deleted.
+        """
+        raise NotImplementedError
+
     def save(self):
         # don't save while doing tests
         if self.TEST_MODE:
             return
-        dump = self.to_json()
-        with open(self.WRITE_LOCATION, "w+") as F:
-            F.write(dump)
+        if self.uses_sqlite():
+            self._save_to_sqlite()
+            return
+        if not self.JOURNALED:
+            write_atomically(self.WRITE_LOCATION, self.to_json())
+            return
+
+        cache: Optional[Dict[str, str]] = getattr(self, "_journal_cache", None)
+        if cache is None:
+            # we don't know what's on disk, so write everything
+            self.compact()
+            return
+        if not self.is_dirty():
+            return
+        if self._journal_length >= self.JOURNAL_COMPACTION_THRESHOLD:
+            self.compact()
+            return
+
+        if self._all_dirty:
+            records = self._encode_records()
+            records.update((key, None) for key in cache if key not in records)
+        else:
+            records = {key: self._encode_record(key) for key in sorted(self._dirty_keys)}
+        self._clear_dirty()
+
+        lines = []
+        for (key, dump) in records.items():
+            if dump is None and key in cache:
+                lines.append(json.dumps({"delete": key}))
+                del cache[key]
+            elif dump is not None and cache.get(key) != dump:
+                lines.append(f'{{"put": {json.dumps(key)}, "value": {dump}}}')
+                cache[key] = dump
+        if not lines:
+            return
+
+        self._journal_length += len(lines)
+        if not os.path.exists(self.journal_location()):
+            lines.insert(0, json.dumps({"snapshot": self._journal_snapshot}))
+        append_durably(self.journal_location(), "\n".join(lines) + "\n")
+
+    def _save_to_sqlite(self):
+        if not self.is_dirty():
+            return
+        if self._all_dirty:
+            SQLITE_STORAGE.replace_all(self.SQL_TABLE, self._encode_records())
+        else:
+            SQLITE_STORAGE.write(self.SQL_TABLE, {key: self._encode_record(key) for key in sorted(self._dirty_keys)})
+        self._clear_dirty()
+
+    def compact(self):
+        """
+        Rewrites the whole file and clears its journal.
+        For databases stored in SQLite, this brings the .json file up to date with the database.
+        """
+        if self.TEST_MODE:
+            return
+        if self.uses_sqlite():
+            self._save_to_sqlite()
+        dump = self._dump()
+        write_atomically(self.WRITE_LOCATION, dump)
+        if not self.JOURNALED:
+            return
+        # the old journal is only redundant once the new file has replaced the old one
+        after_commit(self._remove_journal)
+        self._journal_snapshot = _snapshot_hash(dump)
+        self._journal_cache = self._encode_records()
+        self._journal_length = 0
+        self._clear_dirty()
+
+    @classmethod
+    def discard_journal(cls):
+        """
+        Deletes the journal. Call this whenever the file at WRITE_LOCATION is replaced by something other than
+        `save`, otherwise the journal may be replayed on top of the replacement.
+        If the database is stored in SQLite, this instead replaces its contents with those of the file.
+        """
+        if cls.TEST_MODE or not cls.JOURNALED:
+            return
+        if cls.uses_sqlite():
+            records = {}
+            if os.path.exists(cls.WRITE_LOCATION):
+                with open(cls.WRITE_LOCATION, "r") as F:
+                    raw = json.loads(F.read())
+                records = {key: json.dumps(value) for (key, value) in cls._raw_records(raw).items()}
+            SQLITE_STORAGE.replace_all(cls.SQL_TABLE, records)
+            return
+        cls._remove_journal()
+
+    @classmethod
+    def _remove_journal(cls):
+        if os.path.exists(cls.journal_location()):
+            os.remove(cls.journal_location())
+
+    @classmethod
+    def _read_journal(cls, snapshot: str) -> Tuple[List[dict], bool]:
+        """
+        Returns the records in the journal, in the order they were written, and whether the journal was intact.
+        A journal that was started against a different snapshot is stale and gets deleted,
+        and reading stops at the first damaged record (e.g. one half-written when AU2 crashed mid-save).
+        """
+        if not os.path.exists(cls.journal_location()):
+            return [], True
+        with open(cls.journal_location(), "r") as F:
+            lines = F.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        if header.get("snapshot") != snapshot:
+            cls.discard_journal()
+            return [], True
+
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                return records, False
+        return records, True
+
+    def _adopt_journal(self, other: "PersistentFile"):
+        """
+        Takes over the journal bookkeeping of a freshly loaded copy of this file (used when refreshing).
+        """
+        self._journal_snapshot = getattr(other, "_journal_snapshot", None)
+        self._journal_cache = getattr(other, "_journal_cache", None)
+        self._journal_length = getattr(other, "_journal_length", 0)
+        self._clear_dirty()
 
     @classmethod
     def load(cls):
+        if cls.uses_sqlite():
+            loaded = cls({})
+            for (key, value) in SQLITE_STORAGE.read(cls.SQL_TABLE).items():
+                loaded._apply_record(key, json.loads(value))
+            loaded._clear_dirty()
+            return loaded
+
+        dump = None
         if os.path.exists(cls.WRITE_LOCATION):
             with open(cls.WRITE_LOCATION, "r") as F:
                 dump = F.read()
-            return cls.from_json(dump)
-        return cls({})
+        if not cls.JOURNALED:
+            return cls.from_json(dump) if dump is not None else cls({})
+        if dump is None:
+            cls.discard_journal()
+            return cls({})
+
+        raw = json.loads(dump)
+        loaded = cls._from_raw(raw)
+        cache = {key: json.dumps(value) for key, value in cls._raw_records(raw).items()}
+        snapshot = _snapshot_hash(dump)
+        records, intact = cls._read_journal(snapshot)
+        for record in records:
+            if "put" in record:
+                loaded._apply_record(record["put"], record["value"])
+                cache[record["put"]] = json.dumps(record["value"])
+            else:
+                loaded._apply_record(record["delete"], None)
+                cache.pop(record["delete"], None)
+        loaded._journal_snapshot = snapshot
+        # appending after a damaged record would hide everything written after it, so rewrite the snapshot instead
+        loaded._journal_cache = cache if intact else None
+        loaded._journal_length = len(records)
+        loaded._clear_dirty()
+        return loaded
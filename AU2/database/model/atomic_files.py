@@ -0,0 +1,149 @@
+import contextlib
+import datetime
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from AU2 import BASE_WRITE_LOCATION
+
+# Database files are never written in place: the new contents go to a temporary file next to the original, which is
+# flushed to disk and then renamed over it. Renaming is atomic, so a crash or power cut mid-save leaves either the old
+# file or the new one, never a truncated mix.
+#
+# Inside `group_commit()`, renames are held back until the end, so that none of the files are replaced if writing any
+# of them fails. The renames themselves happen one after another, so a crash part way through them can still leave
+# some files replaced and others not; each file on its own is always either old or new. Appends made with
+# `append_durably` (e.g. to database journals) aren't held back at all.
+
+TMP_SUFFIX = ".tmp"
+
+# groups of writes taking longer than this (in seconds) are logged to SLOW_WRITE_LOG
+SLOW_COMMIT_SECONDS = 1.0
+SLOW_WRITE_LOG = os.path.join(BASE_WRITE_LOCATION, "slow_writes.log")
+
+
+class _GroupCommit:
+    def __init__(self):
+        self.renames: List[Tuple[str, str]] = []
+        self.after: List[Callable[[], None]] = []
+        self.timings: Dict[str, float] = {}
+
+
+_group: Optional[_GroupCommit] = None
+
+# how long (in seconds) each file took to write during the last group commit, plus the "total"
+LAST_COMMIT_TIMINGS: Dict[str, float] = {}
+
+
+def _fsync_directory(directory: str):
+    # directories can't be opened on Windows, and renames are durable there anyway
+    if os.name == "nt":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _record(path: str, start: float):
+    if _group is not None:
+        name = os.path.basename(path)
+        _group.timings[name] = _group.timings.get(name, 0) + time.perf_counter() - start
+
+
+def write_atomically(path: str, text: str):
+    """
+    Replaces the contents of `path` with `text`, such that the file is never left partially written.
+    """
+    start = time.perf_counter()
+    tmp_path = path + TMP_SUFFIX
+    try:
+        with open(tmp_path, "w") as F:
+            F.write(text)
+            F.flush()
+            os.fsync(F.fileno())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if _group is not None:
+        _group.renames.append((tmp_path, path))
+    else:
+        os.replace(tmp_path, path)
+        _fsync_directory(os.path.dirname(path))
+    _record(path, start)
+
+
+def append_durably(path: str, text: str):
+    """
+    Appends `text` to `path` and waits for it to reach the disk.
+    (A crash can still leave the last line half-written, so readers must be able to ignore one.)
+    """
+    start = time.perf_counter()
+    with open(path, "a") as F:
+        F.write(text)
+        F.flush()
+        os.fsync(F.fileno())
+    _record(path, start)
+
+
+def after_commit(f: Callable[[], None]):
+    """
+    Calls `f` once the current group commit has replaced its files, or immediately if there isn't one.
+    Use this for clean-up that is only safe once the new files are in place (e.g. deleting a journal).
+    """
+    if _group is not None:
+        _group.after.append(f)
+    else:
+        f()
+
+
+@contextlib.contextmanager
+def group_commit() -> Iterator[Dict[str, float]]:
+    """
+    Holds back the renames of `write_atomically` until the end of the block, then does them one after another.
+    If the block raises, none of those files are replaced. This doesn't make the files replaced together atomic as a
+    group (see the top of this file), and `append_durably` still writes immediately.
+    Yields a dict that is filled in with how long (in seconds) each file took to write, plus the "total" time.
+    Nested uses join the outermost group.
+    """
+    global _group
+    if _group is not None:
+        yield _group.timings
+        return
+
+    group = _group = _GroupCommit()
+    start = time.perf_counter()
+    try:
+        yield group.timings
+    except BaseException:
+        for (tmp_path, _) in group.renames:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    finally:
+        _group = None
+
+    for (tmp_path, path) in group.renames:
+        os.replace(tmp_path, path)
+    for directory in {os.path.dirname(path) for (_, path) in group.renames}:
+        _fsync_directory(directory)
+    for f in group.after:
+        f()
+
+    group.timings["total"] = time.perf_counter() - start
+    LAST_COMMIT_TIMINGS.clear()
+    LAST_COMMIT_TIMINGS.update(group.timings)
+    if group.timings["total"] > SLOW_COMMIT_SECONDS:
+        _log_slow_commit(group.timings)
+
+
+def _log_slow_commit(timings: Dict[str, float]):
+    details = ", ".join(f"{name} {seconds:.3f}s" for (name, seconds) in timings.items() if name != "total")
+    try:
+        with open(SLOW_WRITE_LOG, "a") as F:
+            F.write(f"{datetime.datetime.now().isoformat()} saving took {timings['total']:.3f}s ({details})\n")
+    except OSError:
+        # the log is only diagnostic
+        pass
@@ -0,0 +1,187 @@
+from typing import Any, Callable
+
+# Containers stored on a PersistentFile are swapped for these subclasses so that in-place edits
+# (e.g. `e.pluginState.setdefault("X", {})["y"] = z`) tell the owning database that it needs saving.
+# They copy/pickle as plain dicts and lists.
+#
+# Storing a dict or list in one (or in a PersistentFile field) stores a tracked copy of it, not the object itself:
+# after `t["a"] = inner`, further edits have to be made through `t["a"]` (or the value returned by `setdefault`), as
+# edits to `inner` won't show up in `t`. Python's builtin dicts and lists can't be made to report changes in place.
+
+
+def track(value: Any, on_change: Callable[[], None]) -> Any:
+    """
+    Returns `value` with every dict and list in it replaced by a tracked equivalent that calls `on_change` when it is
+    mutated. Containers that are already tracked for the same callback are returned as-is; other values are returned
+    unchanged.
+    Dicts and lists are copied, so callers that keep editing the value should use the one returned.
+    """
+    if isinstance(value, (TrackedDict, TrackedList)) and value._on_change == on_change:
+        return value
+    if isinstance(value, dict):
+        return TrackedDict(value, on_change)
+    if isinstance(value, list):
+        return TrackedList(value, on_change)
+    return value
+
+
+class TrackedDict(dict):
+    def __init__(self, data=(), on_change: Callable[[], None] = lambda: None):
+        self._on_change = on_change
+        super().__init__((k, track(v, on_change)) for (k, v) in dict(data).items())
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, track(value, self._on_change))
+        self._on_change()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._on_change()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for (k, v) in dict(*args, **kwargs).items():
+            super().__setitem__(k, track(v, self._on_change))
+        self._on_change()
+
+    def pop(self, *args):
+        had_key = args[0] in self
+        value = super().pop(*args)
+        if had_key:
+            self._on_change()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_change()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._on_change()
+
+
+class TrackedList(list):
+    def __init__(self, data=(), on_change: Callable[[], None] = lambda: None):
+        self._on_change = on_change
+        super().__init__(track(v, on_change) for v in data)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [track(v, self._on_change) for v in value]
+        else:
+            value = track(value, self._on_change)
+        super().__setitem__(index, value)
+        self._on_change()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._on_change()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._on_change()
+        return self
+
+    def append(self, value):
+        super().append(track(value, self._on_change))
+        self._on_change()
+
+    def extend(self, values):
+        super().extend(track(v, self._on_change) for v in values)
+        self._on_change()
+
+    def insert(self, index, value):
+        super().insert(index, track(value, self._on_change))
+        self._on_change()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._on_change()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self._on_change()
+
+    def clear(self):
+        super().clear()
+        self._on_change()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._on_change()
+
+    def reverse(self):
+        super().reverse()
+        self._on_change()
+
+
+class RecordDict(TrackedDict):
+    """
+    The top-level map of a database from identifier to record (Event or Assassin).
+    Changes to a record, or to which records are present, are reported against that record's key so that only the
+    records that changed need to be saved.
+    """
+    def __init__(self, data=(), on_change: Callable[..., None] = lambda key=None: None):
+        dict.__init__(self)
+        self._on_change = on_change
+        for (k, v) in dict(data).items():
+            self._attach(k, v)
+
+    def _attach(self, key, record):
+        if key in self:
+            self[key]._on_change = None
+        record._on_change = lambda: self._on_change(key)
+        dict.__setitem__(self, key, record)
+
+    def __setitem__(self, key, record):
+        self._attach(key, record)
+        self._on_change(key)
+
+    def __delitem__(self, key):
+        self[key]._on_change = None
+        dict.__delitem__(self, key)
+        self._on_change(key)
+
+    def update(self, *args, **kwargs):
+        for (k, v) in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def pop(self, key, *args):
+        if key not in self:
+            return dict.pop(self, key, *args)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        (key, value) = dict.popitem(self)
+        value._on_change = None
+        self._on_change(key)
+        return key, value
+
+    def clear(self):
+        for record in self.values():
+            record._on_change = None
+        dict.clear(self)
+        self._on_change()
@@ -0,0 +1,104 @@
+import datetime as dt
+import json
+from collections.abc import Collection, Mapping
+from dataclasses import fields
+from typing import Any, Callable, Dict, Tuple, Type, TypeVar
+
+from AU2.database.model.Assassin import Assassin
+from AU2.database.model.Event import Event
+from AU2.database.model.PersistentFile import PersistentFile
+from AU2.plugins.util.date_utils import dt_to_timestamp, timestamp_to_dt
+
+# Hand-written equivalents of `to_json` and `from_dict` for the records that make up the bulk of the databases.
+# dataclasses_json works out how to encode and decode each field from its type annotations every time it is called,
+# which dominates loading and saving big databases. The encoders here produce exactly the same JSON as `to_json`,
+# and the decoders produce the same objects as `from_dict`.
+
+R = TypeVar("R", bound=PersistentFile)
+
+# field name -> (encoder, decoder)
+FieldTable = Tuple[Tuple[str, Callable[[Any], Any], Callable[[Any], Any]], ...]
+
+
+def _identity(x: Any) -> Any:
+    return x
+
+
+def _tuples(xs: list) -> list:
+    return [tuple(x) for x in xs]
+
+
+def _encode_pseudonym_datetimes(d: Dict[int, dt.datetime]) -> Dict[int, float]:
+    return {k: dt_to_timestamp(ts) for (k, ts) in d.items()}
+
+
+def _decode_pseudonym_datetimes(d: Dict[str, float]) -> Dict[int, dt.datetime]:
+    return {int(k): timestamp_to_dt(ts) for (k, ts) in d.items()}
+
+
+def _default(o: Any) -> Any:
+    # the same fallbacks as dataclasses_json's encoder, for anything unusual that plugins store in their state
+    if isinstance(o, Mapping):
+        return dict(o)
+    if isinstance(o, Collection):
+        return list(o)
+    if isinstance(o, dt.datetime):
+        return o.timestamp()
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+def _field_table(cls: Type[PersistentFile], special: Dict[str, Tuple[Callable, Callable]]) -> FieldTable:
+    names = [f.name for f in fields(cls)]
+    assert set(special) <= set(names), f"{cls.__name__} has no fields {set(special) - set(names)}"
+    return tuple((name, *special.get(name, (_identity, _identity))) for name in names)
+
+
+EVENT_FIELDS = _field_table(Event, {
+    "datetime": (dt_to_timestamp, timestamp_to_dt),
+    "reports": (_identity, _tuples),
+    "kills": (_identity, _tuples),
+})
+
+ASSASSIN_FIELDS = _field_table(Assassin, {
+    "pseudonym_datetimes": (_encode_pseudonym_datetimes, _decode_pseudonym_datetimes),
+})
+
+
+def encode(record: PersistentFile, table: FieldTable) -> str:
+    """
+    Encodes a record to the same JSON as `record.to_json()`.
+    """
+    return json.dumps({name: encoder(getattr(record, name)) for (name, encoder, _) in table}, default=_default)
+
+
+def decode(cls: Type[R], raw: Dict[str, Any], table: FieldTable) -> R:
+    """
+    Decodes a record from its parsed JSON, as `cls.from_dict(raw)` would.
+    Fields missing from `raw` take their default values.
+    """
+    return cls(**{name: decoder(raw[name]) for (name, _, decoder) in table if name in raw})
+
+
+def encode_event(event: Event) -> str:
+    return encode(event, EVENT_FIELDS)
+
+
+def decode_event(raw: Dict[str, Any]) -> Event:
+    return decode(Event, raw, EVENT_FIELDS)
+
+
+def encode_assassin(assassin: Assassin) -> str:
+    return encode(assassin, ASSASSIN_FIELDS)
+
+
+def decode_assassin(raw: Dict[str, Any]) -> Assassin:
+    return decode(Assassin, raw, ASSASSIN_FIELDS)
+
+
+def join_records(field: str, records: Dict[str, str]) -> str:
+    """
+    Assembles the JSON of a database whose only field is a map from identifier to record, from the JSON of each
+    record. This is the same as the database's `to_json()`.
+    """
+    body = ", ".join(f"{json.dumps(identifier)}: {dump}" for (identifier, dump) in records.items())
+    return f"{{{json.dumps(field)}: {{{body}}}}}"
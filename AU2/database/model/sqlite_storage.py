@@ -0,0 +1,246 @@
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from AU2 import BASE_WRITE_LOCATION
+
+# An alternative to storing each database as a .json file (with a journal), enabled by the presence of the SQLite file.
+# Every record is stored as its JSON in a `value` column, which is what databases are loaded from, and written in a
+# single transaction, so a crash mid-save can't leave a half-written database behind.
+# The other columns and tables are derived from the JSON when it is written, so that they can be queried without
+# loading anything (e.g. all the events in which someone died).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generic_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assassins (
+    identifier TEXT PRIMARY KEY,
+    secret_id TEXT NOT NULL,
+    real_name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    is_city_watch INTEGER NOT NULL,
+    hidden INTEGER NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assassins_secret_id ON assassins (secret_id);
+
+CREATE TABLE IF NOT EXISTS events (
+    identifier TEXT PRIMARY KEY,
+    secret_id TEXT NOT NULL,
+    datetime REAL NOT NULL,
+    headline TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_secret_id ON events (secret_id);
+CREATE INDEX IF NOT EXISTS events_datetime ON events (datetime);
+
+CREATE TABLE IF NOT EXISTS kills (
+    event TEXT NOT NULL,
+    killer TEXT NOT NULL,
+    victim TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS kills_event ON kills (event);
+CREATE INDEX IF NOT EXISTS kills_killer ON kills (killer);
+CREATE INDEX IF NOT EXISTS kills_victim ON kills (victim);
+
+CREATE TABLE IF NOT EXISTS reports (
+    event TEXT NOT NULL,
+    assassin TEXT NOT NULL,
+    pseudonym INTEGER,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_event ON reports (event);
+CREATE INDEX IF NOT EXISTS reports_assassin ON reports (assassin);
+
+-- the pluginState of events and plugin_state of assassins, one row per plugin
+CREATE TABLE IF NOT EXISTS plugin_state (
+    owner_table TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    plugin TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (owner_table, owner, plugin)
+);
+"""
+
+# for each table holding records: the column holding the record's identifier, and where the rows derived from a
+# record are kept (as `<table> WHERE <column referring back to the record>`)
+TABLES: Dict[str, Tuple[str, List[str]]] = {
+    "generic_state": ("key", []),
+    "assassins": ("identifier", ["plugin_state WHERE owner_table = 'assassins' AND owner"]),
+    "events": ("identifier", [
+        "kills WHERE event",
+        "reports WHERE event",
+        "plugin_state WHERE owner_table = 'events' AND owner"
+    ]),
+}
+
+# SQL statement, rows
+Rows = List[Tuple[str, Iterable[tuple]]]
+
+# records are updated in place rather than deleted and re-inserted, so that reading them back in rowid order gives the
+# order they were first added in (as with a dict)
+def _upsert(table: str, key: str, columns: List[str]) -> str:
+    placeholders = ", ".join("?" * (len(columns) + 1))
+    update = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    return f"INSERT INTO {table} VALUES ({placeholders}) ON CONFLICT ({key}) DO UPDATE SET {update}"
+
+
+def _generic_state_rows(key: str, dump: str, raw: Any) -> Rows:
+    return [(_upsert("generic_state", "key", ["value"]), [(key, dump)])]
+
+
+def _plugin_state_rows(owner_table: str, owner: str, state: Dict[str, Any]) -> Rows:
+    return [(
+        "INSERT INTO plugin_state VALUES (?, ?, ?, ?)",
+        [(owner_table, owner, plugin, json.dumps(value)) for (plugin, value) in state.items()]
+    )]
+
+
+def _assassin_rows(key: str, dump: str, raw: Dict[str, Any]) -> Rows:
+    return [(
+        _upsert("assassins", "identifier", ["secret_id", "real_name", "email", "is_city_watch", "hidden", "value"]),
+        [(key, raw["_secret_id"], raw["real_name"], raw["email"], raw["is_city_watch"], raw.get("hidden", False),
+          dump)]
+    )] + _plugin_state_rows("assassins", key, raw.get("plugin_state", {}))
+
+
+def _event_rows(key: str, dump: str, raw: Dict[str, Any]) -> Rows:
+    return [
+        (
+            _upsert("events", "identifier", ["secret_id", "datetime", "headline", "value"]),
+            [(key, raw["_Event__secret_id"], raw["datetime"], raw["headline"], dump)]
+        ),
+        ("INSERT INTO kills VALUES (?, ?, ?)", [(key, killer, victim) for (killer, victim) in raw["kills"]]),
+        (
+            "INSERT INTO reports VALUES (?, ?, ?, ?)",
+            [(key, assassin, pseudonym, report) for (assassin, pseudonym, report) in raw["reports"]]
+        ),
+    ] + _plugin_state_rows("events", key, raw.get("pluginState", {}))
+
+
+ROW_BUILDERS: Dict[str, Callable[[str, str, Any], Rows]] = {
+    "generic_state": _generic_state_rows,
+    "assassins": _assassin_rows,
+    "events": _event_rows,
+}
+
+
+class SqliteStorage:
+    """
+    Stores the records of databases (as produced by `PersistentFile._encode_records`) in a SQLite file.
+    """
+
+    def __init__(self, location: str):
+        self.location = location
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def active(self) -> bool:
+        """
+        Returns whether databases are stored here rather than in .json files.
+        """
+        return os.path.exists(self.location)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.location)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def read(self, table: str) -> Dict[str, str]:
+        """
+        Returns the JSON of every record in a table, keyed by identifier.
+        """
+        (key, _) = TABLES[table]
+        return dict(self._connect().execute(f"SELECT {key}, value FROM {table} ORDER BY rowid"))
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, table: str, records: Dict[str, Optional[str]]):
+        (key, children) = TABLES[table]
+        for (identifier, dump) in records.items():
+            for child in children:
+                connection.execute(f"DELETE FROM {child} = ?", (identifier,))
+            if dump is None:
+                connection.execute(f"DELETE FROM {table} WHERE {key} = ?", (identifier,))
+                continue
+            for (statement, rows) in ROW_BUILDERS[table](identifier, dump, json.loads(dump)):
+                connection.executemany(statement, rows)
+
+    @staticmethod
+    def _clear(connection: sqlite3.Connection, table: str):
+        (key, children) = TABLES[table]
+        for child in children:
+            connection.execute(f"DELETE FROM {child} IN (SELECT {key} FROM {table})")
+        connection.execute(f"DELETE FROM {table}")
+
+    def write(self, table: str, records: Dict[str, Optional[str]]):
+        """
+        Writes the given records to a table in one transaction. Records whose JSON is None are deleted.
+        """
+        with self._connect() as connection:
+            self._write(connection, table, records)
+
+    def replace_all(self, table: str, records: Dict[str, str]):
+        """
+        Replaces the whole contents of a table in one transaction.
+        """
+        with self._connect() as connection:
+            self._clear(connection, table)
+            self._write(connection, table, records)
+
+    def create(self, tables: Dict[str, Dict[str, str]]):
+        """
+        Creates the SQLite file from the records of each table, which enables it.
+        The file is built elsewhere and then moved into place, so that a crash part way through leaves the .json
+        files in use.
+        """
+        self.close()
+        tmp_location = self.location + ".tmp"
+        if os.path.exists(tmp_location):
+            os.remove(tmp_location)
+        connection = sqlite3.connect(tmp_location)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                for (table, records) in tables.items():
+                    self._write(connection, table, records)
+        finally:
+            connection.close()
+        os.replace(tmp_location, self.location)
+
+    def delete(self):
+        """
+        Deletes the SQLite file, which disables it.
+        """
+        self.close()
+        if os.path.exists(self.location):
+            os.remove(self.location)
+
+    def query(self, sql: str, parameters: Iterable[Any] = ()) -> List[tuple]:
+        """
+        Runs a read-only query against the tables in SCHEMA. Only call this if `active()`; changes to the databases
+        aren't visible here until they have been saved.
+        """
+        return self._connect().execute(sql, tuple(parameters)).fetchall()
+
+    def deaths_of(self, victim: str) -> List[str]:
+        """
+        Returns the identifiers of the events in which an assassin (given by identifier) was killed, in chronological
+        order.
+        """
+        return [identifier for (identifier,) in self.query(
+            "SELECT DISTINCT events.identifier FROM kills JOIN events ON kills.event = events.identifier "
+            "WHERE kills.victim = ? ORDER BY events.datetime",
+            (victim,)
+        )]
+
+
+SQLITE_STORAGE = SqliteStorage(os.path.join(BASE_WRITE_LOCATION, "AU2.sqlite3"))
@@ -16,6 +16,7 @@ from inquirer.errors import ValidationError, EndOfInput
 from AU2 import TIMEZONE
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database import save_all_databases
+from AU2.database.model.atomic_files import SLOW_COMMIT_SECONDS, SLOW_WRITE_LOG
 from AU2.html_components import HTMLComponent
 from AU2.html_components.DependentComponents.AssassinDependentTransferEntry import AssassinDependentTransferEntry
 from AU2.html_components.DependentComponents.KillDependentSelector import KillDependentSelector
@@ -1028,7 +1029,9 @@ def main():
                 render(component)
 
             print("Saving databases...")
-            save_all_databases()
+            timings = save_all_databases()
+            if timings.get("total", 0) > SLOW_COMMIT_SECONDS:
+                print(f"Saving took {timings['total']:.1f}s, which suggests a slow disk (logged to {SLOW_WRITE_LOG}).")
 
 from readchar import key
 def key_addons(f):
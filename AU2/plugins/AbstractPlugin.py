@@ -3,6 +3,7 @@ from typing import Any, Callable, List, NamedTuple, Tuple, Type, TypeVar, Union
 from AU2.database.model import Assassin, Event
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
 from AU2.html_components import HTMLComponent
+from AU2.plugins.util.replay import Replay
 
 T = TypeVar("T")
 
@@ -175,6 +176,20 @@ class AbstractPlugin:
     def on_page_request_generate(self) -> List[HTMLComponent]:
         return []
 
+    def on_page_replay(self, html_response: dict, replay: Replay):
+        """
+        Called by the answer function of `Generate Pages` before any `on_page_generate`, for plugins to register the
+        managers their pages need (e.g. using `register_renderer` for news pages).
+        All registered managers are then given every event in a single pass, and calls to `replayed` (or
+        `render_all_events` with a `replay_key`) made during `on_page_generate` fetch them rather than replaying events
+        again.
+
+        Args:
+            html_response (dict): as in `on_page_generate`
+            replay (Replay): the replay shared by all plugins
+        """
+        pass
+
     def on_page_generate(self, html_response: dict, navbar_entries: List[NavbarEntry]) -> List[HTMLComponent]:
         """
         Called by the answer function of `Generate Pages`
@@ -5,11 +5,13 @@ from collections import defaultdict
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from AU2 import BASE_WRITE_LOCATION
+from AU2.database import discard_journals, set_sqlite_storage
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.EventsDatabase import EVENTS_DATABASE
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
 from AU2.database.model import Assassin, Event
 from AU2.database.model.database_utils import refresh_databases
+from AU2.database.model.sqlite_storage import SQLITE_STORAGE
 from AU2.html_components import HTMLComponent
 from AU2.html_components.SimpleComponents.Table import Table
 from AU2.html_components.SpecialComponents.EditablePseudonymList import EditablePseudonymList, PseudonymData
@@ -41,6 +43,8 @@ from AU2.plugins.util.game import get_allow_html, get_game_end, get_game_start,
     set_game_end, set_game_start
 from AU2.plugins.util.date_utils import get_now_dt
 from AU2.plugins.util.render_utils import generate_navbar
+from AU2.plugins.util.checkpoints import CHECKPOINTS
+from AU2.plugins.util.replay import shared_replay
 
 AVAILABLE_PLUGINS = {}
 
@@ -287,6 +291,12 @@ class CorePlugin(AbstractPlugin):
                 self.ask_set_html_allowed,
                 self.answer_set_html_allowed
             ),
+            ConfigExport(
+                "core_plugin_set_sqlite_storage",
+                "CorePlugin -> Database storage",
+                self.ask_set_sqlite_storage,
+                self.answer_set_sqlite_storage
+            ),
             ConfigExport(
                 "core_plugin_suppress_exports",
                 "CorePlugin -> Hide menu options",
@@ -889,8 +899,14 @@ class CorePlugin(AbstractPlugin):
 
         if actually_generate_pages:  # useful for unit testing
             navbar_entries = []
-            for p in PLUGINS:
-                components += p.on_page_generate(html_response_args, navbar_entries)
+            # replay the events once for every plugin, rather than once per plugin,
+            # and only from the last snapshot taken before the earliest change to the events
+            with shared_replay(None if EVENTS_DATABASE.TEST_MODE else CHECKPOINTS) as replay:
+                for p in PLUGINS:
+                    p.on_page_replay(html_response_args, replay)
+                replay.run()
+                for p in PLUGINS:
+                    components += p.on_page_generate(html_response_args, navbar_entries)
 
             generate_navbar(navbar_entries, "page-list.html")
             components += [Label("[CORE] Successfully generated page list!")]
@@ -994,6 +1010,7 @@ class CorePlugin(AbstractPlugin):
         for f in os.listdir(BASE_WRITE_LOCATION):
             if f.endswith(".json"):
                 os.remove(os.path.join(BASE_WRITE_LOCATION, f))
+        discard_journals()
         refresh_databases()
         return [Label("[CORE] Databases successfully reset.")]
 
@@ -1046,6 +1063,19 @@ class CorePlugin(AbstractPlugin):
         set_allow_html(allow)
         return [Label(f"[CORE] {'A' if allow else 'Disa'}llowing HTML in pseudonyms / reports.")]
 
+    def ask_set_sqlite_storage(self) -> List[HTMLComponent]:
+        return [
+            Label("By default the databases are stored as .json files. "
+                  "Storing them in SQLite instead means a crash while saving can't corrupt them. "
+                  "The .json files are still updated before backups and uploads."),
+            Checkbox(self.identifier + "_sqlite_storage", "Store the databases in SQLite?", SQLITE_STORAGE.active())
+        ]
+
+    def answer_set_sqlite_storage(self, html_response) -> List[HTMLComponent]:
+        enabled = html_response[self.identifier + "_sqlite_storage"]
+        set_sqlite_storage(enabled)
+        return [Label(f"[CORE] Storing the databases in {'SQLite' if enabled else '.json files'}.")]
+
     def gather_game_types(self) -> List[str]:
         return list(GAME_TYPE_PLUGIN_MAP)
 
@@ -9,9 +9,12 @@ from AU2.plugins.AbstractPlugin import AbstractPlugin, NavbarEntry
 from AU2.plugins.CorePlugin import registered_plugin
 from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
 from AU2.plugins.util.date_utils import get_now_dt
-from AU2.plugins.util.render_utils import Chapter, render_all_events
+from AU2.plugins.util.render_utils import Chapter, register_renderer, render_all_events
+from AU2.plugins.util.replay import Replay
 
 BOUNTY_NEWS_NAVBAR_ENTRY = NavbarEntry("bounty-news.html", "Bounties", -1)
+# the chapter here doesn't actually do anything but we need *something* as a key
+BOUNTY_CHAPTER = Chapter("Bounties", BOUNTY_NEWS_NAVBAR_ENTRY)
 
 BOUNTIES_PAGE_TEMPLATE: str
 with open(ROOT_DIR / "plugins" / "custom_plugins" / "html_templates" / "bounty-news.html",
@@ -56,13 +59,18 @@ class BountyNewsPlugin(AbstractPlugin):
         e.pluginState.setdefault(self.identifier, {})["bounty"] = is_bounty
         return [Label("[BOUNTY NEWS] Success")]
 
+    def page_allocator(self, e: Event):
+        # note: this will include hidden events,
+        # to allow bounties to be set to appear only on the bounties page and not main news
+        return BOUNTY_CHAPTER if e.pluginState.get(self.identifier, {}).get("bounty", False) else None
+
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        register_renderer(replay, BOUNTY_NEWS_NAVBAR_ENTRY.url, page_allocator=self.page_allocator)
+
     def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
-        # the chapter here doesn't actually do anything but we need *something* as a key
-        BOUNTY_CHAPTER = Chapter("Bounties", BOUNTY_NEWS_NAVBAR_ENTRY)
         _, bounty_chapters = render_all_events(
-            # note: this will include hidden events,
-            # to allow bounties to be set to appear only on the bounties page and not main news
-            page_allocator=lambda e: BOUNTY_CHAPTER if e.pluginState.get(self.identifier, {}).get("bounty", False) else None
+            page_allocator=self.page_allocator,
+            replay_key=BOUNTY_NEWS_NAVBAR_ENTRY.url
         )
         bounty_content = "".join(bounty_chapters.get(BOUNTY_CHAPTER, ()))
         if bounty_content:
@@ -19,9 +19,9 @@ from AU2.plugins.CorePlugin import registered_plugin
 from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
 from AU2.plugins.util.CityWatchRankManager import DEFAULT_RANKS, CityWatchRankManager, DEFAULT_CITY_WATCH_RANK, AUTO_RANK_DEFAULT, \
     MANUAL_RANK_DEFAULT, CITY_WATCH_KILLS_RANKUP_DEFAULT
-from AU2.plugins.util.DeathManager import DeathManager
 from AU2.plugins.util.date_utils import get_now_dt
 from AU2.plugins.util.render_utils import event_datetime_link
+from AU2.plugins.util.replay import Replay, current_replay
 
 CITY_WATCH_TABLE_TEMPLATE = """
 <p xmlns="">
@@ -121,10 +121,8 @@ class CityWatchPlugin(AbstractPlugin):
         ]
 
     def gather_dead_full_players(self) -> List[str]:
-        death_manager = DeathManager()
-        for e in EVENTS_DATABASE.events.values():
-            death_manager.add_event(e)
-        return ASSASSINS_DATABASE.get_identifiers(include=(lambda a: death_manager.is_dead(a) and not a.is_city_watch))
+        dead = EVENTS_DATABASE.get_victims()
+        return ASSASSINS_DATABASE.get_identifiers(include=(lambda a: a.identifier in dead and not a.is_city_watch))
 
     def ask_resurrect_as_city_watch(self, ident: str):
         components = [HiddenTextbox(identifier=self.html_ids["Assassin"], default=ident),
@@ -277,16 +275,23 @@ class CityWatchPlugin(AbstractPlugin):
             e.pluginState.setdefault(self.identifier, {})[player_id] = relative_rank
         return [Label("[CITY WATCH] Success!")]
 
+    def register_rank_manager(self, replay: Replay) -> CityWatchRankManager:
+        auto_ranking = self.gsdb_get("Auto Rank")
+        city_watch_kill_ranking = self.gsdb_get("City Watch Kills Rankup")
+        return replay.register(
+            ("CityWatchRankManager", auto_ranking, city_watch_kill_ranking),
+            lambda: CityWatchRankManager(auto_ranking=auto_ranking, city_watch_kill_ranking=city_watch_kill_ranking),
+            checkpoint=True
+        )
+
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        self.register_rank_manager(replay)
+
     def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
         message = []
-        events = list(EVENTS_DATABASE.events.values())
-        events.sort(key=lambda event: event.datetime)
-
-        city_watch_rank_manager = CityWatchRankManager(auto_ranking=self.gsdb_get("Auto Rank"), city_watch_kill_ranking=self.gsdb_get("City Watch Kills Rankup"))
-        death_manager = DeathManager()
-        for e in events:
-            city_watch_rank_manager.add_event(e)
-            death_manager.add_event(e)
+        replay = current_replay()
+        city_watch_rank_manager = self.register_rank_manager(replay)
+        replay.run()
 
         message += city_watch_rank_manager.generate_new_ranks_if_necessary()
 
@@ -298,7 +303,7 @@ class CityWatchPlugin(AbstractPlugin):
             city_watch.sort(key=lambda a: (-int(city_watch_rank_manager.get_relative_rank(a.identifier)), a.real_name))
             rows = []
             for a in city_watch:
-                deaths = [event_datetime_link(e) for e in death_manager.get_death_events(a)]
+                deaths = [event_datetime_link(e) for e in EVENTS_DATABASE.get_deaths_of(a.identifier)]
                 rows.append(
                     CITY_WATCH_TABLE_ROW_TEMPLATE.format(
                         RANK=city_watch_rank_manager.get_rank_name(a.identifier),
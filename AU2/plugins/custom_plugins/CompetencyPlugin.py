@@ -2,7 +2,7 @@ import dataclasses
 import datetime
 import enum
 import os
-from typing import Any, Dict, List, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from AU2 import ROOT_DIR
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
@@ -31,6 +31,7 @@ from AU2.plugins.util.CompetencyManager import ID_GAME_START, ID_DEFAULT_EXTN, D
 from AU2.plugins.util.DeathManager import DeathManager
 from AU2.plugins.util.date_utils import get_now_dt, DATETIME_FORMAT
 from AU2.plugins.util.game import get_game_start, get_game_end
+from AU2.plugins.util.replay import Manager, Replay, current_replay
 
 INCOS_TABLE_TEMPLATE = """
 <p xmlns="">
@@ -101,14 +102,15 @@ class PlayerInfo:
     competency_deadline: datetime.datetime
 
 
-def get_active_players(death_manager: DeathManager) -> Set[str]:
+def get_active_players(*managers: Manager) -> Set[str]:
     """
-    Collects all players not currently at risk of a gigabolt
+    Collects all players not currently at risk of a gigabolt, giving every event to `managers` along the way
     """
     active_players = []
 
-    for e in sorted(list(EVENTS_DATABASE.events.values()), key=lambda event: event.datetime):
-        death_manager.add_event(e)
+    for e in EVENTS_DATABASE.iter_chronological():
+        for manager in managers:
+            manager.add_event(e)
         for killer, _ in e.kills:
             active_players.append(killer)
         for player_id in e.pluginState.get("CompetencyPlugin", {}).get("attempts", []):
@@ -116,28 +118,24 @@ def get_active_players(death_manager: DeathManager) -> Set[str]:
     return set(active_players)
 
 
-def get_player_infos(from_date=get_now_dt()) -> Dict[str, PlayerInfo]:
+def get_player_infos(from_date: Optional[datetime.datetime] = None) -> Dict[str, PlayerInfo]:
     """
-    Returns a list of calculated player informations (see struct above)
+    Returns a list of calculated player informations (see struct above), as of `from_date` (default now)
     """
-    events = list(EVENTS_DATABASE.events.values())
-    events.sort(key=lambda event: event.datetime)
+    from_date = from_date or get_now_dt()
     start_datetime: datetime.datetime = get_game_start()
 
     competency_manager = CompetencyManager(start_datetime)
     death_manager = DeathManager()
 
-    # populates the death manager
-    active_players = get_active_players(death_manager)
-
-    for e in events:
-        competency_manager.add_event(e)
+    # populates both managers in the same pass
+    active_players = get_active_players(death_manager, competency_manager)
 
     infos = {}
     for a in ASSASSINS_DATABASE.get_filtered(include_hidden=lambda _: True):
         status = PlayerStatus.COMPETENT
         is_gigainco = a.identifier not in active_players
-        is_inco = competency_manager.is_inco_at(a, from_date)
+        is_inco = competency_manager.was_inco_at(a, from_date)
         is_dead = death_manager.is_dead(a)
 
         # Ordering of the below is important - don't reorder!
@@ -377,20 +375,18 @@ class CompetencyPlugin(AbstractPlugin):
 
     def on_hook_respond(self, hook: str, htmlResponse, data) -> List[HTMLComponent]:
         if hook == "SRCFPlugin_email":
-            events = list(EVENTS_DATABASE.events.values())
-            events.sort(key=lambda event: event.datetime)
+            events = list(EVENTS_DATABASE.iter_chronological())
 
             competency_manager = CompetencyManager(get_game_start())
-            death_manager = DeathManager()
             for e in events:
                 competency_manager.add_event(e)
-                death_manager.add_event(e)
 
+            dead = EVENTS_DATABASE.get_victims()
             now = get_now_dt()
             email_list: List[Email] = data
             for email in email_list:
                 recipient = email.recipient
-                if recipient.is_city_watch or death_manager.is_dead(recipient):
+                if recipient.is_city_watch or recipient.identifier in dead:
                     continue
                 if competency_manager.is_inco_at(recipient, now):
                     content = "It would seem you've become incompetent. You might wish to change that.\nIn order to " \
@@ -572,28 +568,32 @@ class CompetencyPlugin(AbstractPlugin):
                     "Comment" + " "*10)
         return [Table(deadlines, headings=headings)]
 
-    def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
-        events = list(EVENTS_DATABASE.events.values())
-        events.sort(key=lambda event: event.datetime)
+    def register_managers(self, htmlResponse, replay: Replay) -> Tuple[CompetencyManager, DeathManager]:
         start_datetime: datetime.datetime = get_game_start()
+        limit = htmlResponse[self.html_ids["Datetime"]]
+        return (
+            # shared with the news pages; its timeline is queried at `limit`
+            replay.register(("CompetencyManager", start_datetime), lambda: CompetencyManager(start_datetime),
+                            checkpoint=True),
+            replay.register("DeathManager", DeathManager, until=limit, checkpoint=True),
+        )
 
-        competency_manager = CompetencyManager(start_datetime)
-        death_manager = DeathManager()
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        self.register_managers(htmlResponse, replay)
+
+    def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
+        replay = current_replay()
+        competency_manager, death_manager = self.register_managers(htmlResponse, replay)
+        replay.run()
         limit = htmlResponse[self.html_ids["Datetime"]]
-        for e in events:
-            if e.datetime > limit:
-                break
-            competency_manager.add_event(e)
-            death_manager.add_event(e)
 
         # dead incos != incos who are currently dead,
         # but rather players who died while inco.
         # note that `dead_incos` includes hidden assassins,
         # otherwise a player would disappear from the list of corpses when resurrected as part of the city watch
-        dead_incos = competency_manager.inco_corpses
-        alive_incos: List[Assassin] = [i for i in competency_manager.get_incos_at(limit)
+        dead_incos = competency_manager.get_inco_corpses_as_of(limit)
+        alive_incos: List[Assassin] = [i for i in competency_manager.get_incos_as_of(limit)
                                        if not i.hidden
-                                       and competency_manager.is_inco_at(i, limit)
                                        and not death_manager.is_dead(i)]
 
         tables = []
@@ -1,16 +1,49 @@
+import json
 import os
-import shutil
-from typing import List
+from typing import Any, Dict, List
 
 from AU2 import BASE_WRITE_LOCATION
+from AU2.database import compact_all_databases, discard_journals
 from AU2.database.model.database_utils import refresh_databases
 from AU2.html_components import HTMLComponent
 from AU2.html_components.SimpleComponents.DefaultNamedSmallTextbox import DefaultNamedSmallTextbox
 from AU2.html_components.SimpleComponents.InputWithDropDown import InputWithDropDown
+from AU2.html_components.SimpleComponents.IntegerEntry import IntegerEntry
 from AU2.html_components.SimpleComponents.Label import Label
-from AU2.plugins.AbstractPlugin import AbstractPlugin, Export
+from AU2.plugins.AbstractPlugin import AbstractPlugin, ConfigExport, Export
 from AU2.plugins.CorePlugin import registered_plugin
+from AU2.plugins.util.BackupStore import BackupStore
 from AU2.plugins.util.date_utils import get_now_dt
+from AU2.plugins.util.local_config import get_local_setting, set_local_setting
+
+
+def _records(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flattens a database file into its records, e.g. {"events/<identifier>": ...}
+    """
+    records = {}
+    for (field, value) in raw.items():
+        if isinstance(value, dict):
+            for (key, record) in value.items():
+                records[f"{field}/{key}"] = record
+        else:
+            records[field] = value
+    return records
+
+
+def describe_changes(old: bytes, new: bytes) -> str:
+    """
+    Summarises how many records of a database file were added, removed or changed between two versions of it.
+    """
+    try:
+        old_records = _records(json.loads(old))
+        new_records = _records(json.loads(new))
+    except (ValueError, AttributeError):
+        return "changed"
+    added = len(set(new_records) - set(old_records))
+    removed = len(set(old_records) - set(new_records))
+    changed = sum(1 for k in set(old_records) & set(new_records) if old_records[k] != new_records[k])
+    return f"{added} records added, {removed} removed, {changed} changed"
 
 
 @registered_plugin
@@ -23,8 +56,13 @@ class LocalBackupPlugin(AbstractPlugin):
     def __init__(self):
         super().__init__("LocalBackupPlugin")
 
+        self.store = BackupStore(self.BACKUP_LOCATION)
+
         self.html_ids = {
-            "Backup Name": self.identifier + "_backup_name"
+            "Backup Name": self.identifier + "_backup_name",
+            "Old Backup": self.identifier + "_old_backup",
+            "New Backup": self.identifier + "_new_backup",
+            "Retention": self.identifier + "_retention",
         }
 
         self.exports = [
@@ -39,9 +77,31 @@ class LocalBackupPlugin(AbstractPlugin):
                 display_name="Backup -> Restore Backup",
                 ask=self.ask_restore_backup,
                 answer=self.answer_restore_backup
-            )
+            ),
+            Export(
+                identifier="local_backup_compare_backups",
+                display_name="Backup -> Compare Backups",
+                ask=self.ask_compare_backups,
+                answer=self.answer_compare_backups
+            ),
+        ]
+
+        self.config_exports = [
+            ConfigExport(
+                identifier="local_backup_set_retention",
+                display_name="Backup -> Set Retention",
+                ask=self.ask_set_retention,
+                answer=self.answer_set_retention
+            ),
         ]
 
+    def get_retention(self) -> int:
+        """
+        Returns the number of backups to keep, where 0 keeps them all.
+        This is kept in the local config rather than the databases, since the backups it applies to are local too.
+        """
+        return get_local_setting(self.identifier + "_retention", 0)
+
     def ask_backup(self) -> List[HTMLComponent]:
         now = get_now_dt()
         folder_name = now.strftime("backup_%d-%m-%Y_%H-%M-%S")
@@ -54,15 +114,24 @@ class LocalBackupPlugin(AbstractPlugin):
         ]
 
     def answer_backup(self, htmlResponse) -> List[HTMLComponent]:
-        backup_path = os.path.join(self.BACKUP_LOCATION, htmlResponse[self.html_ids["Backup Name"]])
-        os.mkdir(backup_path)
-        for f in os.listdir(BASE_WRITE_LOCATION):
-            if f.endswith(".json"):
-                shutil.copy(os.path.join(BASE_WRITE_LOCATION, f), os.path.join(backup_path, f))
-        return [Label("[BACKUP] Success!")]
+        compact_all_databases()
+        files = [f for f in os.listdir(BASE_WRITE_LOCATION) if f.endswith(".json")]
+        try:
+            self.store.create(htmlResponse[self.html_ids["Backup Name"]], BASE_WRITE_LOCATION, files)
+        except (ValueError, FileExistsError) as e:
+            return [Label(f"[BACKUP] {e}")]
+        response = [Label("[BACKUP] Success!")]
+        response += self.apply_retention()
+        return response
+
+    def apply_retention(self) -> List[HTMLComponent]:
+        keep = self.get_retention()
+        if keep <= 0:
+            return []
+        return [Label(f"[BACKUP] Deleted old backup {name}") for name in self.store.prune(keep)]
 
     def ask_restore_backup(self) -> List[HTMLComponent]:
-        backups = os.listdir(self.BACKUP_LOCATION)
+        backups = self.store.list_backups()
         return [
             InputWithDropDown(
                 identifier=self.html_ids["Backup Name"],
@@ -75,12 +144,54 @@ class LocalBackupPlugin(AbstractPlugin):
         chosen_backup = htmlResponse[self.html_ids["Backup Name"]]
         if chosen_backup == "Exit":
             return [Label("[BACKUP] Aborted.")]
+        restored = set(self.store.files(chosen_backup))
         for f in os.listdir(BASE_WRITE_LOCATION):
-            if f.endswith(".json"):
+            if f.endswith(".json") and f not in restored:
                 os.remove(os.path.join(BASE_WRITE_LOCATION, f))
-        backup_path = os.path.join(self.BACKUP_LOCATION, chosen_backup)
-        for f in os.listdir(backup_path):
-            shutil.copy(os.path.join(backup_path, f), os.path.join(BASE_WRITE_LOCATION, f))
+        self.store.restore(chosen_backup, BASE_WRITE_LOCATION)
 
+        discard_journals()
         refresh_databases()
         return [Label(f"[BACKUP] Restored {chosen_backup}")]
+
+    def ask_compare_backups(self) -> List[HTMLComponent]:
+        backups = self.store.list_backups()
+        return [
+            InputWithDropDown(
+                identifier=self.html_ids["Old Backup"],
+                title="Choose the older backup",
+                options=backups,
+                selected=backups[1] if len(backups) > 1 else ""
+            ),
+            InputWithDropDown(
+                identifier=self.html_ids["New Backup"],
+                title="Choose the newer backup",
+                options=backups,
+                selected=backups[0] if backups else ""
+            ),
+        ]
+
+    def answer_compare_backups(self, htmlResponse) -> List[HTMLComponent]:
+        old = htmlResponse[self.html_ids["Old Backup"]]
+        new = htmlResponse[self.html_ids["New Backup"]]
+        diff = self.store.diff(old, new)
+        response = [Label(f"[BACKUP] Added {f}") for f in diff.added]
+        response += [Label(f"[BACKUP] Removed {f}") for f in diff.removed]
+        response += [
+            Label(f"[BACKUP] Changed {f}: {describe_changes(self.store.read(old, f), self.store.read(new, f))}")
+            for f in diff.changed
+        ]
+        return response or [Label(f"[BACKUP] {old} and {new} are identical.")]
+
+    def ask_set_retention(self) -> List[HTMLComponent]:
+        return [
+            IntegerEntry(
+                identifier=self.html_ids["Retention"],
+                title="Number of backups to keep (older ones are deleted after each backup; 0 keeps them all)",
+                default=self.get_retention()
+            )
+        ]
+
+    def answer_set_retention(self, htmlResponse) -> List[HTMLComponent]:
+        set_local_setting(self.identifier + "_retention", htmlResponse[self.html_ids["Retention"]])
+        return [Label("[BACKUP] Success!")] + self.apply_retention()
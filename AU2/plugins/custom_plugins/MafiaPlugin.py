@@ -151,8 +151,7 @@ class MafiaPlugin(AbstractPlugin):
 
     def get_current_quote(self) -> Optional[str]:
         default = "No quote defined."
-        events = list(EVENTS_DATABASE.events.values())
-        events.sort(key=lambda e: e.datetime)
+        events = list(EVENTS_DATABASE.iter_chronological())
         for e in events:
             if e.headline.startswith(f"[{self.identifier}] QUOTE: "):
                 default = e.headline.replace(f"[{self.identifier}] QUOTE: ", "")
@@ -170,8 +169,7 @@ class MafiaPlugin(AbstractPlugin):
         ]
 
     def answer_set_quote(self, htmlResponse: Dict) -> List[HTMLComponent]:
-        events = list(EVENTS_DATABASE.events.values())
-        events.sort(key=lambda e: e.datetime)
+        events = list(EVENTS_DATABASE.iter_chronological())
         quote = htmlResponse[self.html_ids["Quote"]]
         quote_event = None
         response = [Label("[MAFIA] Success!")]
@@ -350,8 +348,7 @@ class MafiaPlugin(AbstractPlugin):
         return [Label("[MAFIA] Preparing...")]
 
     def answer_generate_the_story(self, _) -> List[HTMLComponent]:
-        events = list(EVENTS_DATABASE.events.values())
-        events.sort(key=lambda e: e.datetime)
+        events = list(EVENTS_DATABASE.iter_chronological())
         events_for_chapter = {}
         start_date: datetime.datetime = get_game_start()
 
@@ -424,7 +421,7 @@ class MafiaPlugin(AbstractPlugin):
         """
         Takes in a list of events and calculates the points each player has and the earned bounties
         """
-        events = list(EVENTS_DATABASE.events.values())
+        events = list(EVENTS_DATABASE.iter_chronological())
 
         points: Dict[str, float] = {}
         permanent_points: Dict[str, float] = {}
@@ -441,8 +438,6 @@ class MafiaPlugin(AbstractPlugin):
             earned_bounties[a] = []
             open_bounties[a] = []
 
-        events.sort(key=lambda e: e.datetime)
-
         current_capos = []
         activity: Set[str] = set()
         wanted: Dict[str, datetime] = {}
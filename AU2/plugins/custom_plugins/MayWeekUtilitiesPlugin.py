@@ -1,7 +1,7 @@
+import bisect
 from collections import defaultdict
 import dataclasses
-import functools
-from typing import DefaultDict, Dict, List, Optional, Sequence, Set
+from typing import DefaultDict, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from AU2 import ROOT_DIR
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
@@ -64,6 +64,167 @@ class ScoringParameter:
     def identifier(self) -> str:
         return f"may_week_scoring_{self.name}"
 
+
+class ScoreLedger:
+    """
+    Records the scores and multipliers that each event left players with, working each event out once, in the order
+    events were created.
+
+    New events are added on to the end when the ledger is next synced. Changing (or removing) an event only means
+    working out that event and those created after it again.
+    """
+
+    def __init__(self, plugin: "MayWeekUtilitiesPlugin", parameters: Tuple, starting_scores: Dict[str, float]):
+        self.plugin = plugin
+        # the scoring parameters and settings the scores were worked out with (see MayWeekUtilitiesPlugin.score_ledger)
+        self.parameters = parameters
+        self.starting_scores = starting_scores
+        self.token = EVENTS_DATABASE.get_change_token()
+
+        # the secret ids (as numbers) and identifiers of the events added, in order
+        self.event_ids: List[int] = []
+        self.event_identifiers: List[str] = []
+        # for each player, the positions (in event_ids) of the events that changed their score,
+        # and their score after each of those events
+        self.score_history: Dict[str, Tuple[List[int], List[float]]] = {}
+        # for each player, the positions of the events in which they gained or lost a multiplier,
+        # and whether they had one after each of those events
+        self.multiplier_history: Dict[str, Tuple[List[int], List[bool]]] = {}
+
+        # the state after all the events added so far
+        self.scores: Dict[str, float] = dict(starting_scores)
+        self.multiplier_owners: Set[str] = set()
+        self.team_manager = plugin.TeamManager()
+
+        self._add_events(EVENTS_DATABASE.iter_by_creation())
+
+    def sync(self):
+        """
+        Brings the ledger up to date with any events that have been added, changed or removed since it was last synced
+        """
+        earliest = EVENTS_DATABASE.earliest_change_since(self.token)
+        self.token = EVENTS_DATABASE.get_change_token()
+        if earliest is None:
+            return
+        self._truncate(bisect.bisect_left(self.event_ids, earliest))
+        self._add_events(EVENTS_DATABASE.iter_by_creation(after=self.event_ids[-1] if self.event_ids else None))
+
+    def _truncate(self, position: int):
+        """
+        Forgets the events from `position` on, going back to the state before them
+        """
+        if position >= len(self.event_ids):
+            return
+        self.team_manager.forget_events_from(self.event_ids[position])
+        del self.event_ids[position:]
+        del self.event_identifiers[position:]
+        self.scores = dict(self.starting_scores)
+        for (player, (positions, scores)) in self.score_history.items():
+            i = bisect.bisect_left(positions, position)
+            del positions[i:]
+            del scores[i:]
+            if scores:
+                self.scores[player] = scores[-1]
+        self.multiplier_owners = set()
+        for (player, (positions, owns)) in self.multiplier_history.items():
+            i = bisect.bisect_left(positions, position)
+            del positions[i:]
+            del owns[i:]
+            if owns and owns[-1]:
+                self.multiplier_owners.add(player)
+
+    def _record(self, history: Dict[str, Tuple[List, List]], player: str, value):
+        positions, values = history.setdefault(player, ([], []))
+        positions.append(len(self.event_ids))
+        values.append(value)
+
+    def _add_events(self, events):
+        d, D, b, B, t, T, m, M, teams_enabled, team_multiplier_sharing_enabled = self.parameters
+        scores = self.scores
+        multiplier_owners = self.multiplier_owners
+        team_manager = self.team_manager
+        for e in events:
+            kills_made_as_team = self.plugin.eps_get(e, "Kills as Team", [])
+            bs_points = self.plugin.eps_get(e, "BS Points", {}).items()
+
+            # update team memberships
+            team_manager.add_event(e)
+            member_to_team = team_manager.member_to_team
+
+            # updates happen atomically, so we calculate them as a batch and then add them back in
+            point_deltas = {player: bs_allotment for (player, bs_allotment) in bs_points}
+
+            for (killer, victim) in e.kills:
+                is_as_team = teams_enabled and (killer, victim) in kills_made_as_team
+                is_with_multiplier = killer in multiplier_owners
+                if team_multiplier_sharing_enabled and not is_with_multiplier:
+                    # check whether the killer is in the same team as someone with a multiplier
+                    is_with_multiplier = any(memb in multiplier_owners
+                                             for memb in team_manager.members_of(member_to_team.get(killer)))
+
+                # apply team and multiplier bonuses (% and fixed) iff they apply
+                # (side note: maybe calling the items that grant bonuses multipliers is a little confusing in this
+                #  context, since they are neither the only ways to get multiplicative bonuses (teams do that)
+                #  nor do they only grant multiplicative bonuses)
+                t_now = t if is_as_team else 1
+                T_now = T if is_as_team else 0
+                m_now = m if is_with_multiplier else 1
+                M_now = M if is_with_multiplier else 0
+
+                point_deltas[killer] = point_deltas.get(killer, 0) + ((scores[victim]*b + B)*t_now + T_now)*m_now + M_now
+                point_deltas[victim] = point_deltas.get(victim, 0) - scores[victim]*d - D
+
+            # resolve deltas once all worked out
+            for player in point_deltas:
+                # use max or else you can LOSE points by killing someone!
+                # (specifically, if killing a player with negative points would lose you points)
+                scores[player] = max(0, scores[player] + point_deltas[player])
+                self._record(self.score_history, player, scores[player])
+
+            # work out any multiplier transfers
+            for (loser, gainer) in self.plugin.eps_get(e, "Multiplier Transfers", []):
+                if loser is not None and loser in multiplier_owners:
+                    multiplier_owners.remove(loser)
+                    self._record(self.multiplier_history, loser, False)
+                if gainer is not None:
+                    multiplier_owners.add(gainer)
+                    self._record(self.multiplier_history, gainer, True)
+
+            self.event_ids.append(e.get_numerical_id())
+            self.event_identifiers.append(e.identifier)
+
+    def position_after(self, secret_id: Union[int, float]) -> int:
+        """
+        Returns the number of events added whose secret id is at most `secret_id`
+        """
+        return bisect.bisect_right(self.event_ids, secret_id)
+
+    def scores_before(self, position: Optional[int] = None) -> Dict[str, float]:
+        """
+        Returns every player's score before the event at `position` (default after all the events)
+        """
+        if position is None or position >= len(self.event_ids):
+            return dict(self.scores)
+        scores = dict(self.starting_scores)
+        for (player, (positions, values)) in self.score_history.items():
+            i = bisect.bisect_left(positions, position)
+            if i:
+                scores[player] = values[i - 1]
+        return scores
+
+    def multiplier_owners_before(self, position: Optional[int] = None) -> Set[str]:
+        """
+        Returns the players who had a multiplier before the event at `position` (default after all the events)
+        """
+        if position is None or position >= len(self.event_ids):
+            return set(self.multiplier_owners)
+        owners = set()
+        for (player, (positions, owns)) in self.multiplier_history.items():
+            i = bisect.bisect_left(positions, position)
+            if i and owns[i - 1]:
+                owners.add(player)
+        return owners
+
 @registered_plugin
 class MayWeekUtilitiesPlugin(AbstractPlugin):
     """
@@ -224,33 +385,99 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
         ]
 
         class TeamManager:
-            """Helps keep track of teams"""
+            """
+            Helps keep track of teams
+
+            Keeps the members of each team up to date as events are added, and a history of each player's team keyed by
+            the secret ids of the events that changed it, so that teams at an earlier event can be looked up (this
+            needs events to be added in the order they were created).
+            """
             def __init__(self):
                 self.member_to_team: DefaultDict[str, Optional[int]] = defaultdict(lambda: None)
+                # the inverse of member_to_team (without individuals)
+                self.members: DefaultDict[int, Set[str]] = defaultdict(set)
+                # for each player, the secret ids of the events that changed their team, and their team after each
+                self.history: Dict[str, Tuple[List[int], List[Optional[int]]]] = {}
+                # see team_to_member_map
+                self._member_map: Optional[DefaultDict[Optional[int], Set[str]]] = None
 
             def add_event(TeamManager_self, e: Event):
                 nonlocal self
                 team_memb_changes = self.eps_get(e, "Team Changes", {})
+                for (member, team) in team_memb_changes.items():
+                    old_team = TeamManager_self.member_to_team.get(member)
+                    if member in TeamManager_self.member_to_team and old_team == team:
+                        continue
+                    if old_team is not None:
+                        TeamManager_self.members[old_team].discard(member)
+                    if team is not None:
+                        TeamManager_self.members[team].add(member)
+                    ids, teams = TeamManager_self.history.setdefault(member, ([], []))
+                    ids.append(e.get_numerical_id())
+                    teams.append(team)
+                    TeamManager_self._member_map = None
                 TeamManager_self.member_to_team.update(team_memb_changes)
-                TeamManager_self.team_to_member_map.cache_clear()
 
-            def process_events_until(self, before_event: int = float("Inf")) -> "TeamManager":
-                for e in EVENTS_DATABASE.events.values():
-                    if int(e._Event__secret_id) >= before_event:
+            def forget_events_from(self, first_event: int):
+                """
+                Goes back to the teams before the events with secret ids from `first_event` on (which must be the
+                last events added), using the history rather than adding the earlier events again
+                """
+                self.member_to_team.clear()
+                self.members.clear()
+                for member in list(self.history):
+                    ids, teams = self.history[member]
+                    i = bisect.bisect_left(ids, first_event)
+                    if not i:
+                        del self.history[member]
                         continue
+                    del ids[i:]
+                    del teams[i:]
+                    # (players are added in the order they first changed team, as they are by add_event)
+                    self.member_to_team[member] = teams[-1]
+                    if teams[-1] is not None:
+                        self.members[teams[-1]].add(member)
+                self._member_map = None
+
+            def process_events_until(self, before_event: int = float("Inf")) -> "TeamManager":
+                for e in EVENTS_DATABASE.iter_by_creation(upto=before_event - 1):
                     self.add_event(e)
                 return self
 
-            @functools.cache
+            def members_of(self, team: Optional[int]) -> Set[str]:
+                """The members of a team (none, for individuals)"""
+                return self.members.get(team, set()) if team is not None else set()
+
             def team_to_member_map(self) -> DefaultDict[Optional[int], Set[str]]:
                 """Produces the 'inverse' of member_to_team, i.e. a map from teams to sets of assassin identifiers"""
+                # ordered as the teams' members are in member_to_team, which decides team colours on the May Week pages
+                if self._member_map is None:
+                    memb_map = defaultdict(lambda: set())
+                    for a, c in self.member_to_team.items():
+                        if c is not None:  # stop individuals being grouped into a team
+                            memb_map[c].add(a)
+                    self._member_map = memb_map
+                return self._member_map
+
+            def team_at(self, member: str, secret_id: Union[int, float]) -> Optional[int]:
+                """The team a player was in after the events with secret ids up to `secret_id`"""
+                ids, teams = self.history.get(member, ((), ()))
+                i = bisect.bisect_right(ids, secret_id)
+                return teams[i - 1] if i else None
+
+            def team_to_member_map_at(self, secret_id: Union[int, float]) -> DefaultDict[Optional[int], Set[str]]:
+                """As team_to_member_map, but after the events with secret ids up to `secret_id`"""
                 memb_map = defaultdict(lambda: set())
-                for a, c in self.member_to_team.items():
-                    if c is not None:  # stop individuals being grouped into a team
+                for a in self.history:
+                    c = self.team_at(a, secret_id)
+                    if c is not None:
                         memb_map[c].add(a)
                 return memb_map
         self.TeamManager = TeamManager
 
+        # see score_ledger
+        self._score_ledger: Optional[ScoreLedger] = None
+
     def gsdb_get(self, plugin_state_id, default):
         return GENERIC_STATE_DATABASE.arb_state.get(self.identifier, {}).get(self.plugin_state[plugin_state_id], default)
 
@@ -369,10 +596,9 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
     def answer_teams_summary(self, htmlResponse) -> List[HTMLComponent]:
         teams_str = self.get_cosmetic_name("Teams").capitalize()
         multiplier_str = self.get_cosmetic_name("Multiplier").capitalize()
-        team_manager = self.TeamManager().process_events_until(before_event=int(
-            htmlResponse[self.html_ids["Event Secret ID"]]) + 1
+        team_to_members = self.score_ledger().team_manager.team_to_member_map_at(
+            int(htmlResponse[self.html_ids["Event Secret ID"]])
         )
-        team_to_members = team_manager.team_to_member_map()
         team_names = self.gsdb_get("Team Names", self.ps_defaults["Team Names"])
         multiplier_owners = self.get_multiplier_owners()
         rows = []
@@ -394,12 +620,13 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
         multiplier_str = self.get_cosmetic_name("Multiplier").lower()
         teams_enabled = self.gsdb_get("Enable Teams?", False)
         team_names = self.gsdb_get("Team Names", self.ps_defaults["Team Names"])
-        team_manager = self.TeamManager()
-        scores = self.calculate_scores(team_manager=team_manager)
+        ledger = self.score_ledger()
+        team_manager = ledger.team_manager
+        scores = ledger.scores_before()
         multiplier_owners = self.get_multiplier_owners()
         multiplier_beneficiaries = self.get_multiplier_beneficiaries(multiplier_owners, team_manager)
 
-        team = team_manager.member_to_team[assassin.identifier]
+        team = team_manager.member_to_team.get(assassin.identifier)
         team_name = team_names[team] if team is not None else "(Individual)"
 
         return [
@@ -443,18 +670,13 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
     def get_cosmetic_name(self, name: str) -> str:
         return self.gsdb_get(name, name.lower())
 
-    def get_multiplier_owners(self, before_event: int = float("inf")) -> List[str]:
-        owners = set()
-        for event in EVENTS_DATABASE.events.values():
-            if int(event._Event__secret_id) >= before_event:
-                continue
-            key = self.plugin_state["Multiplier Transfers"]
-            for (loser, gainer) in event.pluginState.get(self.identifier, {}).get(key, []):
-                if loser is not None and loser in owners:
-                    owners.remove(loser)
-                if gainer is not None:
-                    owners.add(gainer)
-        return list(owners)
+    def get_multiplier_owners(self, before_event: Union[int, float] = float("inf")) -> List[str]:
+        """
+        Returns the players who had a multiplier before the event with secret id `before_event` (default after all
+        the events)
+        """
+        ledger = self.score_ledger()
+        return sorted(ledger.multiplier_owners_before(ledger.position_after(before_event - 1)))
 
     def get_multiplier_beneficiaries(self, multiplier_owners: List[str], team_manager) -> List[str]:
         teams_enabled = self.gsdb_get("Enable Teams?", False)
@@ -468,7 +690,7 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
         sharing_multipliers = teams_enabled and self.gsdb_get("Share Multipliers?", self.ps_defaults["Share Multipliers?"])
         if sharing_multipliers:
             multiplier_beneficiaries = [
-                member for owner in multiplier_owners for member in team_to_members[member_to_team[owner]]
+                member for owner in multiplier_owners for member in team_to_members[member_to_team.get(owner)]
             ]
         return multiplier_beneficiaries
 
@@ -580,78 +802,47 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
             self.eps_set(e, "Team Changes", html_response[self.html_ids["Team Changes"]])
         return [Label("[MAY WEEK] Success!")]
 
-    def calculate_scores(self, before_event: int = float("inf"), team_manager = None) -> Dict[str, float]:
-        d = self.gsdb_get("death_penalty_pct", 0) / 100
-        D = self.gsdb_get("death_penalty_fixed", 0)
-        b = self.gsdb_get("kill_bonus_pct", 0) / 100
-        B = self.gsdb_get("kill_bonus_fixed", 0)
-        t = self.gsdb_get("team_bonus_pct", 0) / 100
-        T = self.gsdb_get("team_bonus_fixed", 0)
-        m = self.gsdb_get("multiplier_bonus_pct", 0) / 100
-        M = self.gsdb_get("multiplier_bonus_fixed", 0)
+    def score_ledger(self) -> ScoreLedger:
+        """
+        Returns the ledger of scores and multipliers, brought up to date with the events.
+        It is only worked out from scratch if the scoring parameters, team settings or players have changed.
+        """
+        parameters = (
+            self.gsdb_get("death_penalty_pct", 0) / 100,
+            self.gsdb_get("death_penalty_fixed", 0),
+            self.gsdb_get("kill_bonus_pct", 0) / 100,
+            self.gsdb_get("kill_bonus_fixed", 0),
+            self.gsdb_get("team_bonus_pct", 0) / 100,
+            self.gsdb_get("team_bonus_fixed", 0),
+            self.gsdb_get("multiplier_bonus_pct", 0) / 100,
+            self.gsdb_get("multiplier_bonus_fixed", 0),
+        )
+        teams_enabled = self.gsdb_get("Enable Teams?", False)
+        team_multiplier_sharing_enabled = teams_enabled and self.gsdb_get("Share Multipliers?", self.ps_defaults["Share Multipliers?"])
+        parameters += (teams_enabled, team_multiplier_sharing_enabled)
+
         Sc = self.gsdb_get("starting_score_casual", 0)
         Sf = self.gsdb_get("starting_score_full", 0)
-
-        # passing a team manager allows us to extract team information after this function runs
-        team_manager = team_manager or self.TeamManager()
-
-        scores: Dict[str, float] = {a.identifier: Sf if not a.is_city_watch else Sc for a in ASSASSINS_DATABASE.get_filtered(
+        starting_scores: Dict[str, float] = {a.identifier: Sf if not a.is_city_watch else Sc for a in ASSASSINS_DATABASE.get_filtered(
             include_hidden = lambda _: True  # probably not necessary in May Week (since no resurrection as city watch),
                                              # but just in case...
         )}
-        multiplier_owners = set()
-        teams_enabled = self.gsdb_get("Enable Teams?", False)
-        team_multiplier_sharing_enabled = teams_enabled and self.gsdb_get("Share Multipliers?", self.ps_defaults["Share Multipliers?"])
 
-        # unfortunately events have to processed in order of secret id (i.e. in the order they were created)
-        # so that the multiplier transfer interface in Event -> Create / Event -> Update  works correctly...
-        for e in EVENTS_DATABASE.events.values():
-            if int(e._Event__secret_id) > before_event:
-                continue
-            kills_made_as_team = self.eps_get(e, "Kills as Team", [])
-            bs_points = self.eps_get(e, "BS Points", {}).items()
+        ledger = self._score_ledger
+        if ledger is None or ledger.parameters != parameters or ledger.starting_scores != starting_scores:
+            # unfortunately events have to processed in order of secret id (i.e. in the order they were created)
+            # so that the multiplier transfer interface in Event -> Create / Event -> Update  works correctly...
+            ledger = self._score_ledger = ScoreLedger(self, parameters, starting_scores)
+        else:
+            ledger.sync()
+        return ledger
 
-            # update team memberships
-            team_manager.add_event(e)
-            member_to_team = team_manager.member_to_team
-            team_to_members = team_manager.team_to_member_map()
-
-            # updates happen atomically, so we calculate them as a batch and then add them back in
-            point_deltas = {player: bs_allotment for (player, bs_allotment) in bs_points}
-
-            for (killer, victim) in e.kills:
-                is_as_team = teams_enabled and (killer, victim) in kills_made_as_team
-                is_with_multiplier = killer in multiplier_owners
-                if team_multiplier_sharing_enabled and not is_with_multiplier:
-                    # check whether the killer is in the same team as someone with a multiplier
-                    is_with_multiplier = any(memb in multiplier_owners for memb in team_to_members[member_to_team[killer]])
-
-                # apply team and multiplier bonuses (% and fixed) iff they apply
-                # (side note: maybe calling the items that grant bonuses multipliers is a little confusing in this
-                #  context, since they are neither the only ways to get multiplicative bonuses (teams do that)
-                #  nor do they only grant multiplicative bonuses)
-                t_now = t if is_as_team else 1
-                T_now = T if is_as_team else 0
-                m_now = m if is_with_multiplier else 1
-                M_now = M if is_with_multiplier else 0
-
-                point_deltas[killer] = point_deltas.get(killer, 0) + ((scores[victim]*b + B)*t_now + T_now)*m_now + M_now
-                point_deltas[victim] = point_deltas.get(victim, 0) - scores[victim]*d - D
-
-            # resolve deltas once all worked out
-            for player in point_deltas:
-                # use max or else you can LOSE points by killing someone!
-                # (specifically, if killing a player with negative points would lose you points)
-                scores[player] = max(0, scores[player] + point_deltas[player])
-
-            # work out any multiplier transfers
-            for (loser, gainer) in e.pluginState.get(self.identifier, {}).get(self.plugin_state["Multiplier Transfers"], []):
-                if loser is not None and loser in multiplier_owners:
-                    multiplier_owners.remove(loser)
-                if gainer is not None:
-                    multiplier_owners.add(gainer)
-
-        return scores
+    def calculate_scores(self, before_event: Union[int, float] = float("inf")) -> Dict[str, float]:
+        """
+        Returns every player's score after the events with secret ids up to `before_event` (default all of them)
+        """
+        ledger = self.score_ledger()
+        return ledger.scores_before(ledger.position_after(before_event))
 
     def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
         """
@@ -667,8 +858,9 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
         """
 
         # player info page
-        team_manager = self.TeamManager()
-        scores = self.calculate_scores(team_manager=team_manager)
+        ledger = self.score_ledger()
+        team_manager = ledger.team_manager
+        scores = ledger.scores_before()
         multiplier_owners = set(self.get_multiplier_owners())
         teams_enabled = self.gsdb_get("Enable Teams?", False)
         member_to_team = team_manager.member_to_team
@@ -688,7 +880,7 @@ class MayWeekUtilitiesPlugin(AbstractPlugin):
         pseudonym_rows = []
         for (score, a_id) in sorted(((v, k) for (k, v) in scores.items()), reverse=True):
             # PSEUDONYM_ROW_TEMPLATE = "<tr {CREW_COLOR}><td>{RANK}</td><td>{PSEUDONYM}</td><td>{POINTS}</td><td>{MULTIPLIER}</td></tr>{TEAM_ENTRY}"
-            team_id = member_to_team[a_id]
+            team_id = member_to_team.get(a_id)
             crew_color = (CREW_COLOR_TEMPLATE.format(HEX=team_to_hex_col[team_id]) if team_id is not None else "")
             team_entry = (TEAM_ENTRY_TEMPLATE.format(TEAM=team_names[team_id], CREW_COLOR=crew_color) if team_id is not None else "")
             assassin = ASSASSINS_DATABASE.get(a_id)
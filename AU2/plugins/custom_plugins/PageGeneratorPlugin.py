@@ -12,8 +12,9 @@ from AU2.html_components.SimpleComponents.Label import Label
 from AU2.plugins.AbstractPlugin import AbstractPlugin, ConfigExport, NavbarEntry
 from AU2.plugins.CorePlugin import registered_plugin
 from AU2.plugins.util.render_utils import Chapter, default_page_allocator, DEFAULT_REAL_NAME_BRIGHTNESS, \
-    generate_news_pages, get_real_name_brightness, set_real_name_brightness
+    generate_news_pages, get_real_name_brightness, PageAllocator, register_renderer, set_real_name_brightness
 from AU2.plugins.util.game import get_game_end
+from AU2.plugins.util.replay import Replay
 
 @registered_plugin
 class PageGeneratorPlugin(AbstractPlugin):
@@ -101,7 +102,7 @@ class PageGeneratorPlugin(AbstractPlugin):
                                        GENERIC_STATE_DATABASE.arb_state.get(self.identifier, {}).get(self.plugin_state["Duel Page?"], False)))
         return components
 
-    def on_page_generate(self, htmlResponse, navbar_entry) -> List[HTMLComponent]:
+    def page_allocator(self, htmlResponse) -> PageAllocator:
         duel_page = False
         if self.html_ids["Duel Page?"] in htmlResponse:
             duel_page = htmlResponse[self.html_ids["Duel Page?"]]
@@ -111,15 +112,22 @@ class PageGeneratorPlugin(AbstractPlugin):
 
         DUEL_CHAPTER = Chapter("The Duel", NavbarEntry("duel.html", "The Duel", float("Inf")))
 
+        # note: need to check default allocation first in case event is hidden!
+        return lambda e: (DUEL_CHAPTER
+                          if (default := default_page_allocator(e))
+                             and end is not None
+                             and end < e.datetime
+                          else default)
+
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        register_renderer(replay, "head.html", page_allocator=self.page_allocator(htmlResponse))
+
+    def on_page_generate(self, htmlResponse, navbar_entry) -> List[HTMLComponent]:
         generate_news_pages(
             headlines_path="head.html",
-            # note: need to check default allocation first in case event is hidden!
-            page_allocator=lambda e: (DUEL_CHAPTER
-                                      if (default := default_page_allocator(e))
-                                         and end is not None
-                                         and end < e.datetime
-                                      else default),
+            page_allocator=self.page_allocator(htmlResponse),
             news_list_path="news-list.html",
+            replay_key="head.html",
         )
 
         return [Label("[NEWS PAGE GENERATOR] Successfully generated the story!")]
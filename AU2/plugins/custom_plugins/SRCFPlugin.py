@@ -13,7 +13,7 @@ from AU2 import BASE_WRITE_LOCATION
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE, AssassinsDatabase
 from AU2.database.EventsDatabase import EVENTS_DATABASE, EventsDatabase
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE, GenericStateDatabase
-from AU2.database import save_all_databases
+from AU2.database import compact_all_databases, discard_journals, save_all_databases
 from AU2.database.model import Assassin
 from AU2.database.model.database_utils import refresh_databases
 from AU2.html_components import HTMLComponent
@@ -28,8 +28,8 @@ from AU2.html_components.SimpleComponents.Table import Table
 from AU2.plugins.AbstractPlugin import AbstractPlugin, Export, HookedExport, ConfigExport
 from AU2.plugins.CorePlugin import registered_plugin
 from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
-from AU2.plugins.util.DeathManager import DeathManager
 from AU2.plugins.util.date_utils import get_now_dt
+from AU2.plugins.util.page_manifest import PAGE_MANIFEST
 
 SRCF_WEBSITE = "shell.srcf.net"
 SSH_PORT = 22
@@ -50,6 +50,8 @@ PUBLISH_LOG = LOGS / "publish.log"
 REMOTE_WEBPAGES_PATH = ASSASSINS_PATH / "public_html"
 REMOTE_BACKUP_LOCATION = AU2_DATA_PATH / "backups"
 REMOTE_DATABASE_LOCATION = AU2_DATA_PATH / "databases"
+# what is published in REMOTE_WEBPAGES_PATH (see page_manifest.py), kept here so that every umpire publishing agrees
+REMOTE_PAGE_MANIFEST = AU2_DATA_PATH / "page_manifest"
 
 EMAIL_TEMPLATE = """\
 MAIL FROM:assassins-umpire@srcf.net
@@ -301,13 +303,11 @@ class SRCFPlugin(AbstractPlugin):
     def on_request_hook_respond(self, hook: str) -> List[HTMLComponent]:
         if hook == self.hooks["email"]:
 
-            death_manager = DeathManager()
-            for e in EVENTS_DATABASE.events.values():
-                death_manager.add_event(e)
+            dead = EVENTS_DATABASE.get_victims()
 
             # note: hidden assassins will be excluded
             alive_assassins = ASSASSINS_DATABASE.get_identifiers(include=(
-                lambda a: a.is_city_watch or not death_manager.is_dead(a)
+                lambda a: a.is_city_watch or a.identifier not in dead
             ))
             city_watch_assassins = ASSASSINS_DATABASE.get_identifiers(include=lambda a: a.is_city_watch)
 
@@ -495,6 +495,10 @@ class SRCFPlugin(AbstractPlugin):
         with self._get_client() as sftp:
             with sftp.file(filepath, "w+") as F:
                 F.write(contents)
+            # so that the page is published again even if AU2 generates the same page as before the edit
+            self._fetch_page_manifest(sftp)
+            PAGE_MANIFEST.forget(filename)
+            self._upload_page_manifest(sftp)
         return [Label(f"[SRCFPlugin] Wrote to: {filepath}")]
 
     def answer_lock(self, htmlResponse) -> List[HTMLComponent]:
@@ -539,6 +543,7 @@ class SRCFPlugin(AbstractPlugin):
                 sftp.put(localpath, str(remotetarget))
                 self._log_to(sftp, PUBLISH_LOG, f"Restored {remotepath}.")
 
+            discard_journals()
             refresh_databases()
             return [Label(f"[SRCF Plugin] Restored {chosen_backup}")]
 
@@ -557,7 +562,8 @@ class SRCFPlugin(AbstractPlugin):
 
     def answer_publish_pages(self, htmlResponse) -> List[HTMLComponent]:
         """
-        Publishes all pages in `WEBSITE_WRITE_LOCATION`, wiping each page it uploads.
+        Publishes the pages in `WEBSITE_WRITE_LOCATION` that have changed since they were last published (by anyone),
+        wiping each page afterwards.
 
         If there's a lock, and we want to proceed, I have it override the claim on the lock.
         The idea is that if two people are simultaneously playing with the SRCF,
@@ -570,20 +576,27 @@ class SRCFPlugin(AbstractPlugin):
                 print("[SRCF Plugin] Claiming lock...")
                 self._lock(sftp)
             self._makedirs(sftp, REMOTE_WEBPAGES_PATH)
+            self._fetch_page_manifest(sftp)
+            changed_pages = PAGE_MANIFEST.changed_pages()
             for page in os.listdir(WEBPAGE_WRITE_LOCATION):
                 localpath = os.path.join(WEBPAGE_WRITE_LOCATION, page)
-                remotepath = REMOTE_WEBPAGES_PATH / page
-                print(f"[SRCF Plugin] Publishing {page}")
-                self._log_to(sftp, PUBLISH_LOG, f"Trying to publish {page}")
-                sftp.put(localpath, str(remotepath))
-                self._log_to(sftp, PUBLISH_LOG, f"Published {page}")
+                if page in changed_pages:
+                    remotepath = REMOTE_WEBPAGES_PATH / page
+                    print(f"[SRCF Plugin] Publishing {page}")
+                    self._log_to(sftp, PUBLISH_LOG, f"Trying to publish {page}")
+                    sftp.put(localpath, str(remotepath))
+                    self._log_to(sftp, PUBLISH_LOG, f"Published {page}")
+                    PAGE_MANIFEST.mark_published(page)
+                else:
+                    print(f"[SRCF Plugin] {page} is unchanged")
                 os.remove(localpath)
+            self._upload_page_manifest(sftp)
 
             self._publish_databases(sftp)
             automatic_backup = self._autobackup(sftp)
 
         return [
-            Label("[SRCFPlugin] Successfuly published locally generated pages and uploaded database."),
+            Label(f"[SRCFPlugin] Successfuly published {len(changed_pages)} changed page(s) and uploaded database."),
             Label(f"[SRCFPlugin] Automatically created backup {automatic_backup}")
         ]
 
@@ -591,6 +604,7 @@ class SRCFPlugin(AbstractPlugin):
         backup_path = REMOTE_BACKUP_LOCATION / backup_name
         self._makedirs(sftp, backup_path)
         self._log_to(sftp, EDIT_LOG, f"Creating backup at {backup_path}")
+        compact_all_databases()
         for f in self._find_jsons(BASE_WRITE_LOCATION):
             localpath = os.path.join(BASE_WRITE_LOCATION, f)
             remotepath = backup_path / f
@@ -650,10 +664,35 @@ class SRCFPlugin(AbstractPlugin):
         sftp.remove(str(LOCK_FILE))
         return None, None
 
+    def _fetch_page_manifest(self, sftp: paramiko.SFTPClient):
+        """
+        Replaces the local copy of the page manifest with the one on the SRCF.
+        """
+        try:
+            sftp.stat(str(REMOTE_PAGE_MANIFEST))
+        except FileNotFoundError:
+            # nothing is known to be published, so every page is published
+            if os.path.exists(PAGE_MANIFEST.path):
+                os.remove(PAGE_MANIFEST.path)
+        else:
+            sftp.get(str(REMOTE_PAGE_MANIFEST), PAGE_MANIFEST.path)
+        PAGE_MANIFEST.reload()
+
+    def _upload_page_manifest(self, sftp: paramiko.SFTPClient):
+        """
+        Saves the page manifest and replaces the one on the SRCF with it.
+        """
+        PAGE_MANIFEST.save()
+        self._makedirs(sftp, AU2_DATA_PATH)
+        self._log_to(sftp, PUBLISH_LOG, "Trying to save page manifest")
+        sftp.put(PAGE_MANIFEST.path, str(REMOTE_PAGE_MANIFEST))
+        self._log_to(sftp, PUBLISH_LOG, "Saved page manifest")
+
     def _publish_databases(self, sftp: paramiko.SFTPClient):
         """
         Publishes all databases (as saved to file)
         """
+        compact_all_databases()
         for database in self._find_jsons(BASE_WRITE_LOCATION):
             localpath = os.path.join(BASE_WRITE_LOCATION, database)
             remotepath = REMOTE_DATABASE_LOCATION / database
@@ -730,6 +769,8 @@ class SRCFPlugin(AbstractPlugin):
                 yield db
 
     def _sync(self, sftp: paramiko.SFTPClient):
+        # make sure the files we might upload are complete
+        compact_all_databases()
 
         remotepath = REMOTE_DATABASE_LOCATION / os.path.basename(GENERIC_STATE_DATABASE.WRITE_LOCATION)
         exists = True
@@ -823,6 +864,7 @@ class SRCFPlugin(AbstractPlugin):
                 self._log_to(sftp, PUBLISH_LOG, f"Saved {database}")
             print("[SRCF Plugin] No databases were found in the SRCF, so local copies have been uploaded.")
 
+        discard_journals()
         refresh_databases()
         return []
 
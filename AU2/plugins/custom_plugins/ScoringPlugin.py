@@ -21,19 +21,23 @@ from AU2.html_components.SimpleComponents.Checkbox import Checkbox
 from AU2.plugins.AbstractPlugin import AbstractPlugin, Export, ConfigExport, NavbarEntry
 from AU2.plugins.CorePlugin import registered_plugin
 from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
-from AU2.plugins.util.ScoreManager import ScoreManager
+from AU2.plugins.util.ScoreManager import DEFAULT_FORMULA, ScoreManager
+from AU2.plugins.util.StatsTable import StatsTable
 from AU2.plugins.util.CompetencyManager import CompetencyManager
 from AU2.plugins.util.WantedManager import WantedManager
 from AU2.plugins.util.date_utils import get_now_dt, timestamp_to_dt, dt_to_timestamp, DATETIME_FORMAT
+from AU2.plugins.util.formula import InvalidFormulaException, compile_formula
 from AU2.plugins.util.game import get_game_start, get_game_end
-from AU2.plugins.util.render_utils import event_datetime_link, get_color, render_headline_and_reports
+from AU2.plugins.util.page_manifest import PAGE_MANIFEST
+from AU2.plugins.util.render_utils import event_datetime_link, get_color, PageTemplate, render_headline_and_reports
+from AU2.plugins.util.replay import Replay, current_replay
 
-OPENSEASON_TABLE_TEMPLATE = """
+OPENSEASON_TABLE_TEMPLATE = PageTemplate("""
 <table xmlns="" class="playerlist">
   <tr><th>Real Name</th><th>Address</th><th>College</th><th>Room Water Weapons Status</th><th>Notes</th><th>Points</th></tr>
   {ROWS}
 </table>
-"""
+""")
 
 OPENSEASON_ROW_TEMPLATE = """
 <tr><td>{NAME}</td><td>{ADDRESS}</td><td>{COLLEGE}</td><td>{WATER_STATUS}</td><td>{NOTES}</td><td>{POINTS:g}</tr>
@@ -41,10 +45,10 @@ OPENSEASON_ROW_TEMPLATE = """
 
 OPENSEASON_NAVBAR_ENTRY = NavbarEntry("openseason.html", "Open Season", 3)
 
-OPENSEASON_PAGE_TEMPLATE: str
+OPENSEASON_PAGE_TEMPLATE: PageTemplate
 OPENSEASON_PAGE_TEMPLATE_PATH: pathlib.Path = ROOT_DIR / "plugins" / "custom_plugins" / "html_templates" / "openseason.html"
 with open(OPENSEASON_PAGE_TEMPLATE_PATH, "r", encoding="utf-8", errors="ignore") as F:
-    OPENSEASON_PAGE_TEMPLATE = F.read()
+    OPENSEASON_PAGE_TEMPLATE = PageTemplate(F.read())
 
 TABLE_SORT_JS_CDN = "https://cdn.jsdelivr.net/npm/table-sort-js/table-sort.js"
 TABLE_SORT_JS_FILENAME = "table-sort.js"
@@ -82,10 +86,10 @@ def stats_table_template(columns: Iterable[str]) -> str:
     )
 
 STATS_NAVBAR_ENTRY = NavbarEntry("stats.html", "Player Stats", 4)
-STATS_PAGE_TEMPLATE: str
+STATS_PAGE_TEMPLATE: PageTemplate
 STATS_PAGE_TEMPLATE_PATH: pathlib.Path = ROOT_DIR / "plugins" / "custom_plugins" / "html_templates" / "stats.html"
 with open(STATS_PAGE_TEMPLATE_PATH, "r", encoding="utf-8", errors="ignore") as F:
-    STATS_PAGE_TEMPLATE = F.read()
+    STATS_PAGE_TEMPLATE = PageTemplate(F.read())
 
 KILLTREE_PATH = "killtree.html"
 KILLTREE_EMBED = """
@@ -106,7 +110,7 @@ KILLTREE_LINK = f"""
 """
 
 NODE_SHAPE = "dot"
-def generate_killtree_visualiser(events: List[Event], score_manager: ScoreManager) -> str:
+def generate_killtree_visualiser(events: List[Event], table: StatsTable, replay: Replay) -> str:
     # local import because importing pyvis every time impacts performance significantly
     try:
         from pyvis.network import Network
@@ -115,8 +119,9 @@ def generate_killtree_visualiser(events: List[Event], score_manager: ScoreManage
         return "Skipping killtree visualisation due to missing modules -- check `requirements.txt`."
 
     # track competency and wantedness for edge colouring
+    # (wantedness can be looked up at any time, so the manager shared with the other pages is used)
     competency_manager = CompetencyManager(get_game_start())
-    wanted_manager = WantedManager()
+    wanted_manager = replay.get("WantedManager", WantedManager, checkpoint=True)
 
     net = Network(directed=True, cdn_resources="in_line", height="calc(100vh - 90px)", select_menu=True)
     added_nodes = set()
@@ -124,7 +129,6 @@ def generate_killtree_visualiser(events: List[Event], score_manager: ScoreManage
         # construct kill tree network
         for (killer, victim) in e.kills:
             competency_manager.add_event(e)
-            wanted_manager.add_event(e)
             killer_model = ASSASSINS_DATABASE.get(killer)
             victim_model = ASSASSINS_DATABASE.get(victim)
             killer_searchable = f"{killer_model.all_pseudonyms(fn=lambda x: x)} ({killer_model.real_name})"
@@ -136,7 +140,7 @@ def generate_killtree_visualiser(events: List[Event], score_manager: ScoreManage
                     shape=NODE_SHAPE,
                     color=get_color(killer_model.get_pseudonym(0), is_city_watch=killer_model.is_city_watch),
                     title=killer_searchable,
-                    value=1 + score_manager.get_conkers(killer_model)
+                    value=1 + table.get_conkers(killer)
                 )
                 added_nodes.add(killer)
             if victim not in added_nodes:
@@ -146,7 +150,7 @@ def generate_killtree_visualiser(events: List[Event], score_manager: ScoreManage
                     shape=NODE_SHAPE,
                     color=get_color(victim_model.get_pseudonym(0), is_city_watch=victim_model.is_city_watch),
                     title=victim_searchable,
-                    value=1 + score_manager.get_conkers(victim_model)
+                    value=1 + table.get_conkers(victim)
                 )
                 added_nodes.add(victim)
             headline, _ = render_headline_and_reports(e, plugin_managers=(competency_manager, wanted_manager))
@@ -301,60 +305,52 @@ class ScoringPlugin(AbstractPlugin):
                              columns: List[str],
                              generate_killtree: bool,
                              navbar_entries: List[NavbarEntry]) -> List[HTMLComponent]:
+        # every player's score is shown, so the formula has to work for all of them
+        if not self.formula_is_valid(self.gsdb_get("Formula") or DEFAULT_FORMULA):
+            return [Label("[WARNING] [SCORING] Invalid scoring formula -- skipping stats page!")]
         components = []
         openseason_end = get_game_end()
-        # use a score manager to count kills, conkers, and attempts
-        # don't need to set the formula because we aren't going to fetch scores
         full_players = ASSASSINS_DATABASE.get_filtered(include=lambda a: not a.is_city_watch,
                                                        include_hidden=lambda a: not a.is_city_watch)
-        formula = self.gsdb_get("Formula")
-        score_manager = ScoreManager({a.identifier for a in full_players}, formula=formula, game_end=openseason_end)
-        events = sorted(EVENTS_DATABASE.events.values(), key=lambda e: e.datetime)
-        for e in events:
-            score_manager.add_event(e)
-        rows = []
+        replay = current_replay()
+        score_manager = self.register_stats_manager(replay)
+        replay.run()
+        events = list(EVENTS_DATABASE.iter_chronological())
+
+        table = StatsTable(score_manager, full_players)
 
-        def player_rating(a):
-            """
-            The values used to 'rank' players.
-            Players are sorted by 'rating' which is time of death for those that died before the end of open season
-            and game end + score for those that survived open season. If this is a tie then ties are broken by score.
-            """
-            return -score_manager.get_rating(a), -score_manager.get_score(a)
-
-        full_players.sort(key=player_rating)
-        tied_rank = -1
-        for rank, p in enumerate(full_players):
+        # players are ranked by 'rating' which is time of death for those that died before the end of open season
+        # and game end + score for those that survived open season. If this is a tie then ties are broken by score.
+        order = table.by_rating()
+        row_template = PageTemplate(stats_row_template(columns))
+        rows = []
+        for (i, tied_rank) in zip(order, table.tied_ranks(order)):
+            p = table.assassins[i]
             # list of datetimes at which the player died, if applicable,
             # each with a link to the corresponding event on the news pages
             # note: the link may be broken for may week games... (see https://github.com/jsyiek/AU2/issues/161)
             deaths = [event_datetime_link(e)
                       if openseason_end is None or e.datetime < openseason_end
                       else "Duel"
-                      for e in score_manager.get_death_events(p)]
-
-            # players that are tied should be given the same rank
-            if (rank == 0 or player_rating(full_players[rank - 1])
-                    != player_rating(p)):
-                tied_rank = rank + 1
-            rows.append(stats_row_template(columns).format(
+                      for e in table.death_events[i]]
+            rows.append(row_template.format(
                 NAME=p.real_name,
                 PSEUDONYMS=p.all_pseudonyms(),
-                KILLS=score_manager.get_kills(p),
-                CONKERS=score_manager.get_conkers(p),
-                ATTEMPTS=score_manager.get_attempts(p),
+                KILLS=table.kills[i],
+                CONKERS=table.conkers[i],
+                ATTEMPTS=table.attempts[i],
                 DEATHS='<br />'.join(deaths) if deaths else "&mdash;",
-                DEATH_TS=score_manager.get_rating(p),
+                DEATH_TS=table.ratings[i],
                 RANK=tied_rank,
-                SCORE=score_manager.get_score(p)
+                SCORE=table.scores[i]
             ))
-        table_str = stats_table_template(columns).format(ROWS="".join(rows))
+        table_chunks = PageTemplate(stats_table_template(columns)).chunks(ROWS=rows)
 
         # kill tree visualiser
         killtree_embed = ""
         killtree_link = ""
         if generate_killtree:
-            msg = generate_killtree_visualiser(events, score_manager)
+            msg = generate_killtree_visualiser(events, table, replay)
             if msg:
                 components.append(Label(f"[WARNING] [SCORING] {msg}"))
             else:
@@ -364,16 +360,16 @@ class ScoringPlugin(AbstractPlugin):
 
         navbar_entries.append(STATS_NAVBAR_ENTRY)
 
-        with open(WEBPAGE_WRITE_LOCATION / STATS_NAVBAR_ENTRY.url, "w+", encoding="utf-8") as F:
-            F.write(
-                STATS_PAGE_TEMPLATE.format(
-                    YEAR=get_now_dt().year,
-                    TABLE=table_str,
-                    KILLTREE_EMBED=killtree_embed,
-                    KILLTREE_LINK=killtree_link,
-                    TABLE_SORT_JS_URL=TABLE_SORT_JS_FILENAME,
-                )
+        PAGE_MANIFEST.write_page(
+            STATS_NAVBAR_ENTRY.url,
+            STATS_PAGE_TEMPLATE.chunks(
+                YEAR=get_now_dt().year,
+                TABLE=table_chunks,
+                KILLTREE_EMBED=killtree_embed,
+                KILLTREE_LINK=killtree_link,
+                TABLE_SORT_JS_URL=TABLE_SORT_JS_FILENAME,
             )
+        )
 
         components.append(Label("[SCORING] Generated stats page."))
         return components
@@ -408,16 +404,15 @@ the conkers of all players killed by the player, ignoring any kills that do not
 as defined above
 
 Syntax:
-    Currently the scoring formula is passed directly to the Python eval() function.
-    This means the syntax is that of a Python expression.
+    The syntax is that of a Python expression, using only numbers and the parameters above.
     For reference, the arithmetic symbols are
         + addition
         - subtraction
         * multiplication
         / division
         ** exponentiation
-    If you want to be fancy, `import math` is run right before the formula is evaluated,
-    so you can use functions from this module too.
+    If you want to be fancy, you can use functions from Python's math module (e.g. math.sqrt(k)),
+    as well as abs, float, int, max, min, pow and round.
 """),
             DefaultNamedSmallTextbox(identifier=self.html_ids["Formula"],
                                      title="Scoring formula",
@@ -425,7 +420,12 @@ Syntax:
         ]
 
     def answer_set_formula(self, html_response):
-        self.gsdb_set("Formula", html_response[self.html_ids["Formula"]])
+        formula = html_response[self.html_ids["Formula"]]
+        try:
+            compile_formula(formula)
+        except InvalidFormulaException as e:
+            return [Label(f"[SCORING] Scoring formula not set: {e}")]
+        self.gsdb_set("Formula", formula)
         return [Label("[SCORING] Set scoring formula.")]
 
     def formula_is_valid(self, formula: Optional[str] = None) -> bool:
@@ -440,17 +440,11 @@ Syntax:
         """
         if formula is None:
             formula = self.gsdb_get("Formula")
-        # since we don't have the formula parser yet,
-        # we crudely use a try-except evaluating the expression
-        a = 0
-        b = 0
-        c = 0
-        k = 0
-        import math
+        # as well as compiling, the formula must work for a player with no kills, conkers, bonus or attempts
         try:
-            eval(formula)
+            compile_formula(formula)(k=0, c=0, b=0, a=0)
             return True
-        except Exception:
+        except (InvalidFormulaException, ArithmeticError, ValueError, TypeError):
             return False
 
     def _generate_openseason_page(self, navbar_entries: List[NavbarEntry]):
@@ -463,32 +457,17 @@ Syntax:
         if not self.formula_is_valid(formula):
             return [Label("[WARNING] [SCORING] Invalid scoring formula -- skipping openseason page!")]
 
-        # need to include hidden assassins so that resurrecting as part of the city watch doesn't stop kills counting
-        score_manager = ScoreManager(ASSASSINS_DATABASE.get_identifiers(include=lambda a: not a.is_city_watch,
-                                                                        include_hidden=True),
-                                     formula=formula,
-                                     bonuses={
-                                         ident: self.aps_get(ident, "Bonus")
-                                         for ident in ASSASSINS_DATABASE.get_identifiers(include_hidden=True)
-                                     })
-        events = sorted(EVENTS_DATABASE.events.values(),
-                        key=lambda e: e.datetime)
-        openseason_end = get_game_end() or get_now_dt()
-        for e in events:
-            # stops the duel changing the openseason page
-            if e.datetime > openseason_end:
-                break
-            score_manager.add_event(e)
+        replay = current_replay()
+        score_manager = self.register_openseason_manager(replay)
+        replay.run()
 
-        table_str = "Something went wrong..."
+        table_chunks = "Something went wrong..."
         if score_manager.live_assassins:
-            # score_manager caches score, so calling twice is fine!
-            # *negative* of score is used for sorting so that high scorers end up at the top of the page
-            live_assassins = sorted((ASSASSINS_DATABASE.get(ident) for ident in score_manager.live_assassins
-                                     if not ASSASSINS_DATABASE.get(ident).hidden),
-                                    key=lambda a: (-score_manager.get_score(a), a.college.lower(), a.real_name.lower()))
+            table = StatsTable(score_manager, (a for a in map(ASSASSINS_DATABASE.get, score_manager.live_assassins)
+                                               if not a.hidden))
             rows = []
-            for a in live_assassins:
+            for i in table.by_score():
+                a = table.assassins[i]
                 rows.append(
                     OPENSEASON_ROW_TEMPLATE.format(
                         NAME=a.real_name,
@@ -496,20 +475,20 @@ Syntax:
                         COLLEGE=a.college,
                         WATER_STATUS=a.water_status,
                         NOTES=a.notes,
-                        POINTS=score_manager.get_score(a)
+                        POINTS=table.scores[i]
                     )
                 )
-            table_str = OPENSEASON_TABLE_TEMPLATE.format(ROWS="".join(rows))
+            table_chunks = OPENSEASON_TABLE_TEMPLATE.chunks(ROWS=rows)
 
         navbar_entries.append(OPENSEASON_NAVBAR_ENTRY)
 
-        with open(WEBPAGE_WRITE_LOCATION / OPENSEASON_NAVBAR_ENTRY.url, "w+", encoding="utf-8") as F:
-            F.write(
-                OPENSEASON_PAGE_TEMPLATE.format(
-                    YEAR=get_now_dt().year,
-                    TABLE=table_str
-                )
+        PAGE_MANIFEST.write_page(
+            OPENSEASON_NAVBAR_ENTRY.url,
+            OPENSEASON_PAGE_TEMPLATE.chunks(
+                YEAR=get_now_dt().year,
+                TABLE=table_chunks
             )
+        )
 
         return [Label("[SCORING] Generated openseason page.")]
 
@@ -536,6 +515,43 @@ Syntax:
             ])
         return components
 
+    def register_openseason_manager(self, replay: Replay) -> ScoreManager:
+        formula = self.gsdb_get("Formula")
+        # need to include hidden assassins so that resurrecting as part of the city watch doesn't stop kills counting
+        return replay.register(
+            ("ScoreManager", "openseason"),
+            lambda: ScoreManager(ASSASSINS_DATABASE.get_identifiers(include=lambda a: not a.is_city_watch,
+                                                                    include_hidden=True),
+                                 formula=formula,
+                                 bonuses={
+                                     ident: self.aps_get(ident, "Bonus")
+                                     for ident in ASSASSINS_DATABASE.get_identifiers(include_hidden=True)
+                                 }),
+            # stops the duel changing the openseason page
+            until=get_game_end() or replay.now,
+            checkpoint=True
+        )
+
+    def register_stats_manager(self, replay: Replay) -> ScoreManager:
+        # use a score manager to count kills, conkers, and attempts
+        full_players = ASSASSINS_DATABASE.get_filtered(include=lambda a: not a.is_city_watch,
+                                                       include_hidden=lambda a: not a.is_city_watch)
+        formula = self.gsdb_get("Formula")
+        openseason_end = get_game_end()
+        return replay.register(
+            ("ScoreManager", "stats"),
+            lambda: ScoreManager({a.identifier for a in full_players}, formula=formula, game_end=openseason_end),
+            checkpoint=True
+        )
+
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        open_season_start = timestamp_to_dt(self.gsdb_get("Start"))
+        if open_season_start and open_season_start < replay.now and self.formula_is_valid(self.gsdb_get("Formula")):
+            self.register_openseason_manager(replay)
+        if htmlResponse.get(self.html_ids["Generate Stats Page?"], "False") == "True" \
+                and self.formula_is_valid(self.gsdb_get("Formula") or DEFAULT_FORMULA):
+            self.register_stats_manager(replay)
+
     def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
         components = []
         components.extend(self._generate_openseason_page(navbar_entries))
@@ -43,7 +43,8 @@ class FailedToCreateChainException(Exception):
 def filter_to_targetable(idents: Iterable[str]) -> List[str]:
     """Filters an iterable of assassin identifiers to a list of only those that are involved in targeting,
     i.e. full players"""
-    return [ident for ident in idents if not ASSASSINS_DATABASE.get(ident).is_city_watch]
+    city_watch = ASSASSINS_DATABASE.get_city_watch_identifiers(include_hidden=True)
+    return [ident for ident in idents if ident not in city_watch]
 
 
 @registered_plugin
@@ -1,6 +1,6 @@
 import os
 from html import escape
-from typing import List
+from typing import List, Optional, Tuple
 
 from AU2 import ROOT_DIR
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
@@ -13,12 +13,14 @@ from AU2.html_components.MetaComponents.Dependency import Dependency
 from AU2.html_components.SimpleComponents.Label import Label
 from AU2.plugins.AbstractPlugin import AbstractPlugin, AttributePairTableRow, NavbarEntry
 from AU2.plugins.CorePlugin import PLUGINS, registered_plugin
-from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
 from AU2.plugins.custom_plugins.SRCFPlugin import Email
 from AU2.plugins.util.CityWatchRankManager import CityWatchRankManager, AUTO_RANK_DEFAULT, CITY_WATCH_KILLS_RANKUP_DEFAULT, \
     DEFAULT_RANKS, DEFAULT_CITY_WATCH_RANK
 from AU2.plugins.util.WantedManager import WantedManager
 from AU2.plugins.util.date_utils import get_now_dt
+from AU2.plugins.util.page_manifest import PAGE_MANIFEST
+from AU2.plugins.util.render_utils import PageTemplate
+from AU2.plugins.util.replay import Replay, current_replay
 
 PLAYER_TABLE_TEMPLATE = """
 <p xmlns="">
@@ -70,9 +72,9 @@ NO_DEAD_WANTED_PLAYERS = """<p xmlns="">No Wanted players have been killed... ye
 
 WANTED_NAVBAR_ENTRY = NavbarEntry("wanted.html", "Wanted list", 1)
 
-WANTED_PAGE: str
+WANTED_PAGE: PageTemplate
 with open(os.path.join(ROOT_DIR, "plugins", "custom_plugins", "html_templates", "wanted.html"), "r", encoding="utf-8", errors="ignore") as F:
-    WANTED_PAGE = F.read()
+    WANTED_PAGE = PageTemplate(F.read())
 
 
 @registered_plugin
@@ -155,29 +157,35 @@ class WantedPlugin(AbstractPlugin):
             results.append((f"Wanted redemption ({name} {sec_id})", redemption))
         return results
 
-    def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
-        messages = []
-        # sort by datetime to ensure we read events in chronological order
+    def register_managers(self, replay: Replay) -> Tuple[WantedManager, Optional[CityWatchRankManager]]:
+        # events are given to managers in chronological order
         # (umpires messing with event timings could affect the canon timeline!)
-        events = sorted(list(EVENTS_DATABASE.events.values()), key=lambda event: event.datetime)
+        wanted_manager = replay.register("WantedManager", WantedManager, checkpoint=True)
+        city_watch_rank_manager = None
+        if GENERIC_STATE_DATABASE.plugin_map.get("CityWatchPlugin", False):
+            auto_ranking = GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get(
+                "CityWatchPlugin_auto_rank", AUTO_RANK_DEFAULT)
+            city_watch_kill_ranking = GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get(
+                "CityWatchPlugin_city_watch_kills_rankup", CITY_WATCH_KILLS_RANKUP_DEFAULT)
+            city_watch_rank_manager = replay.register(
+                ("CityWatchRankManager", auto_ranking, city_watch_kill_ranking),
+                lambda: CityWatchRankManager(auto_ranking=auto_ranking, city_watch_kill_ranking=city_watch_kill_ranking),
+                checkpoint=True
+            )
+        return wanted_manager, city_watch_rank_manager
 
-        city_watch_ranks_enabled = GENERIC_STATE_DATABASE.plugin_map.get("CityWatchPlugin", False)
+    def on_page_replay(self, htmlResponse, replay: Replay):
+        self.register_managers(replay)
 
-        wanted_manager = WantedManager()
-        if city_watch_ranks_enabled:
-            city_watch_rank_manager = CityWatchRankManager(
-                auto_ranking=GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get(
-                    "CityWatchPlugin_auto_rank", AUTO_RANK_DEFAULT),
-                city_watch_kill_ranking=GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get(
-                    "CityWatchPlugin_city_watch_kills_rankup", CITY_WATCH_KILLS_RANKUP_DEFAULT)
-            )
-            for e in events:
-                city_watch_rank_manager.add_event(e)
+    def on_page_generate(self, htmlResponse, navbar_entries) -> List[HTMLComponent]:
+        messages = []
+        replay = current_replay()
+        wanted_manager, city_watch_rank_manager = self.register_managers(replay)
+        replay.run()
+        city_watch_ranks_enabled = city_watch_rank_manager is not None
+        if city_watch_rank_manager is not None:
             messages += city_watch_rank_manager.generate_new_ranks_if_necessary()
 
-        for e in events:
-            wanted_manager.add_event(e)
-
         wanted_players = wanted_manager.get_live_wanted_players(city_watch=False)
         wanted_city_watch = wanted_manager.get_live_wanted_players(city_watch=True)
         wanted_player_deaths = wanted_manager.get_wanted_player_deaths(city_watch=False)
@@ -273,20 +281,19 @@ class WantedPlugin(AbstractPlugin):
             if not (wanted_city_watch_deaths or wanted_player_deaths):
                 tables.append(NO_DEAD_WANTED_PLAYERS)
 
-        with open(WEBPAGE_WRITE_LOCATION / WANTED_NAVBAR_ENTRY.url, "w+", encoding="utf-8", errors="ignore") as F:
-            F.write(
-                WANTED_PAGE.format(
-                    CONTENT="\n".join(tables),
-                    YEAR=get_now_dt().year
-                )
+        PAGE_MANIFEST.write_page(
+            WANTED_NAVBAR_ENTRY.url,
+            WANTED_PAGE.chunks(
+                CONTENT="\n".join(tables),
+                YEAR=get_now_dt().year
             )
+        )
         messages.append(Label("[WANTED] Success!"))
         return messages
 
     def on_hook_respond(self, hook: str, html_response, data) -> List[HTMLComponent]:
         if hook == "SRCFPlugin_email":
-            events = list(EVENTS_DATABASE.events.values())
-            events.sort(key=lambda event: event.datetime)
+            events = list(EVENTS_DATABASE.iter_chronological())
 
             wanted_manager = WantedManager()
             for e in events:
@@ -36,10 +36,8 @@ class PlayerNotDead(SanityCheck):
         suggestions = []
         to_fix = self._gather_incorrect(e)
         for original, secret_id in to_fix.items():
-            assassin_match = lambda a: a._secret_id == secret_id
-            alist = ASSASSINS_DATABASE.get_filtered(include=assassin_match, include_hidden=assassin_match)
-            if len(alist) == 1:
-                a = alist[0]
+            a = ASSASSINS_DATABASE.get_by_secret_id(secret_id)
+            if a is not None:
                 suggestions.append(
                     Suggestion(
                         data={
@@ -0,0 +1,215 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, NamedTuple
+
+# file name -> SHA-256 of its contents
+Manifest = Dict[str, str]
+
+BackupDiff = NamedTuple("BackupDiff", (
+    ("added", List[str]),
+    ("removed", List[str]),
+    ("changed", List[str]),
+))
+
+
+class BackupStore:
+    """
+    Keeps backups of the database files in a directory.
+
+    Each distinct file is stored once, gzipped and named by the SHA-256 of its contents (under `blobs/`), and each
+    backup is a small manifest (under `manifests/`) listing the files it contains by hash. A backup in which most files
+    haven't changed since the last one therefore costs little more than its manifest.
+
+    Backups made before this store existed (folders of plain copies of the files) are still listed and can be
+    restored, compared and pruned.
+    """
+    BLOBS = "blobs"
+    MANIFESTS = "manifests"
+    RESERVED = {BLOBS, MANIFESTS}
+
+    def __init__(self, location: str):
+        self.location = location
+
+    @staticmethod
+    def _valid_name(name: str) -> bool:
+        """
+        Returns whether `name` can safely be joined onto a path as the name of a backup or a file in one, i.e. it
+        can't refer to anything outside the directory (e.g. "../../database").
+        """
+        separators = {"/", os.sep, os.altsep} - {None}
+        return bool(name) and ".." not in name and not any(sep in name for sep in separators)
+
+    def _check_name(self, name: str):
+        if not self._valid_name(name):
+            raise ValueError(f"Invalid name {name!r}: names can't be empty or contain path separators or '..'")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.location, self.BLOBS, digest[:2], digest + ".gz")
+
+    def _manifest_path(self, name: str) -> str:
+        self._check_name(name)
+        return os.path.join(self.location, self.MANIFESTS, name + ".json")
+
+    def _legacy_path(self, name: str) -> str:
+        self._check_name(name)
+        return os.path.join(self.location, name)
+
+    def _is_legacy(self, name: str) -> bool:
+        return self._valid_name(name) and name not in self.RESERVED and os.path.isdir(self._legacy_path(name))
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # flushed to disk before being renamed into place, as in atomic_files, so a crash can't leave a truncated file
+        with open(path + ".tmp", "wb") as F:
+            F.write(data)
+            F.flush()
+            os.fsync(F.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write(path, gzip.compress(data, mtime=0))
+        return digest
+
+    def _read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as F:
+            return gzip.decompress(F.read())
+
+    def _read_manifest(self, name: str) -> Dict:
+        with open(self._manifest_path(name), "r") as F:
+            return json.load(F)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self._manifest_path(name)) or self._is_legacy(name)
+
+    def create(self, name: str, source_dir: str, files: List[str]) -> Manifest:
+        """
+        Backs up the given files (names relative to `source_dir`) under `name`.
+
+        Raises:
+            FileExistsError: if there is already a backup called `name`
+            ValueError: if `name` isn't a valid backup name
+        """
+        if name in self.RESERVED or self.exists(name):
+            raise FileExistsError(f"There is already a backup called {name}")
+        manifest = {}
+        for f in files:
+            with open(os.path.join(source_dir, f), "rb") as F:
+                manifest[f] = self._put_blob(F.read())
+        path = self._manifest_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        manifest_json = json.dumps({"created": datetime.datetime.now().timestamp(), "files": manifest}, indent=4)
+        self._write(path, manifest_json.encode())
+        return manifest
+
+    def _created(self, name: str) -> float:
+        if self._is_legacy(name):
+            return os.path.getmtime(self._legacy_path(name))
+        return self._read_manifest(name)["created"]
+
+    def list_backups(self) -> List[str]:
+        """
+        Returns the names of all backups, newest first.
+        """
+        names = []
+        if os.path.isdir(os.path.join(self.location, self.MANIFESTS)):
+            names += [f[:-len(".json")] for f in os.listdir(os.path.join(self.location, self.MANIFESTS))
+                      if f.endswith(".json")]
+        if os.path.isdir(self.location):
+            names += [f for f in os.listdir(self.location) if self._is_legacy(f)]
+        return sorted(set(names), key=lambda n: (self._created(n), n), reverse=True)
+
+    def files(self, name: str) -> Manifest:
+        """
+        Returns the files in a backup, mapped to the hashes of their contents.
+        """
+        if self._is_legacy(name):
+            manifest = {}
+            for f in os.listdir(self._legacy_path(name)):
+                with open(os.path.join(self._legacy_path(name), f), "rb") as F:
+                    manifest[f] = hashlib.sha256(F.read()).hexdigest()
+            return manifest
+        return self._read_manifest(name)["files"]
+
+    def read(self, name: str, f: str) -> bytes:
+        """
+        Returns the contents of a file in a backup.
+        """
+        if self._is_legacy(name):
+            with open(os.path.join(self._legacy_path(name), f), "rb") as F:
+                return F.read()
+        return self._read_blob(self.files(name)[f])
+
+    def restore(self, name: str, target_dir: str) -> List[str]:
+        """
+        Writes the files in a backup into `target_dir`, overwriting any existing files of the same names.
+
+        Returns:
+            the names of the files written
+        """
+        written = []
+        for f in self.files(name):
+            self._check_name(f)
+            self._write(os.path.join(target_dir, f), self.read(name, f))
+            written.append(f)
+        return written
+
+    def diff(self, old: str, new: str) -> BackupDiff:
+        """
+        Compares two backups by the hashes of their files, without reading the files themselves.
+        """
+        old_files = self.files(old)
+        new_files = self.files(new)
+        return BackupDiff(
+            added=sorted(set(new_files) - set(old_files)),
+            removed=sorted(set(old_files) - set(new_files)),
+            changed=sorted(f for f in set(old_files) & set(new_files) if old_files[f] != new_files[f]),
+        )
+
+    def delete(self, name: str):
+        if self._is_legacy(name):
+            shutil.rmtree(self._legacy_path(name))
+        else:
+            os.remove(self._manifest_path(name))
+
+    def collect_garbage(self) -> int:
+        """
+        Deletes the stored files that no backup refers to any more.
+
+        Returns:
+            the number of files deleted
+        """
+        blobs_dir = os.path.join(self.location, self.BLOBS)
+        if not os.path.isdir(blobs_dir):
+            return 0
+        referenced = set()
+        for name in self.list_backups():
+            if not self._is_legacy(name):
+                referenced.update(self.files(name).values())
+        deleted = 0
+        for prefix in os.listdir(blobs_dir):
+            for f in os.listdir(os.path.join(blobs_dir, prefix)):
+                if f[:-len(".gz")] not in referenced:
+                    os.remove(os.path.join(blobs_dir, prefix, f))
+                    deleted += 1
+        return deleted
+
+    def prune(self, keep: int) -> List[str]:
+        """
+        Deletes all but the `keep` newest backups, along with any stored files only they referred to.
+
+        Returns:
+            the names of the backups deleted
+        """
+        deleted = self.list_backups()[keep:]
+        for name in deleted:
+            self.delete(name)
+        self.collect_garbage()
+        return deleted
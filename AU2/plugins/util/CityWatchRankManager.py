@@ -1,4 +1,6 @@
-from collections import defaultdict
+import bisect
+import datetime
+from typing import Dict, List, Optional, Tuple
 
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
@@ -19,60 +21,118 @@ CITY_WATCH_KILLS_RANKUP_DEFAULT = True
 class CityWatchRankManager:
     """
     Simple manager for city watch ranks
+
+    The umpires, cops and rank names are read from the config once, when the manager is made. The highest and lowest
+    ranks are kept up to date as events are added, along with a timeline of each player's rank so that ranks at an
+    earlier time can be looked up.
     """
 
     def __init__(self, auto_ranking, city_watch_kill_ranking):
-        self.assassin_relative_ranks = defaultdict(lambda: 0)
+        self.assassin_relative_ranks: Dict[str, int] = {}
         self.activated = GENERIC_STATE_DATABASE.plugin_map.get("CityWatchPlugin", False)
         self.auto_ranking = auto_ranking
         self.city_watch_kill_ranking = city_watch_kill_ranking
 
+        config = GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {})
+        self.umpires = frozenset(config.get("CityWatchPlugin_umpires", []))
+        self.cops = frozenset(config.get("CityWatchPlugin_cop", []))
+        self.ranks: List[str] = list(config.get("CityWatchPlugin_ranks", DEFAULT_RANKS))
+        self.default_rank = int(config.get("CityWatchPlugin_default_rank", DEFAULT_CITY_WATCH_RANK))
+
+        # how many players have each rank, and the lowest and highest of them (None if there are no players yet)
+        self.rank_counts: Dict[int, int] = {}
+        self.min_rank: Optional[int] = None
+        self.max_rank: Optional[int] = None
+        # for each player, the times of the events that changed their rank, and their rank after each
+        self.rank_timeline: Dict[str, Tuple[List[datetime.datetime], List[int]]] = {}
+        # the times of the events that changed the highest rank, and the highest rank after each
+        self.max_rank_timeline: Tuple[List[datetime.datetime], List[int]] = ([], [])
+
+    def _add_to_rank(self, player_id: str, change: int, time: Optional[datetime.datetime] = None):
+        old = self.assassin_relative_ranks.get(player_id)
+        new = (old or 0) + change
+        self.assassin_relative_ranks[player_id] = new
+        if old is not None:
+            self.rank_counts[old] -= 1
+            if not self.rank_counts[old]:
+                del self.rank_counts[old]
+        self.rank_counts[new] = self.rank_counts.get(new, 0) + 1
+
+        old_max = self.max_rank
+        if self.max_rank is None or new > self.max_rank:
+            self.max_rank = new
+        elif old == self.max_rank and old not in self.rank_counts:
+            self.max_rank = max(self.rank_counts)
+        if self.min_rank is None or new < self.min_rank:
+            self.min_rank = new
+        elif old == self.min_rank and old not in self.rank_counts:
+            self.min_rank = min(self.rank_counts)
+
+        if time is not None:
+            times, ranks = self.rank_timeline.setdefault(player_id, ([], []))
+            times.append(time)
+            ranks.append(new)
+            if self.max_rank != old_max:
+                self.max_rank_timeline[0].append(time)
+                self.max_rank_timeline[1].append(self.max_rank)
+
     def add_event(self, e: Event):
         for (aID, rank) in e.pluginState.get("CityWatchPlugin", {}).items():
-            self.assassin_relative_ranks[aID] += rank
+            self._add_to_rank(aID, rank, e.datetime)
         if self.auto_ranking:
             for (killer, victim) in e.kills:
                 if not ASSASSINS_DATABASE.get(killer).is_city_watch:
                     continue
-                if (killer in GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_umpires", [])
-                        or killer in GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_cop", [])):
+                if killer in self.umpires or killer in self.cops:
                     continue
                 if self.city_watch_kill_ranking:
-                    self.assassin_relative_ranks[killer] += 1
+                    self._add_to_rank(killer, 1, e.datetime)
                 elif not ASSASSINS_DATABASE.get(victim).is_city_watch:
-                    self.assassin_relative_ranks[killer] += 1
+                    self._add_to_rank(killer, 1, e.datetime)
 
     def get_min_rank(self):
-        try:
-            return min(self.assassin_relative_ranks.values())
-        except ValueError:
-            return 0
+        return self.min_rank if self.min_rank is not None else 0
 
     def get_max_rank(self):
-        try:
-            return max(self.assassin_relative_ranks.values())
-        except ValueError:
-            return 0
+        return self.max_rank if self.max_rank is not None else 0
 
     def get_relative_rank(self, player_id: str):
-        if player_id in GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_umpires", []):
+        if player_id in self.umpires:
             return self.get_max_rank() + 2
-        if player_id in GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_cop", []):
+        if player_id in self.cops:
             return self.get_max_rank() + 1
+        if player_id not in self.assassin_relative_ranks:
+            # players without a rank are counted as having the default one from now on
+            self._add_to_rank(player_id, 0)
         return self.assassin_relative_ranks[player_id]
 
     def get_rank_name(self, player_id: str):
-        return GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_ranks", DEFAULT_RANKS)[
-            self.get_relative_rank(player_id)
-            + int(GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_default_rank", DEFAULT_CITY_WATCH_RANK))
-        ]
+        return self.ranks[self.get_relative_rank(player_id) + self.default_rank]
+
+    def get_relative_rank_at(self, player_id: str, time: datetime.datetime) -> int:
+        """
+        Returns the rank a player had after the events up to and including `time`
+        """
+        times, ranks = self.max_rank_timeline if player_id in self.umpires or player_id in self.cops \
+            else self.rank_timeline.get(player_id, ((), ()))
+        i = bisect.bisect_right(times, time)
+        rank = ranks[i - 1] if i else 0
+        if player_id in self.umpires:
+            return rank + 2
+        if player_id in self.cops:
+            return rank + 1
+        return rank
+
+    def get_rank_name_at(self, player_id: str, time: datetime.datetime) -> str:
+        return self.ranks[self.get_relative_rank_at(player_id, time) + self.default_rank]
 
     def generate_new_ranks_if_necessary(self):
         # Code to generate new ranks if city watch members are promoted/demoted more than ever before
         # This will add them to the database to be renamed by the umpire
         message = []
         default_rank = int(GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_default_rank", DEFAULT_CITY_WATCH_RANK))
-        rank_list = GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_ranks", DEFAULT_RANKS)
+        # (copied, so that DEFAULT_RANKS isn't changed)
+        rank_list = list(GENERIC_STATE_DATABASE.arb_state.get("CityWatchPlugin", {}).get("CityWatchPlugin_ranks", DEFAULT_RANKS))
         if self.get_min_rank() < -default_rank:
             current_ranks = rank_list
             current_default = default_rank
@@ -90,4 +150,7 @@ class CityWatchRankManager:
                 current_ranks.insert(-2, f"Level {len(current_ranks) - 2} Constable")
             GENERIC_STATE_DATABASE.arb_state.setdefault("CityWatchPlugin", {})["CityWatchPlugin_ranks"] = current_ranks
             message.append(Label("[CITY WATCH] Warning: New ranks generated above existing. Rename them in the config"))
+            rank_list = current_ranks
+        self.ranks = rank_list
+        self.default_rank = int(default_rank)
         return message
@@ -1,7 +1,8 @@
+import bisect
 import datetime
 
 from collections import defaultdict
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
@@ -17,12 +18,21 @@ ID_DEFAULT_EXTN = "DEFAULT_EXTN"
 class CompetencyManager:
     """
     Simple manager for competency
+
+    As well as each player's current deadline, this keeps a timeline of how each player's deadline changed as events
+    were added, so that once all the events have been added it can say who was incompetent at any earlier time
+    (see `was_inco_at` and `get_incos_as_of`).
     """
 
     def __init__(self, game_start: datetime.datetime):
         # from assassin ID to deadline
-        self.deadlines = defaultdict(lambda: self.game_start + self.initial_competency_period)
+        self.deadlines = defaultdict(self._initial_deadline)
+        # from assassin ID to the times of the events that changed their deadline and their deadline after each,
+        # both sorted, for bisection
+        self.deadline_history: Dict[str, Tuple[List[datetime.datetime], List[datetime.datetime]]] = {}
         self.inco_corpses: List[Assassin] = []
+        # time of death of each of `inco_corpses`
+        self.inco_corpse_times: List[datetime.datetime] = []
         self.game_start = game_start
         self.initial_competency_period = datetime.timedelta(days=GENERIC_STATE_DATABASE.arb_int_state.get(ID_GAME_START, DEFAULT_START_COMPETENCY))
         self.activated = GENERIC_STATE_DATABASE.plugin_map.get("CompetencyPlugin", False)
@@ -31,16 +41,44 @@ class CompetencyManager:
         self.attempts_since_kill = defaultdict(int)
         self.death_manager = DeathManager()
 
+    def _initial_deadline(self) -> datetime.datetime:
+        return self.game_start + self.initial_competency_period
+
+    # snapshots (see checkpoints.py) refer to assassins by identifier, so that restoring one gives the database's
+    # assassins
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["deadlines"] = dict(self.deadlines)
+        state["inco_corpses"] = [a.identifier for a in self.inco_corpses]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.deadlines = defaultdict(self._initial_deadline, state["deadlines"])
+        self.inco_corpses = [ASSASSINS_DATABASE.get(identifier) for identifier in state["inco_corpses"]]
+
+    def _extend_deadline(self, identifier: str, time: datetime.datetime, deadline: datetime.datetime):
+        """
+        Moves a player's deadline to `deadline` (as of `time`), if that is later than their current deadline
+        """
+        if deadline <= self.deadlines[identifier]:
+            return
+        self.deadlines[identifier] = deadline
+        times, deadlines = self.deadline_history.setdefault(identifier, ([], []))
+        if times and times[-1] == time:
+            deadlines[-1] = deadline
+        else:
+            times.append(time)
+            deadlines.append(deadline)
+
     def add_event(self, e: Event):
         for (aID, extn) in e.pluginState.get("CompetencyPlugin", {}).get("competency", {}).items():
-            self.deadlines[aID] = max(
-                self.deadlines[aID],
-                e.datetime + datetime.timedelta(days=extn)
-            )
+            self._extend_deadline(aID, e.datetime, e.datetime + datetime.timedelta(days=extn))
         for (_, victim) in e.kills:
             victim_model = ASSASSINS_DATABASE.get(victim)
             if self.is_inco_at(victim_model, e.datetime):
                 self.inco_corpses.append(victim_model)
+                self.inco_corpse_times.append(e.datetime)
         if self.auto_competency:
             for (killer, victim) in e.kills:
                 victim_model = ASSASSINS_DATABASE.get(victim)
@@ -50,12 +88,9 @@ class CompetencyManager:
                 # Allows overriding auto competency on a case-by-case basis
                 if killer in e.pluginState.get("CompetencyPlugin", {}).get("competency", {}):
                     continue
-                self.deadlines[killer] = max(
-                    self.deadlines[killer],
-                    e.datetime + datetime.timedelta(
-                        days=e.pluginState.get("CompetencyPlugin", {})
-                            .get("current_default", GENERIC_STATE_DATABASE.arb_int_state.get(ID_DEFAULT_EXTN, DEFAULT_EXTENSION)))
-                )
+                self._extend_deadline(killer, e.datetime, e.datetime + datetime.timedelta(
+                    days=e.pluginState.get("CompetencyPlugin", {})
+                        .get("current_default", GENERIC_STATE_DATABASE.arb_int_state.get(ID_DEFAULT_EXTN, DEFAULT_EXTENSION))))
 
             for assassin_id in e.pluginState.get("CompetencyPlugin", {}).get("attempts", []):
                 # Logic for not increasing attempts if player got a player kill in same event.
@@ -70,12 +105,9 @@ class CompetencyManager:
                 if self.attempts_since_kill[assassin_id] % 2 or assassin_id in e.pluginState\
                         .get("CompetencyPlugin", {}).get("competency", {}):
                     continue
-                self.deadlines[assassin_id] = max(
-                    self.deadlines[assassin_id],
-                    e.datetime + datetime.timedelta(
-                        days=e.pluginState.get("CompetencyPlugin", {})
-                            .get("current_default", GENERIC_STATE_DATABASE.arb_int_state.get(ID_DEFAULT_EXTN, DEFAULT_EXTENSION)))
-                )
+                self._extend_deadline(assassin_id, e.datetime, e.datetime + datetime.timedelta(
+                    days=e.pluginState.get("CompetencyPlugin", {})
+                        .get("current_default", GENERIC_STATE_DATABASE.arb_int_state.get(ID_DEFAULT_EXTN, DEFAULT_EXTENSION))))
 
             self.death_manager.add_event(e)
 
@@ -96,4 +128,33 @@ class CompetencyManager:
         return [a for a in ASSASSINS_DATABASE.assassins.values() if self.is_inco_at(a, date)]
 
     def get_deadline_for(self, a: Assassin) -> Optional[datetime.datetime]:
-        return self.deadlines[a.identifier]  # deadlines is a defaultdict
\ No newline at end of file
+        return self.deadlines[a.identifier]  # deadlines is a defaultdict
+
+    def get_deadline_at(self, a: Assassin, date: datetime.datetime) -> datetime.datetime:
+        """
+        Returns the deadline the assassin had at `date`, i.e. as set by the events up to and including `date`
+        """
+        times, deadlines = self.deadline_history.get(a.identifier, ([], []))
+        i = bisect.bisect_right(times, date)
+        return deadlines[i - 1] if i else self._initial_deadline()
+
+    def was_inco_at(self, a: Assassin, date: datetime.datetime) -> bool:
+        """
+        As `is_inco_at`, but only taking into account the events up to and including `date`, so that e.g. the incos at
+        some point in the past can be found after all events have been added
+        """
+        return self.activated and not a.is_city_watch and self.get_deadline_at(a, date) < date
+
+    def get_incos_as_of(self, date: datetime.datetime) -> List[Assassin]:
+        """
+        Returns all assassins who were incompetent at `date` (see `was_inco_at`)
+        """
+        if not self.activated:
+            return []
+        return [a for a in ASSASSINS_DATABASE.assassins.values() if self.was_inco_at(a, date)]
+
+    def get_inco_corpses_as_of(self, date: datetime.datetime) -> List[Assassin]:
+        """
+        Returns the assassins who died while incompetent, up to and including `date`
+        """
+        return self.inco_corpses[:bisect.bisect_right(self.inco_corpse_times, date)]
\ No newline at end of file
@@ -1,6 +1,7 @@
 from collections import defaultdict
 from typing import List, Dict
 
+from AU2.database.EventsDatabase import EVENTS_DATABASE
 from AU2.database.model import Event, Assassin
 
 
@@ -15,6 +16,15 @@ class DeathManager:
                 self.deaths[victim].append(e)
                 event_deaths.add(victim)
 
+    # snapshots (see checkpoints.py) refer to events by identifier, so that restoring one gives the database's events
+    def __getstate__(self):
+        return {victim: [e.identifier for e in events] for (victim, events) in self.deaths.items()}
+
+    def __setstate__(self, state):
+        self.deaths = defaultdict(list)
+        for (victim, identifiers) in state.items():
+            self.deaths[victim] = [EVENTS_DATABASE.get(identifier) for identifier in identifiers]
+
     def get_dead(self) -> List[str]:
         return list(self.deaths)
 
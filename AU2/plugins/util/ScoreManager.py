@@ -1,12 +1,14 @@
-import functools
 import datetime
 from collections import defaultdict
-from typing import Dict, List, Set, Optional, Iterable
+from typing import Dict, List, Set, Optional, Iterable, Iterator, Tuple
 
 from AU2.database.model import Event, Assassin
 from AU2.plugins.util.DeathManager import DeathManager
 from AU2.plugins.util.date_utils import dt_to_timestamp, get_now_dt
-# TODO: from ??? import calculate_formula
+from AU2.plugins.util.formula import CompiledFormula, compile_formula
+
+# score used when no formula has been set
+DEFAULT_FORMULA = "c"
 
 
 class ScoreManager:
@@ -19,15 +21,20 @@ class ScoreManager:
         self.kill_tree: Dict[str, List[str]] = defaultdict(list)
         self.attempt_counter: Dict[str, int] = {}
         self.live_assassins = set(assassin_ids)
+        self.assassin_ids = frozenset(self.live_assassins)
         self.formula = formula
         self.bonuses = bonuses
         self.perma_death = perma_death
         self.game_end = game_end
         self.death_manager = DeathManager()
+        # conkers and scores of every player, worked out when first needed after each event
+        self.conkers: Optional[Dict[str, int]] = None
+        self.scores: Optional[Dict[str, float]] = None
 
     def add_event(self, e: Event):
         # adding an event invalidates the cache
-        self._score.cache_clear()
+        self.conkers = None
+        self.scores = None
         self.death_manager.add_event(e)
         for (killer, victim) in e.kills:
             # in regular games, live_assassins will initially only include full players,
@@ -40,18 +47,83 @@ class ScoreManager:
         for assassin_id in e.pluginState.get("CompetencyPlugin", {}).get("attempts", []):
             self.attempt_counter[assassin_id] = self.attempt_counter.get(assassin_id, 0) + 1
 
-    def _conkers(self, identifier: str, visited: Optional[Set[str]] = None) -> int:
-        if visited is None: # need to do this because we mutate visited
-            visited = set()
-        # prevent the same player giving conkers twice via different paths through the kill tree
-        # (and also deals with loops. note that players can't get conkers from themselves;
-        # we may wish to change this for a "revenge bonus")
-        # both of these should only happen without perma-death
-        if identifier in visited:
-            return -1  # cancels out the `1 +` in this term of the sum
-        else:
-            visited.add(identifier)
-        return sum((1 + self._conkers(v, visited) for v in self.kill_tree.get(identifier, [])))
+    def _count_conkers(self) -> Dict[str, int]:
+        """
+        Counts the conkers of every player in the kill tree at once, in time linear in the size of the kill tree (give or
+        take the bitwise ORs, which are of one bit per player).
+
+        A player's conkers are the number of other players reachable from them in the kill tree. Each is counted once,
+        however many paths lead to them, and players can't get conkers from themselves (we may wish to change this for
+        a "revenge bonus"). Both of these only matter without perma-death, when the kill tree can have loops and
+        players killed more than once.
+
+        Players in the same loop reach the same players, so the strongly connected components of the kill tree are
+        found (by Tarjan's algorithm, iteratively so that long chains of kills don't hit the recursion limit), and the
+        players reachable from each component worked out from those reachable from the components its kills lead to.
+        """
+        nodes = list(self.kill_tree)
+        nodes += [v for victims in self.kill_tree.values() for v in victims]
+        bits = {}
+        for n in nodes:
+            bits.setdefault(n, 1 << len(bits))
+
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        component_of: Dict[str, int] = {}
+        # for each component, the players reachable from it (including its own), as a bitset
+        reachable: List[int] = []
+        # (player, iterator over the players they killed still to visit), for the players being visited
+        work: List[Tuple[str, Iterator[str]]] = []
+
+        def visit(n: str):
+            index[n] = low[n] = len(index)
+            stack.append(n)
+            on_stack.add(n)
+            work.append((n, iter(self.kill_tree.get(n, []))))
+
+        for root in bits:
+            if root in index:
+                continue
+            visit(root)
+            while work:
+                (n, victims) = work[-1]
+                for v in victims:
+                    if v not in index:
+                        visit(v)
+                        break
+                    elif v in on_stack:
+                        low[n] = min(low[n], index[v])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[n])
+                    if low[n] == index[n]:
+                        # every component reachable from this one has already been finished
+                        component = len(reachable)
+                        members = []
+                        while True:
+                            m = stack.pop()
+                            on_stack.discard(m)
+                            component_of[m] = component
+                            members.append(m)
+                            if m == n:
+                                break
+                        r = 0
+                        for m in members:
+                            r |= bits[m]
+                            for v in self.kill_tree.get(m, []):
+                                if component_of[v] != component:
+                                    r |= reachable[component_of[v]]
+                        reachable.append(r)
+
+        return {n: bin(reachable[component_of[n]]).count("1") - 1 for n in bits}
+
+    def _conkers(self, identifier: str) -> int:
+        if self.conkers is None:
+            self.conkers = self._count_conkers()
+        return self.conkers.get(identifier, 0)
 
     def _kills(self, identifier: str) -> int:
         return len(self.kill_tree[identifier])
@@ -62,17 +134,40 @@ class ScoreManager:
     def _bonus(self, identifier: str) -> float:
         return self.bonuses.get(identifier, 0)
 
-    @functools.cache
+    def _formula(self) -> CompiledFormula:
+        return compile_formula(self.formula or DEFAULT_FORMULA)
+
+    def _score_all(self) -> Dict[str, float]:
+        """
+        Scores every player this manager knows of with a single evaluation of the formula
+        """
+        identifiers = list(self.assassin_ids | set(self.kill_tree) | set(self.attempt_counter) | set(self.bonuses))
+        # (an invalid formula raises InvalidFormulaException here, rather than once per player below)
+        formula = self._formula()
+        try:
+            scores = formula.evaluate_all(
+                k=[self._kills(i) for i in identifiers],
+                c=[self._conkers(i) for i in identifiers],
+                b=[self._bonus(i) for i in identifiers],
+                a=[self._attempts(i) for i in identifiers],
+            )
+        except (ArithmeticError, ValueError):
+            # e.g. a division by zero or a math domain error for some player. score players one at a time instead,
+            # so that there is only an error if the score of such a player is needed
+            return {}
+        return dict(zip(identifiers, scores))
+
     def _score(self, identifier: str) -> float:
-        # placeholder!
-        # TODO: should use Jamie's formula parser to calculate score
-        k = self._kills(identifier)
-        c = self._conkers(identifier)
-        b = self._bonus(identifier)
-        a = self._attempts(identifier)
-        import math
-        score = eval(self.formula) if self.formula else c
-        return score
+        if self.scores is None:
+            self.scores = self._score_all()
+        if identifier not in self.scores:
+            self.scores[identifier] = self._formula()(
+                k=self._kills(identifier),
+                c=self._conkers(identifier),
+                b=self._bonus(identifier),
+                a=self._attempts(identifier),
+            )
+        return self.scores[identifier]
 
     def get_score(self, a: Assassin) -> float:
         return self._score(a.identifier)
@@ -0,0 +1,71 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
+from AU2.database.model import Assassin, Event
+from AU2.plugins.util.ScoreManager import ScoreManager
+
+
+class StatsTable:
+    """
+    The statistics of some assassins from a ScoreManager, read out once and stored by column, one row per assassin,
+    so that pages can sort, rank and render from them without asking the manager again.
+
+    Scores and ratings are kept as they are (rather than in typed arrays), since the score formula can give either ints
+    or floats and pages show them as given.
+    """
+
+    def __init__(self, score_manager: ScoreManager, assassins: Iterable[Assassin]):
+        self.score_manager = score_manager
+        self.assassins: List[Assassin] = list(assassins)
+        self.row_of: Dict[str, int] = {a.identifier: i for (i, a) in enumerate(self.assassins)}
+        self.kills = array("q", (score_manager.get_kills(a) for a in self.assassins))
+        self.conkers = array("q", (score_manager.get_conkers(a) for a in self.assassins))
+        self.attempts = array("q", (score_manager.get_attempts(a) for a in self.assassins))
+        self.scores: List[float] = [score_manager.get_score(a) for a in self.assassins]
+        self.ratings: List[float] = [score_manager.get_rating(a) for a in self.assassins]
+        self.death_events: List[List[Event]] = [score_manager.get_death_events(a) for a in self.assassins]
+
+    def __len__(self) -> int:
+        return len(self.assassins)
+
+    def get_conkers(self, identifier: str) -> int:
+        """
+        Returns the conkers of an assassin, who needn't have a row (e.g. a city watch member in the kill tree).
+        """
+        row = self.row_of.get(identifier)
+        if row is None:
+            return self.score_manager.get_conkers(ASSASSINS_DATABASE.get(identifier))
+        return self.conkers[row]
+
+    def by_rating(self, rows: Optional[Sequence[int]] = None) -> List[int]:
+        """
+        Returns the rows (default all of them) in the order players are ranked on the stats page: by rating
+        (see ScoreManager.get_rating), and then by score.
+        """
+        rows = range(len(self)) if rows is None else rows
+        ratings, scores = self.ratings, self.scores
+        return sorted(rows, key=lambda i: (-ratings[i], -scores[i]))
+
+    def by_score(self, rows: Optional[Sequence[int]] = None) -> List[int]:
+        """
+        Returns the rows (default all of them) in the order players are listed on the open season page: high scorers
+        first, and then by college and name.
+        """
+        rows = range(len(self)) if rows is None else rows
+        scores, assassins = self.scores, self.assassins
+        return sorted(rows, key=lambda i: (-scores[i], assassins[i].college.lower(), assassins[i].real_name.lower()))
+
+    def tied_ranks(self, rows: Sequence[int]) -> List[int]:
+        """
+        Returns the ranks (from 1) of rows sorted by `by_rating`, with players on the same rating and score given the
+        same rank.
+        """
+        ranks = []
+        for (position, i) in enumerate(rows):
+            previous = rows[position - 1] if position else None
+            if previous is None or (self.ratings[previous], self.scores[previous]) != (self.ratings[i], self.scores[i]):
+                ranks.append(position + 1)
+            else:
+                ranks.append(ranks[-1])
+        return ranks
@@ -1,5 +1,6 @@
+import bisect
 import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from AU2 import TIMEZONE
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
@@ -8,70 +9,130 @@ from AU2.database.model import Event
 from AU2.plugins.util.date_utils import get_now_dt
 
 
+class WantedIntervals:
+    """
+    The periods a player was wanted (or, for the city watch, corrupt) for, as disjoint intervals [start, end) sorted by
+    start, so that whether they were wanted at a given time can be found by bisection.
+
+    A period ends early if the player dies or is given a new crime before it is up.
+    """
+
+    def __init__(self):
+        self.starts: List[datetime.datetime] = []
+        self.ends: List[datetime.datetime] = []
+        # (crime, redemption) for each interval
+        self.crimes: List[Tuple[str, str]] = []
+        # the uncut end and crime of the player's latest wanted period, unless they have died since it started
+        self.last_crime: Optional[Tuple[datetime.datetime, str]] = None
+        # deaths that cut a wanted period short (or happened just as it ended), as (time of death, crime)
+        self.deaths: List[Tuple[datetime.datetime, str]] = []
+
+    def _cut(self, time: datetime.datetime):
+        if self.ends and self.ends[-1] > time:
+            self.ends[-1] = time
+            if self.starts[-1] >= time:
+                self.starts.pop()
+                self.ends.pop()
+                self.crimes.pop()
+
+    def add_crime(self, time: datetime.datetime, duration: datetime.timedelta, crime: str, redemption: str):
+        self._cut(time)
+        if duration > datetime.timedelta(0):
+            self.starts.append(time)
+            self.ends.append(time + duration)
+            self.crimes.append((crime, redemption))
+        self.last_crime = (time + duration, crime)
+
+    def add_death(self, time: datetime.datetime):
+        self._cut(time)
+        if self.last_crime is not None and self.last_crime[0] >= time:
+            self.deaths.append((time, self.last_crime[1]))
+        self.last_crime = None
+
+    def index_at(self, time: datetime.datetime) -> Optional[int]:
+        """
+        Returns the index of the interval containing `time`, if there is one
+        """
+        i = bisect.bisect_right(self.starts, time) - 1
+        if i >= 0 and time < self.ends[i]:
+            return i
+        return None
+
+    def overlaps(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """
+        Returns whether any interval overlaps [start, end)
+        """
+        # ends are sorted too, since the intervals are disjoint
+        i = bisect.bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+
 class WantedManager:
     """
     (Not so) Simple manager for wantedness
+
+    Once all the events have been added, this can answer whether a player was wanted at any time (not just the time of
+    the latest event), so one manager can be shared by everything that needs to know.
     """
 
     def __init__(self):
         self.activated = GENERIC_STATE_DATABASE.plugin_map.get("WantedPlugin", False)
-        # Relevent events are dicts, either {event_time: datetime.datetime, wanted_duration: days, crime: str, redemption: str},
-        # or {event_time}, which represents a death at event_time. This allows for multiple deaths (for city watch or may week)
-        self.wanted_events: Dict[str, List[Dict]] = {}
+        # from player ID to the periods they were wanted for
+        self.wanted: Dict[str, WantedIntervals] = {}
 
     def add_event(self, e: Event):
         for playerID in e.pluginState.get("WantedPlugin", {}):
             duration, crime, redemption = e.pluginState["WantedPlugin"][playerID]
-            self.wanted_events.setdefault(playerID, [])
-            self.wanted_events[playerID].append({'event_time': e.datetime,
-                                                 'wanted_duration': datetime.timedelta(days=duration),
-                                                 'crime': crime,
-                                                 'redemption': redemption})
+            self.wanted.setdefault(playerID, WantedIntervals()).add_crime(
+                e.datetime, datetime.timedelta(days=duration), crime, redemption
+            )
+        # a death ends a player's wanted period, allowing for multiple deaths (for city watch or may week)
         for (killer, victim) in e.kills:
-            self.wanted_events.setdefault(victim, [])
-            self.wanted_events[victim].append({'event_time': e.datetime})
+            self.wanted.setdefault(victim, WantedIntervals()).add_death(e.datetime)
 
-    def get_live_wanted_players(self, city_watch=False):
+    def get_live_wanted_players(self, city_watch=False, time: Optional[datetime.datetime] = None):
+        """
+        Returns the players (or, if `city_watch`, the city watch) wanted at `time` (default now), mapped to the crime
+        and redemption conditions they were wanted for
+        """
+        time = time or get_now_dt()
         players = {}
-        for player_id in self.wanted_events:
+        if not self.activated:
+            return players
+        for (player_id, intervals) in self.wanted.items():
             if ASSASSINS_DATABASE.get(player_id).is_city_watch != city_watch:
                 continue
-            if self.is_player_wanted(player_id):
-                last_event = self.wanted_events[player_id][-1]
-                players[player_id] = {'crime': last_event['crime'], 'redemption': last_event['redemption']}
+            i = intervals.index_at(time)
+            if i is not None:
+                crime, redemption = intervals.crimes[i]
+                players[player_id] = {'crime': crime, 'redemption': redemption}
         return players
 
-    def is_player_wanted(self, player_id, time=get_now_dt()):
-        if not self.activated:
-            return False
-        if player_id not in self.wanted_events:
+    def is_player_wanted(self, player_id, time: Optional[datetime.datetime] = None) -> bool:
+        """
+        Returns whether the player was wanted at `time` (default now)
+        """
+        if not self.activated or player_id not in self.wanted:
             return False
-        last_event = self.wanted_events[player_id][-1]
-        if len(last_event) == 1:
-            # if a players last event is a death, then they haven't committed a post-resurrection crime, so ignore
+        return self.wanted[player_id].index_at(time or get_now_dt()) is not None
+
+    def was_player_wanted_during(self, player_id, start: datetime.datetime, end: datetime.datetime) -> bool:
+        """
+        Returns whether the player was wanted at any point from `start` up to (but not including) `end`
+        """
+        if not self.activated or player_id not in self.wanted:
             return False
-        # Check most recent event for wanted info. No support for multiple active wanted_events per player
-        if last_event['event_time'] + last_event['wanted_duration'] > time:
-            return True
+        return self.wanted[player_id].overlaps(start, end)
 
     def get_wanted_player_deaths(self, city_watch=False):
         wanted_deaths = []
-        for player_id in self.wanted_events:
+        for (player_id, intervals) in self.wanted.items():
             if ASSASSINS_DATABASE.get(player_id).is_city_watch != city_watch:
                 continue
-            for idx, wanted_event in enumerate(self.wanted_events[player_id]):
-                # ignore if not a death event, or it's a death before any wanted events
-                if len(wanted_event.keys()) != 1 or idx == 0:
-                    continue
-                preceding_event = self.wanted_events[player_id][idx-1]
-                # ignore if second death in a row
-                if len(preceding_event.keys()) == 1:
-                    continue
-                if preceding_event['event_time'] + preceding_event['wanted_duration'] >= wanted_event['event_time']:
-                    wanted_deaths.append({
-                        'player_id': player_id,
-                        'crime': preceding_event['crime'],
-                        'death_time': wanted_event['event_time']
-                    })
+            for (death_time, crime) in intervals.deaths:
+                wanted_deaths.append({
+                    'player_id': player_id,
+                    'crime': crime,
+                    'death_time': death_time
+                })
         return sorted(wanted_deaths, key=lambda x: x['death_time'])
-
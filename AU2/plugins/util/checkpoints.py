@@ -0,0 +1,168 @@
+import functools
+import hashlib
+import os
+import pickle
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from AU2 import BASE_WRITE_LOCATION, ROOT_DIR
+from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
+from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
+from AU2.database.model import Event
+from AU2.database.model.codec import encode_event
+
+# Snapshots of managers part way through replaying the events, so that a replay can start from the last snapshot
+# taken before the first event that changed, rather than from the first event.
+#
+# A snapshot taken after the first n events (in chronological order) is stored along with a fingerprint of those n
+# events and of everything else a manager might read (the assassins and the game's settings), and is only restored
+# if that fingerprint still matches.
+#
+# Only the last few snapshots of each manager are kept, since changes are nearly always to recent events (and a
+# snapshot of most managers grows with the number of events, so keeping one every CHECKPOINT_INTERVAL events would
+# take space quadratic in the number of events).
+
+CHECKPOINT_LOCATION = os.path.join(BASE_WRITE_LOCATION, "checkpoints")
+
+# a snapshot is taken every this many events (and after the last event)
+CHECKPOINT_INTERVAL = 50
+
+# how many of the latest snapshots of each manager are kept
+CHECKPOINTS_KEPT = 5
+
+# bump this whenever the format of the snapshot files changes
+CHECKPOINT_VERSION = 2
+
+# position (number of events replayed) -> (fingerprint, snapshot)
+Checkpoints = Dict[int, Tuple[str, bytes]]
+
+
+def snapshot(manager: Any) -> bytes:
+    """
+    Returns the state of a manager, as restored by `restore`.
+    Managers whose state refers to database records or other managers should override __getstate__ and __setstate__.
+    """
+    get_state = getattr(manager, "__getstate__", None)
+    return pickle.dumps(get_state() if get_state is not None else manager.__dict__)
+
+
+def can_restore(manager: Any, data: bytes) -> bool:
+    """
+    Whether `restore` can put a manager back into the state given by `snapshot`.
+    A manager whose state refers to something kept elsewhere (e.g. an EventRenderer, whose renderings are in the
+    render cache) can define `can_restore(state)` to check that it is still there.
+    """
+    check = getattr(manager, "can_restore", None)
+    return check is None or check(pickle.loads(data))
+
+
+def restore(manager: Any, data: bytes):
+    """
+    Puts a manager (which should be freshly constructed) back into the state given by `snapshot`.
+    The manager is updated in place, so anything referring to it (e.g. an EventRenderer) sees the restored state.
+    """
+    state = pickle.loads(data)
+    set_state = getattr(manager, "__setstate__", None)
+    if set_state is not None:
+        set_state(state)
+    else:
+        manager.__dict__.update(state)
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    """
+    Identifies the version of AU2 running. What managers keep in their state (and e.g. how events are rendered)
+    depends on the code, so anything saved by a different version (snapshots, cached renderings) is never reused.
+    """
+    h = hashlib.sha256(str(CHECKPOINT_VERSION).encode())
+    for path in sorted(ROOT_DIR.rglob("*.py")):
+        stat = path.stat()
+        h.update(f"{path.relative_to(ROOT_DIR)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _settings_fingerprint() -> str:
+    h = hashlib.sha256(code_fingerprint().encode())
+    for (key, value) in sorted(ASSASSINS_DATABASE._encode_records().items()):
+        h.update(key.encode())
+        h.update(value.encode())
+    for (key, value) in sorted(GENERIC_STATE_DATABASE._encode_records().items()):
+        # uniqueId changes whenever anything is created, and no manager reads it
+        if key != "uniqueId":
+            h.update(key.encode())
+            h.update(value.encode())
+    return h.hexdigest()
+
+
+def fingerprints(events: List[Event]) -> List[str]:
+    """
+    Returns, for each n from 0 to len(events), a fingerprint of the first n events and of everything else a manager
+    might depend on.
+    """
+    result = [_settings_fingerprint()]
+    for e in events:
+        result.append(hashlib.sha256((result[-1] + encode_event(e)).encode()).hexdigest())
+    return result
+
+
+class CheckpointStore:
+    """
+    Keeps the snapshots of each manager (identified by the key it is registered under in a Replay) in a file of its
+    own in `location`.
+    """
+
+    def __init__(self, location: str):
+        self.location = location
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self.location, hashlib.sha256(repr(key).encode()).hexdigest()[:32] + ".pickle")
+
+    def load(self, key: Hashable, fingerprints: List[str]) -> Checkpoints:
+        """
+        Returns the snapshots of a manager that are still valid (i.e. whose fingerprint matches `fingerprints`).
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "rb") as F:
+                stored_key, checkpoints = pickle.load(F)
+        except Exception:
+            # snapshots are only ever an optimisation, so a damaged or outdated file is just ignored
+            return {}
+        if stored_key != repr(key):
+            return {}
+        return {
+            position: (fingerprint, data) for (position, (fingerprint, data)) in checkpoints.items()
+            if position < len(fingerprints) and fingerprints[position] == fingerprint
+        }
+
+    def save(self, key: Hashable, checkpoints: Checkpoints):
+        """
+        Saves the latest CHECKPOINTS_KEPT of a manager's snapshots, replacing any saved before.
+        """
+        kept = {position: checkpoints[position] for position in sorted(checkpoints)[-CHECKPOINTS_KEPT:]}
+        os.makedirs(self.location, exist_ok=True)
+        path = self._path(key)
+        with open(path + ".tmp", "wb") as F:
+            pickle.dump((repr(key), kept), F)
+        os.replace(path + ".tmp", path)
+
+    def clear(self):
+        """
+        Deletes every snapshot.
+        """
+        if not os.path.isdir(self.location):
+            return
+        for f in os.listdir(self.location):
+            os.remove(os.path.join(self.location, f))
+
+
+CHECKPOINTS = CheckpointStore(CHECKPOINT_LOCATION)
+
+
+def latest(checkpoints: Checkpoints) -> Optional[int]:
+    """
+    Returns the position of the last snapshot, if there are any.
+    """
+    return max(checkpoints, default=None)
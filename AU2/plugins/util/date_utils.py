@@ -17,7 +17,8 @@ def get_now_dt():
 def timestamp_to_dt(ts: Optional[float]) -> Optional[datetime.datetime]:
    if ts is None:
       return None
-   return datetime.datetime.fromtimestamp(ts).astimezone().astimezone(TIMEZONE)
+   # equivalent to converting via the local timezone, but with one conversion instead of two
+   return datetime.datetime.fromtimestamp(ts, tz=TIMEZONE)
 
 
 def dt_to_timestamp(ts: Optional[datetime.datetime]) -> Optional[float]:
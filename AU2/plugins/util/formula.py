@@ -0,0 +1,117 @@
+import ast
+import functools
+import math
+from typing import Callable, List, Sequence
+
+# the per-player statistics a scoring formula can use:
+# kills, conkers, bonus points and attempts (see ScoringPlugin.ask_set_formula)
+FORMULA_VARIABLES = ("k", "c", "b", "a")
+
+# functions other than those in `math` that a formula can call
+FORMULA_BUILTINS = {
+    "abs": abs,
+    "float": float,
+    "int": int,
+    "max": max,
+    "min": min,
+    "pow": pow,
+    "round": round,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Attribute,
+    ast.Constant, ast.Load, ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+
+class InvalidFormulaException(Exception):
+    pass
+
+
+def _check(node: ast.AST, formula: str):
+    if not isinstance(node, _ALLOWED_NODES):
+        raise InvalidFormulaException(f"{type(node).__name__} is not allowed in a scoring formula: {formula}")
+    if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+        raise InvalidFormulaException(f"Only numbers are allowed in a scoring formula: {formula}")
+    if isinstance(node, ast.Name) and node.id not in FORMULA_VARIABLES and node.id not in FORMULA_BUILTINS:
+        raise InvalidFormulaException(f"Unknown name {node.id} in scoring formula: {formula}")
+    if isinstance(node, ast.Attribute):
+        # only `math.<name>`, and not e.g. `math.__loader__`
+        if not (isinstance(node.value, ast.Name) and node.value.id == "math"
+                and not node.attr.startswith("_") and hasattr(math, node.attr)):
+            raise InvalidFormulaException(f"Unknown function {ast.unparse(node)} in scoring formula: {formula}")
+        return
+    if isinstance(node, ast.Call):
+        if node.keywords:
+            raise InvalidFormulaException(f"Keyword arguments are not allowed in a scoring formula: {formula}")
+        if not (isinstance(node.func, ast.Attribute)
+                or isinstance(node.func, ast.Name) and node.func.id in FORMULA_BUILTINS):
+            raise InvalidFormulaException(f"{ast.unparse(node.func)} is not a function: {formula}")
+    for child in ast.iter_child_nodes(node):
+        _check(child, formula)
+
+
+def _names(ctx: ast.expr_context) -> List[ast.Name]:
+    return [ast.Name(id=v, ctx=ctx) for v in FORMULA_VARIABLES]
+
+
+class CompiledFormula:
+    """
+    A scoring formula, parsed and checked once and compiled to Python functions.
+
+    Call it with a player's kills, conkers, bonus and attempts to get their score, or use `evaluate_all` to score
+    many players in one go.
+    """
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as e:
+            raise InvalidFormulaException(f"Invalid scoring formula: {formula}") from e
+        _check(tree, formula)
+
+        arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg=v) for v in FORMULA_VARIABLES], vararg=None,
+                                  kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[])
+        # lambda k, c, b, a: <formula>
+        scalar = ast.Lambda(args=arguments, body=tree.body)
+        # lambda k, c, b, a: [<formula> for (k, c, b, a) in zip(k, c, b, a)]
+        vector = ast.Lambda(args=arguments, body=ast.ListComp(
+            elt=tree.body,
+            generators=[ast.comprehension(
+                target=ast.Tuple(elts=_names(ast.Store()), ctx=ast.Store()),
+                iter=ast.Call(func=ast.Name(id="zip", ctx=ast.Load()), args=_names(ast.Load()), keywords=[]),
+                ifs=[],
+                is_async=0,
+            )],
+        ))
+        namespace = {"__builtins__": {**FORMULA_BUILTINS, "zip": zip}, "math": math}
+        self._scalar: Callable[..., float] = eval(
+            compile(ast.fix_missing_locations(ast.Expression(body=scalar)), "<scoring formula>", "eval"), namespace)
+        self._vector: Callable[..., List[float]] = eval(
+            compile(ast.fix_missing_locations(ast.Expression(body=vector)), "<scoring formula>", "eval"), namespace)
+
+    def __call__(self, k: float, c: float, b: float, a: float) -> float:
+        return self._scalar(k, c, b, a)
+
+    def evaluate_all(self,
+                     k: Sequence[float],
+                     c: Sequence[float],
+                     b: Sequence[float],
+                     a: Sequence[float]) -> List[float]:
+        """
+        Evaluates the formula for many players at once, given the statistics of each player in the same order.
+        """
+        return self._vector(k, c, b, a)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_formula(formula: str) -> CompiledFormula:
+    """
+    Returns the compiled form of a scoring formula, compiling each formula only once.
+
+    Raises:
+        InvalidFormulaException: if the formula isn't an expression using only numbers, the variables k, c, b and a,
+            functions from `math`, and the functions in FORMULA_BUILTINS
+    """
+    return CompiledFormula(formula)
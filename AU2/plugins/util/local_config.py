@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Any, Dict
+
+from AU2 import BASE_WRITE_LOCATION
+from AU2.database.model.atomic_files import write_atomically
+
+# Settings that only apply to this machine (e.g. how many local backups to keep).
+# Unlike GENERIC_STATE_DATABASE this isn't a database file, so it isn't uploaded, synced or backed up, and restoring
+# a backup or someone else's databases leaves it alone.
+LOCAL_CONFIG_LOCATION = os.path.join(BASE_WRITE_LOCATION, "local_config")
+
+
+def _read() -> Dict[str, Any]:
+    if not os.path.exists(LOCAL_CONFIG_LOCATION):
+        return {}
+    with open(LOCAL_CONFIG_LOCATION, "r") as F:
+        return json.load(F)
+
+
+def get_local_setting(key: str, default: Any = None) -> Any:
+    """
+    Returns a setting for this machine, or `default` if it has never been set.
+    """
+    return _read().get(key, default)
+
+
+def set_local_setting(key: str, value: Any):
+    """
+    Sets a setting for this machine. `value` must be JSON-serialisable.
+    """
+    settings = _read()
+    settings[key] = value
+    write_atomically(LOCAL_CONFIG_LOCATION, json.dumps(settings, indent=4))
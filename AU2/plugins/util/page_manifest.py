@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Union
+
+from AU2 import BASE_WRITE_LOCATION
+from AU2.database.model.atomic_files import TMP_SUFFIX, write_atomically
+from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
+
+# The pages in WEBPAGE_WRITE_LOCATION are uploaded (and then deleted locally) when they are published.
+# The manifest keeps a hash of the contents of each page as last published, so that publishing only uploads the pages
+# that have changed since.
+#
+# Pages can be published by any umpire, so the manifest is kept alongside the published pages (see SRCFPlugin), and
+# the file here is only a copy of it, fetched before it is used.
+#
+# (It isn't a .json file, so that it isn't mistaken for a database.)
+
+PAGE_MANIFEST_LOCATION = os.path.join(BASE_WRITE_LOCATION, "page_manifest")
+
+# pages are written and read this many characters at a time
+PAGE_BUFFER_SIZE = 1 << 16
+
+
+def page_hash(path: str) -> Optional[str]:
+    """
+    Returns the hash of the contents of a page (as written by `PageManifest.write_page`), or None if it doesn't exist.
+    """
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "r", encoding="utf-8", errors="ignore") as F:
+        while chunk := F.read(PAGE_BUFFER_SIZE):
+            h.update(chunk.encode("utf-8", errors="ignore"))
+    return h.hexdigest()
+
+
+class PageManifest:
+    """
+    The hashes of the pages as last published, by filename (relative to WEBPAGE_WRITE_LOCATION).
+    """
+
+    def __init__(self, path: str, pages_location: Optional[str] = None):
+        self.path = path
+        self._pages_location = pages_location
+        # loaded when first needed
+        self._published: Optional[Dict[str, str]] = None
+
+    @property
+    def pages_location(self) -> str:
+        return self._pages_location or WEBPAGE_WRITE_LOCATION
+
+    @property
+    def published(self) -> Dict[str, str]:
+        if self._published is None:
+            self._published = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r") as F:
+                        self._published = json.load(F)
+                except ValueError:
+                    # an unreadable manifest only means that every page is published again
+                    pass
+        return self._published
+
+    def write_page(self, filename: str, content: Union[str, Iterable[str]]) -> bool:
+        """
+        Writes `content` (either the whole page, or the page a piece at a time, e.g. from `PageTemplate.chunks`) to
+        the page `filename`, unless that is what is already waiting to be published.
+        Whether the page has changed since it was published is only checked when publishing (see `changed_pages`).
+
+        The page is streamed to a temporary file as it is hashed, so that it never has to be held in memory at once.
+
+        Returns:
+            bool: whether the page was written
+        """
+        path = os.path.join(self.pages_location, filename)
+        tmp_path = path + TMP_SUFFIX
+        h = hashlib.sha256()
+        try:
+            with open(tmp_path, "w+", encoding="utf-8", errors="ignore", buffering=PAGE_BUFFER_SIZE) as F:
+                for chunk in ((content,) if isinstance(content, str) else content):
+                    h.update(chunk.encode("utf-8", errors="ignore"))
+                    F.write(chunk)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        digest = h.hexdigest()
+
+        if page_hash(path) == digest:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+    def changed_pages(self) -> List[str]:
+        """
+        Returns the pages waiting to be published whose contents differ from what was last published.
+        """
+        return sorted(
+            page for page in os.listdir(self.pages_location)
+            # (pages left half-written by a crash are never published)
+            if not page.endswith(TMP_SUFFIX)
+            and self.published.get(page) != page_hash(os.path.join(self.pages_location, page))
+        )
+
+    def mark_published(self, filename: str):
+        """
+        Records the page `filename` (which must still be in `pages_location`) as published.
+        """
+        self.published[filename] = page_hash(os.path.join(self.pages_location, filename))
+
+    def reload(self):
+        """
+        Forgets the manifest read so far, so that it is read again from `path` (e.g. after fetching a new copy).
+        """
+        self._published = None
+
+    def save(self):
+        write_atomically(self.path, json.dumps(self.published, indent=1, sort_keys=True))
+
+    def forget(self, filename: str):
+        """
+        Forgets what was published as the page `filename` (e.g. because it has been edited by hand), so that it is
+        published again.
+        """
+        self.published.pop(filename, None)
+
+
+PAGE_MANIFEST = PageManifest(PAGE_MANIFEST_LOCATION)
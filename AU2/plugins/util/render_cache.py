@@ -0,0 +1,69 @@
+import hashlib
+import os
+import pickle
+from typing import Dict, Hashable, Iterable, Tuple
+
+from AU2 import BASE_WRITE_LOCATION
+
+# The HTML `render_event` produced for each event when pages were last generated, so that events whose rendering
+# can't have changed aren't rendered again.
+#
+# Each rendering is stored along with a fingerprint of everything it was rendered from (see
+# `render_utils.render_fingerprint`), and is only reused if that fingerprint still matches. Editing an event, a
+# pseudonym or a setting, or a change in the colour a player is shown in at an event, therefore re-renders just the
+# events affected.
+
+RENDER_CACHE_LOCATION = os.path.join(BASE_WRITE_LOCATION, "render_cache")
+
+# event identifier -> (fingerprint, event html, headline html)
+Renderings = Dict[str, Tuple[str, str, str]]
+
+
+class RenderCache:
+    """
+    Keeps the renderings of each EventRenderer (identified by the key it is registered under in a Replay) in a file
+    of its own in `location`.
+    """
+
+    def __init__(self, location: str):
+        self.location = location
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self.location, hashlib.sha256(repr(key).encode()).hexdigest()[:32] + ".pickle")
+
+    def load(self, key: Hashable) -> Renderings:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "rb") as F:
+                stored_key, renderings = pickle.load(F)
+        except Exception:
+            # the cache is only ever an optimisation, so a damaged or outdated file is just ignored
+            return {}
+        if stored_key != repr(key):
+            return {}
+        return renderings
+
+    def save(self, key: Hashable, renderings: Renderings, keep: Iterable[str]):
+        """
+        Saves the renderings of the events with identifiers in `keep` (so that deleted events are forgotten).
+        """
+        keep = set(keep)
+        os.makedirs(self.location, exist_ok=True)
+        path = self._path(key)
+        with open(path + ".tmp", "wb") as F:
+            pickle.dump((repr(key), {k: v for (k, v) in renderings.items() if k in keep}), F)
+        os.replace(path + ".tmp", path)
+
+    def clear(self):
+        """
+        Deletes every rendering.
+        """
+        if not os.path.isdir(self.location):
+            return
+        for f in os.listdir(self.location):
+            os.remove(os.path.join(self.location, f))
+
+
+RENDER_CACHE = RenderCache(RENDER_CACHE_LOCATION)
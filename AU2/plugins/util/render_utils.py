@@ -1,28 +1,70 @@
 import datetime
-import itertools
+import functools
+import hashlib
 import re
-from typing import Callable, Dict, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+import string
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 from AU2 import ROOT_DIR
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.EventsDatabase import EVENTS_DATABASE
 from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
 from AU2.database.model import Event, Assassin
+from AU2.database.model.codec import encode_assassin, encode_event
 from AU2.plugins.AbstractPlugin import NavbarEntry
+from AU2.plugins.util.checkpoints import code_fingerprint
 from AU2.plugins.util.CompetencyManager import CompetencyManager
 from AU2.plugins.util.DeathManager import DeathManager
 from AU2.plugins.util.WantedManager import WantedManager
-from AU2.plugins.constants import WEBPAGE_WRITE_LOCATION
 from AU2.plugins.util.date_utils import datetime_to_time_str, date_to_weeks_and_days, get_now_dt, PRETTY_DATETIME_FORMAT
-from AU2.plugins.util.game import get_game_start, soft_escape
+from AU2.plugins.util.game import get_allow_html, get_game_start, soft_escape
+from AU2.plugins.util.page_manifest import PAGE_MANIFEST
+from AU2.plugins.util.render_cache import RenderCache, Renderings, RENDER_CACHE
+from AU2.plugins.util.replay import Manager, Replay, current_replay
 
-NEWS_TEMPLATE: str
+
+class PageTemplate:
+    """
+    A template in the syntax of str.format, split into its text and fields once, so that pages can be written out a
+    piece at a time (see `PageManifest.write_page`) instead of being built up as one (very long) string first.
+    """
+
+    _formatter = string.Formatter()
+
+    def __init__(self, template: str):
+        # (text, field name, format spec, conversion) for each field, with the text before it
+        self.parts = list(self._formatter.parse(template))
+
+    def chunks(self, **fields: Any) -> Iterator[str]:
+        """
+        Yields the template filled in with `fields`, a piece at a time, as `str.format(**fields)` would fill it in.
+        A field can also be given a list or iterator of strings (such as the `chunks` of another template), which are
+        written out one after another.
+        """
+        for (text, name, spec, conversion) in self.parts:
+            if text:
+                yield text
+            if name is None:
+                continue
+            value = fields[name]
+            if isinstance(value, str) and not spec and not conversion:
+                yield value
+            elif not isinstance(value, str) and not spec and not conversion and hasattr(value, "__iter__"):
+                yield from value
+            else:
+                yield self._formatter.format_field(self._formatter.convert_field(value, conversion), spec)
+
+    def format(self, **fields: Any) -> str:
+        return "".join(self.chunks(**fields))
+
+
+NEWS_TEMPLATE: PageTemplate
 with open(ROOT_DIR / "plugins" / "custom_plugins" / "html_templates" / "news.html", "r", encoding="utf-8", errors="ignore") as F:
-    NEWS_TEMPLATE = F.read()
+    NEWS_TEMPLATE = PageTemplate(F.read())
 
-HEAD_TEMPLATE: str
+HEAD_TEMPLATE: PageTemplate
 with open(ROOT_DIR / "plugins" / "custom_plugins" / "html_templates" / "head.html", "r", encoding="utf-8", errors="ignore") as F:
-    HEAD_TEMPLATE = F.read()
+    HEAD_TEMPLATE = PageTemplate(F.read())
 
 DAY_TEMPLATE = """<h3 xmlns="">{DATE}</h3> {EVENTS}"""
 
@@ -95,6 +137,15 @@ HEAD_DAY_TEMPLATE = """<h3 xmlns="">{DATE}</h3> {HEADLINES}"""
 LIST_ITEM_TEMPLATE = """<li><a href="{URL}">{DISPLAY}</a></li>\n"""
 
 FORMAT_SPECIFIER_REGEX = r"\[[P,D,L,N,V]([0-9]+)(?:_([0-9]+))?\]"
+FORMAT_SPECIFIER_PATTERN = re.compile(FORMAT_SPECIFIER_REGEX)
+
+# a pseudonym code in a headline or report, e.g. [P12_3] is PseudonymCode("[P12_3]", "P", "12", "3")
+PseudonymCode = NamedTuple("PseudonymCode", (
+    ("code", str),
+    ("kind", str),
+    ("secret_id", str),
+    ("index", Optional[str]),
+))
 
 Chapter = NamedTuple("Chapter", (("title", str), ("nav_entry", NavbarEntry)))
 
@@ -127,15 +178,6 @@ def event_datetime_link(e: Event) -> str:
     return f'<a href="{url}">{dt}</a>' if url else dt
 
 
-class Manager(Protocol):
-    """
-    Interface for managers to process game state for correct player colouring.
-    Implemented by CompetencyManager, DeathManager, WantedManager, and also TeamManager from MayWeekUtilitiesPlugin
-    """
-    def add_event(self, e: Event):
-        """Interface for having a manager process an event."""
-
-
 def default_color_fn(pseudonym: str,
                      assassin_model: Assassin,
                      e: Event,
@@ -257,10 +299,92 @@ def substitute_pseudonyms(string: str, main_pseudonym: str, assassin: Assassin,
     return string
 
 
+@functools.lru_cache(maxsize=4096)
+def parse_pseudonym_codes(string: str) -> Tuple[Union[str, PseudonymCode], ...]:
+    """
+    Splits a headline or report into text and the pseudonym codes in it (anything matching FORMAT_SPECIFIER_REGEX).
+
+    Returns:
+        a tuple alternating between text and PseudonymCodes, which starts and ends with (possibly empty) text
+    """
+    parts = []
+    last = 0
+    for match in FORMAT_SPECIFIER_PATTERN.finditer(string):
+        parts.append(string[last:match.start()])
+        parts.append(PseudonymCode(match.group(0), match.group(0)[1], match.group(1), match.group(2)))
+        last = match.end()
+    parts.append(string[last:])
+    return tuple(parts)
+
+
+def pseudonym_code_renderings(main_pseudonym: str,
+                              assassin: Assassin,
+                              color: str,
+                              dt: Optional[datetime.datetime] = None) -> Dict[Tuple[str, Optional[str]], str]:
+    """
+    Renders each of the pseudonym codes for a single assassin as HTML, in the same way as substitute_pseudonyms.
+
+    Returns:
+        a dict from (kind, index) of a PseudonymCode for `assassin` to its rendering
+    """
+    dt = dt or get_now_dt()
+    renderings = {("P", None): PSEUDONYM_TEMPLATE.format(COLOR=color, PSEUDONYM=soft_escape(main_pseudonym))}
+    for i in range(len(assassin.pseudonyms)):
+        renderings[("P", str(i))] = PSEUDONYM_TEMPLATE.format(COLOR=color, PSEUDONYM=soft_escape(assassin.get_pseudonym(i)))
+    list_of_pseudonyms = " AKA ".join(PSEUDONYM_TEMPLATE.format(COLOR=color, PSEUDONYM=soft_escape(p)) for p in assassin.pseudonyms_until(dt))
+    real_name = PSEUDONYM_TEMPLATE.format(
+        COLOR=adjust_brightness(color, get_real_name_brightness()),
+        PSEUDONYM=soft_escape(assassin.real_name)
+    )
+    renderings[("L", None)] = list_of_pseudonyms
+    renderings[("D", None)] = list_of_pseudonyms
+    renderings[("N", None)] = real_name
+    renderings[("V", None)] = f"{list_of_pseudonyms} ({real_name})"
+    return renderings
+
+
+def fill_pseudonym_codes(template: Tuple[Union[str, PseudonymCode], ...],
+                         renderings: Dict[str, Dict[Tuple[str, Optional[str]], str]]) -> str:
+    """
+    Puts a string parsed by parse_pseudonym_codes back together, with the renderings (by assassin secret id) of the
+    pseudonym codes in it. Codes without a rendering are left as they are.
+    """
+    return "".join(
+        part if isinstance(part, str) else renderings.get(part.secret_id, {}).get((part.kind, part.index), part.code)
+        for part in template
+    )
+
+
 # required signature when replacing default_color_fn
 ColorFn = Callable[[str, Assassin, Event, Sequence[Manager]], str]
 
 
+def code_pseudonyms(e: Event,
+                    templates: Sequence[Tuple[Union[str, PseudonymCode], ...]]) -> List[Tuple[Assassin, str]]:
+    """
+    Returns the assassins with pseudonym codes in the (parsed) headline and reports of `e`, in order of their first
+    code, along with the pseudonym their [PX] code is rendered as: that given by their first code, or otherwise the
+    one they are involved in `e` under.
+    """
+    result = []
+    seen = set()
+    for template in templates:
+        # every other part is a pseudonym code
+        for code in template[1::2]:
+            secret_id = int(code.secret_id)
+            # (only the first code for each assassin counts, so they are only looked up once)
+            if secret_id in seen:
+                continue
+            seen.add(secret_id)
+            assassin_model = ASSASSINS_DATABASE.get_by_secret_id(secret_id)
+            if assassin_model is None:
+                continue
+
+            pseudonym_index = int(code.index or e.assassins.get(assassin_model.identifier, 0))
+            result.append((assassin_model, assassin_model.get_pseudonym(pseudonym_index)))
+    return result
+
+
 def render_headline_and_reports(e: Event,
                                 plugin_managers: Sequence[Manager] = tuple(),
                                 color_fn: ColorFn = default_color_fn) -> (str, Dict[Tuple[str, int], str]):
@@ -288,41 +412,35 @@ def render_headline_and_reports(e: Event,
                e.reports}
 
     candidate_pseudonyms = []
+    # from assassin identifier to the renderings of their pseudonym codes
+    renderings = {}
 
-    texts_to_search = [r for r in itertools.chain((headline,), reports.values())]
-
-    for r in texts_to_search:
-        for match in re.findall(FORMAT_SPECIFIER_REGEX, r):
-            assassin_secret_id = int(match[0])
-
-            assassin_model: Assassin
-            for a in ASSASSINS_DATABASE.assassins.values():
-                if int(a._secret_id) == assassin_secret_id:
-                    assassin_model = a
-                    break
-            else:
-                continue
-
-            if any(c[0].identifier == assassin_model.identifier for c in candidate_pseudonyms):
-                continue
-
-            pseudonym_index = int(match[1] or e.assassins.get(assassin_model.identifier, 0))
-            pseudonym = assassin_model.get_pseudonym(pseudonym_index)
-
-            color = color_fn(
-                pseudonym,
-                assassin_model,
-                e,
-                plugin_managers
-            )
-
-            candidate_pseudonyms.append((assassin_model, pseudonym, color))
+    headline_template = parse_pseudonym_codes(headline)
+    report_templates = {k: parse_pseudonym_codes(r) for (k, r) in reports.items()}
 
-    for (assassin_model, pseudonym, color) in candidate_pseudonyms:
-        headline = substitute_pseudonyms(headline, pseudonym, assassin_model, color, e.datetime)
-        for (k, r) in reports.items():
-            reports[k] = substitute_pseudonyms(r, pseudonym, assassin_model, color, e.datetime)
+    for (assassin_model, pseudonym) in code_pseudonyms(e, (headline_template, *report_templates.values())):
+        color = color_fn(
+            pseudonym,
+            assassin_model,
+            e,
+            plugin_managers
+        )
 
+        candidate_pseudonyms.append((assassin_model, pseudonym, color))
+        renderings[assassin_model.identifier] = pseudonym_code_renderings(pseudonym, assassin_model, color, e.datetime)
+
+    if any("[" in r for rs in renderings.values() for r in rs.values()):
+        # a pseudonym or name could itself contain pseudonym codes, which substituting one assassin at a time
+        # would (partly) render too
+        for (assassin_model, pseudonym, color) in candidate_pseudonyms:
+            headline = substitute_pseudonyms(headline, pseudonym, assassin_model, color, e.datetime)
+            for (k, r) in reports.items():
+                reports[k] = substitute_pseudonyms(r, pseudonym, assassin_model, color, e.datetime)
+        return headline, reports
+
+    by_secret_id = {a._secret_id: renderings[a.identifier] for (a, _, _) in candidate_pseudonyms}
+    headline = fill_pseudonym_codes(headline_template, by_secret_id)
+    reports = {k: fill_pseudonym_codes(template, by_secret_id) for (k, template) in report_templates.items()}
     return headline, reports
 
 
@@ -392,12 +510,268 @@ def render_event(e: Event,
     )
     return event_html, headline_html
 
+
+def render_settings_fingerprint() -> str:
+    """
+    Returns a fingerprint of what rendering any event depends on besides the event: the code and the settings.
+    """
+    return hashlib.sha256(repr((code_fingerprint(), get_allow_html(), get_real_name_brightness())).encode()).hexdigest()
+
+
+def render_fingerprint(e: Event,
+                       page: str,
+                       colors: Dict[Tuple[str, str], str],
+                       settings_fingerprint: str,
+                       assassin_fingerprints: Dict[str, str]) -> str:
+    """
+    Returns a fingerprint of everything `render_event` reads when rendering `e` for `page`: the event itself, the
+    colours recorded for it by `record_colors`, the assassins those are of, and `settings_fingerprint` (from
+    `render_settings_fingerprint`).
+
+    `assassin_fingerprints` holds the fingerprint of each assassin (by identifier) once worked out, so should be shared
+    by events rendered together, while the assassins can't change.
+    """
+    h = hashlib.sha256(repr((settings_fingerprint, page)).encode())
+    h.update(encode_event(e).encode())
+    for ((identifier, pseudonym), color) in colors.items():
+        assassin_fingerprint = assassin_fingerprints.get(identifier)
+        if assassin_fingerprint is None:
+            assassin_fingerprint = hashlib.sha256(encode_assassin(ASSASSINS_DATABASE.get(identifier)).encode()).hexdigest()
+            assassin_fingerprints[identifier] = assassin_fingerprint
+        h.update(repr((assassin_fingerprint, pseudonym, color)).encode())
+    return h.hexdigest()
+
+
+def record_colors(e: Event,
+                  plugin_managers: Sequence[Manager] = tuple(),
+                  color_fn: ColorFn = default_color_fn) -> Dict[Tuple[str, str], str]:
+    """
+    Returns the colour `color_fn` gives each pseudonym `render_event` colours when rendering `e`, by (assassin
+    identifier, pseudonym). `plugin_managers` must have been updated up to `e`.
+    """
+    templates = (parse_pseudonym_codes(e.headline), *(parse_pseudonym_codes(r) for (_, _, r) in e.reports))
+    pseudonyms = code_pseudonyms(e, templates)
+    for (assassin, pseudonym_index, _) in e.reports:
+        assassin_model = ASSASSINS_DATABASE.get(assassin)
+        if pseudonym_index is None:
+            pseudonym_index = e.assassins[assassin]
+        pseudonyms.append((assassin_model, assassin_model.get_pseudonym(pseudonym_index)))
+    return {
+        (assassin_model.identifier, pseudonym): color_fn(pseudonym, assassin_model, e, plugin_managers)
+        for (assassin_model, pseudonym) in pseudonyms
+    }
+
+
+class RecordedColors:
+    """
+    A ColorFn giving the colours recorded for an event by `record_colors`, so that the event can be rendered without
+    asking `color_fn` again.
+    """
+
+    def __init__(self, colors: Dict[Tuple[str, str], str]):
+        self.colors = colors
+
+    def __call__(self, pseudonym: str, assassin_model: Assassin, e: Event, plugin_managers: Sequence[Manager]) -> str:
+        return self.colors[(assassin_model.identifier, pseudonym)]
+
+
 # required signature when replacing default_page_allocator
 PageAllocator = Callable[[Event], Optional[Chapter]]
 
+class EventRenderer:
+    """
+    Renders events into pages as they are replayed. This is a Manager, so that it can be replayed along with the
+    managers `color_fn` reads (which must be registered before it, so that they are updated first).
+
+    If given a RenderCache, events are only rendered if their fingerprint (see `render_fingerprint`) has changed
+    since they were last rendered, and the renderings are saved again by `save_render_cache`. The colours of each
+    event are then worked out once (see `record_colors`), both to fingerprint it and to render it with.
+    Only a renderer with a RenderCache can be restored from a snapshot (see checkpoints.py), since a snapshot only
+    records which events have been rendered where, and their renderings are read back from the cache.
+    """
+
+    def __init__(self,
+                 page_allocator: PageAllocator,
+                 color_fn: ColorFn,
+                 plugin_managers: Sequence[Manager],
+                 render_cache: Optional[RenderCache] = None,
+                 render_cache_key: Hashable = None):
+        self.page_allocator = page_allocator
+        self.color_fn = color_fn
+        self.plugin_managers = plugin_managers
+        self.render_cache = render_cache
+        self.render_cache_key = render_cache_key
+        # the rendering of every event rendered so far, keyed by identifier
+        # (loaded from the cache when it is first needed; without a cache, the fingerprints are all empty)
+        self.renderings: Optional[Renderings] = None if render_cache is not None else {}
+        self.renderings_changed = False
+        # worked out when the first event is rendered (the settings and assassins don't change while replaying)
+        self.settings_fingerprint: Optional[str] = None
+        self.assassin_fingerprints: Dict[str, str] = {}
+        # maps chapter (news week) to day-of-week to list of identifiers of the events reported
+        # this is 1-indexed (week 1 is first week of game)
+        # days are 0-indexed (fun, huh?)
+        self.events_for_chapter: Dict[Chapter, Dict[datetime.date, List[str]]] = {}
+        self.headlines_for_day: Dict[datetime.date, List[str]] = {}
+
+    def _load_renderings(self):
+        if self.renderings is None:
+            self.renderings = self.render_cache.load(self.render_cache_key)
+            self.settings_fingerprint = render_settings_fingerprint()
+
+    def add_event(self, e: Event):
+        chapter = self.page_allocator(e)
+        if not chapter:
+            return
+
+        if self.render_cache is None:
+            event_text, headline_text = render_event(
+                e,
+                chapter.nav_entry.url,
+                color_fn=self.color_fn,
+                plugin_managers=self.plugin_managers,
+            )
+            self.renderings[e.identifier] = ("", event_text, headline_text)
+        else:
+            self._load_renderings()
+            colors = record_colors(e, self.plugin_managers, self.color_fn)
+            fingerprint = render_fingerprint(
+                e,
+                chapter.nav_entry.url,
+                colors,
+                self.settings_fingerprint,
+                self.assassin_fingerprints,
+            )
+            cached = self.renderings.get(e.identifier)
+            if cached is None or cached[0] != fingerprint:
+                event_text, headline_text = render_event(
+                    e,
+                    chapter.nav_entry.url,
+                    color_fn=RecordedColors(colors),
+                    plugin_managers=self.plugin_managers,
+                )
+                self.renderings[e.identifier] = (fingerprint, event_text, headline_text)
+                self.renderings_changed = True
+
+        self.events_for_chapter.setdefault(chapter, {}).setdefault(e.datetime.date(), []).append(e.identifier)
+        self.headlines_for_day.setdefault(e.datetime.date(), []).append(e.identifier)
+
+    # a snapshot (see checkpoints.py) is which events have been rendered on which pages, and a fingerprint of their
+    # renderings; the renderings themselves are in the render cache, and the functions and managers rendering uses
+    # are those the renderer is constructed with
+    def __getstate__(self):
+        return {
+            "events_for_chapter": self.events_for_chapter,
+            "headlines_for_day": self.headlines_for_day,
+            "renderings_fingerprint": self._renderings_fingerprint(self.headlines_for_day),
+        }
+
+    def __setstate__(self, state):
+        self.events_for_chapter = state["events_for_chapter"]
+        self.headlines_for_day = state["headlines_for_day"]
+
+    def can_restore(self, state) -> bool:
+        """
+        Whether the render cache still has the renderings a snapshot refers to (it mightn't if, e.g., AU2 stopped
+        between saving the snapshots and saving the cache).
+        """
+        if self.render_cache is None:
+            return False
+        self._load_renderings()
+        return self._renderings_fingerprint(state["headlines_for_day"]) == state["renderings_fingerprint"]
+
+    def _renderings_fingerprint(self, headlines_for_day: Dict[datetime.date, List[str]]) -> str:
+        h = hashlib.sha256()
+        for identifiers in headlines_for_day.values():
+            for identifier in identifiers:
+                # (an event that isn't in the cache has no fingerprint)
+                h.update(f"{identifier}:{self.renderings.get(identifier, ('',))[0]};".encode())
+        return h.hexdigest()
+
+    def save_render_cache(self):
+        """
+        Saves any events rendered since the render cache was loaded (forgetting those of deleted events).
+        """
+        if self.render_cache is None or self.renderings is None:
+            return
+        if self.renderings_changed or any(identifier not in EVENTS_DATABASE.events for identifier in self.renderings):
+            self.render_cache.save(self.render_cache_key, self.renderings, EVENTS_DATABASE.events)
+            self.renderings_changed = False
+
+    def get_pages(self) -> (List[str], Dict[Chapter, List[str]]):
+        """
+        Returns the rendering of the events given so far, as described in `render_all_events`.
+        """
+        if self.render_cache is not None:
+            # (a renderer restored from a snapshot might not have rendered anything itself)
+            self._load_renderings()
+        chapters = {}
+        for (w, d_dict) in self.events_for_chapter.items():
+            outs = []
+            for (d, events_list) in sorted(d_dict.items()):
+                all_event_text = "".join(self.renderings[identifier][1] for identifier in events_list)
+                day_text = DAY_TEMPLATE.format(
+                    DATE=d.strftime("%A, %d %B"),
+                    EVENTS=all_event_text
+                )
+                outs.append(day_text)
+            chapters[w] = outs
+
+        head_days = []
+        for (d, headlines_list) in sorted(self.headlines_for_day.items()):
+            head_days.append(
+                HEAD_DAY_TEMPLATE.format(
+                    DATE=d.strftime("%A, %d %B"),
+                    HEADLINES="".join(self.renderings[identifier][2] for identifier in headlines_list)
+                )
+            )
+
+        return head_days, chapters
+
+
+def register_renderer(replay: Replay,
+                      replay_key: str,
+                      page_allocator: PageAllocator = default_page_allocator,
+                      color_fn: ColorFn = default_color_fn,
+                      plugin_managers: Sequence[Manager] = tuple(),
+                      render_cache: Optional[RenderCache] = None) -> EventRenderer:
+    """
+    Registers an EventRenderer in `replay`, along with the CompetencyManager, DeathManager and WantedManager it colours
+    pseudonyms by (which are shared with anything else in the replay using them) and `plugin_managers`.
+    Plugins should call this from `on_page_replay` with the same arguments they later pass to `generate_news_pages`,
+    so that their pages are rendered in the same pass as everything else.
+
+    Args:
+        replay: the replay to register in
+        replay_key: identifies the renderer within the replay
+        page_allocator, color_fn, plugin_managers: as in `render_all_events`
+        render_cache: where the renderer keeps its renderings of events between runs. Defaults to RENDER_CACHE,
+            except in test mode.
+    """
+    plugin_managers = tuple(plugin_managers or tuple())
+    if render_cache is None and not EVENTS_DATABASE.TEST_MODE:
+        render_cache = RENDER_CACHE
+
+    def make_renderer() -> EventRenderer:
+        start_datetime = get_game_start()
+        managers = (
+            replay.register(("CompetencyManager", start_datetime), lambda: CompetencyManager(start_datetime),
+                            checkpoint=True),
+            replay.register("DeathManager", DeathManager, checkpoint=True),
+            replay.register("WantedManager", WantedManager, checkpoint=True),
+        )
+        for (i, manager) in enumerate(plugin_managers):
+            managers += (replay.register(("EventRenderer", replay_key, i), lambda m=manager: m),)
+        return EventRenderer(page_allocator, color_fn, managers, render_cache, ("EventRenderer", replay_key))
+
+    # plugin managers can't be snapshotted, so neither can a renderer reading them
+    return replay.register(("EventRenderer", replay_key), make_renderer, checkpoint=not plugin_managers)
+
+
 def render_all_events(page_allocator: PageAllocator = default_page_allocator,
                       color_fn: ColorFn = default_color_fn,
-                      plugin_managers: Sequence[Manager] = tuple()) -> (List[str], Dict[Chapter, List[str]]):
+                      plugin_managers: Sequence[Manager] = tuple(),
+                      replay_key: Optional[str] = None) -> (List[str], Dict[Chapter, List[str]]):
     """
     Produces renderings of all events, sorted into pages according to `page_allocator`.
 
@@ -414,66 +788,26 @@ def render_all_events(page_allocator: PageAllocator = default_page_allocator,
             Defaults to an empty tuple in which case only the managers just named will be used.
 
             Events are added to these managers in chronological order.
+        replay_key (Optional[str]): if given, the renderer registered under this key by `register_renderer` in the
+            current shared replay (i.e. during `Generate Pages`) is used, so that events aren't replayed again just
+            for this rendering.
 
     Returns:
         A tuple of: a list of strings where each element is the HTML rendering of one day's headlines, and a dict
             mapping tuples (page path, page title) to a list of strings where each element is the HTML rendering of one day's reports.
     """
-    events = list(EVENTS_DATABASE.events.values())
-    events.sort(key=lambda event: event.datetime)
-    start_datetime = get_game_start()
-
-    # maps chapter (news week) to day-of-week to list of reports
-    # this is 1-indexed (week 1 is first week of game)
-    # days are 0-indexed (fun, huh?)
-    events_for_chapter = {}
-    headlines_for_day = {}
-    competency_manager = CompetencyManager(start_datetime)
-    death_manager = DeathManager()
-    wanted_manager = WantedManager()
-    plugin_managers = (competency_manager, death_manager, wanted_manager, *(plugin_managers or tuple()))
-
-    for e in events:
-        # don't skip adding hidden events to managers, in case a player dies in a hidden event, etc.
-        for manager in plugin_managers:
-            manager.add_event(e)
-
-        chapter = page_allocator(e)
-        if not chapter:
-            continue
-
-        event_text, headline_text = render_event(
-            e,
-            chapter.nav_entry.url,
-            color_fn=color_fn,
-            plugin_managers=plugin_managers,
-        )
-
-        events_for_chapter.setdefault(chapter, {}).setdefault(e.datetime.date(), []).append(event_text)
-        headlines_for_day.setdefault(e.datetime.date(), []).append(headline_text)
-
-    chapters = {}
-    for (w, d_dict) in events_for_chapter.items():
-        outs = []
-        for (d, events_list) in sorted(d_dict.items()):
-            all_event_text = "".join(events_list)
-            day_text = DAY_TEMPLATE.format(
-                DATE=d.strftime("%A, %d %B"),
-                EVENTS=all_event_text
-            )
-            outs.append(day_text)
-        chapters[w] = outs
-
-    head_days = []
-    for (d, headlines_list) in sorted(headlines_for_day.items()):
-        head_days.append(
-            HEAD_DAY_TEMPLATE.format(
-                DATE=d.strftime("%A, %d %B"),
-                HEADLINES="".join(headlines_list)
-            )
-        )
-
-    return head_days, chapters
+    # don't skip adding hidden events to managers, in case a player dies in a hidden event, etc.
+    # (the renderer is a manager like any other, and decides for itself which events to render)
+    replay = current_replay()
+    if replay_key is None or (replay.done and not replay.is_registered(("EventRenderer", replay_key))):
+        # the managers the renderer reads have to be replayed alongside it, which they can't be if the shared replay
+        # has already run
+        replay = Replay()
+        replay_key = ""
+    renderer = register_renderer(replay, replay_key, page_allocator, color_fn, plugin_managers)
+    replay.run()
+    renderer.save_render_cache()
+    return renderer.get_pages()
 
 
 def generate_navbar(navbar_entries: List[NavbarEntry], filename: str):
@@ -486,20 +820,20 @@ def generate_navbar(navbar_entries: List[NavbarEntry], filename: str):
             position.
         filename (str): the filename to save the list under (in the WEBPAGE_WRITE_LOCATION directory).
     """
-    with open(WEBPAGE_WRITE_LOCATION / filename, "w+", encoding="utf-8", errors="ignore") as f:
-        f.write("\n".join(
-            LIST_ITEM_TEMPLATE.format(
-                URL=entry.url,
-                DISPLAY=entry.display
-            ) for entry in sorted(navbar_entries, key=lambda e: e.position)
-        ))
+    PAGE_MANIFEST.write_page(filename, "\n".join(
+        LIST_ITEM_TEMPLATE.format(
+            URL=entry.url,
+            DISPLAY=entry.display
+        ) for entry in sorted(navbar_entries, key=lambda e: e.position)
+    ))
 
 
 def generate_news_pages(headlines_path: str,
                         page_allocator: PageAllocator = default_page_allocator,
                         color_fn: ColorFn = default_color_fn,
                         plugin_managers: Sequence[Manager] = tuple(),
-                        news_list_path: str = ""):
+                        news_list_path: str = "",
+                        replay_key: Optional[str] = None):
     """
     Generates news pages sorted according to `page_allocator`.
 
@@ -518,34 +852,36 @@ def generate_news_pages(headlines_path: str,
             Events are added to these managers in chronological order.
         news_list_path (str): filename to save the list of news pages for the header under. If empty ("") no list is
             generated.
+        replay_key (Optional[str]): as in `render_all_events`
+
+    Pages that are the same as when they were last published are not written again (see `PageManifest`).
     """
     headline_days, chapters = render_all_events(
         page_allocator=page_allocator,
         color_fn=color_fn,
-        plugin_managers=plugin_managers
+        plugin_managers=plugin_managers,
+        replay_key=replay_key
     )
 
     news_navbar_entries = []
 
     # generate headlines page
     if headlines_path and headline_days:
-        head_page_text = HEAD_TEMPLATE.format(
-            CONTENT="".join(headline_days),
+        head_page_chunks = HEAD_TEMPLATE.chunks(
+            CONTENT=headline_days,
             YEAR=str(get_now_dt().year)
         )
-        with open(WEBPAGE_WRITE_LOCATION / headlines_path, "w+", encoding="utf-8", errors="ignore") as F:
-            F.write(head_page_text)
+        PAGE_MANIFEST.write_page(headlines_path, head_page_chunks)
         news_navbar_entries.append(NavbarEntry(headlines_path, "Headlines", -1))
 
     # generate news pages
     for chapter, days in chapters.items():
-        week_page_text = NEWS_TEMPLATE.format(
+        week_page_chunks = NEWS_TEMPLATE.chunks(
             TITLE=chapter.title,
-            DAYS="".join(days),
+            DAYS=days,
             YEAR=str(get_now_dt().year)
         )
-        with open(WEBPAGE_WRITE_LOCATION / chapter.nav_entry.url, "w+", encoding="utf-8", errors="ignore") as F:
-            F.write(week_page_text)
+        PAGE_MANIFEST.write_page(chapter.nav_entry.url, week_page_chunks)
         news_navbar_entries.append(chapter.nav_entry)
 
     generate_navbar(news_navbar_entries or [NavbarEntry("#", "None Yet", 0)], news_list_path)
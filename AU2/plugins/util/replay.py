@@ -0,0 +1,182 @@
+import contextlib
+import datetime
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Protocol, Set, Tuple, TypeVar
+
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.database.model import Event
+from AU2.plugins.util.checkpoints import can_restore, CheckpointStore, Checkpoints, CHECKPOINT_INTERVAL, \
+    CHECKPOINTS_KEPT, fingerprints, restore, snapshot
+from AU2.plugins.util.date_utils import get_now_dt
+
+
+class Manager(Protocol):
+    """
+    Interface for managers, which build up some game state from events given to them in chronological order.
+    Implemented by CompetencyManager, DeathManager, WantedManager, ScoreManager, CityWatchRankManager, EventRenderer,
+    and also TeamManager from MayWeekUtilitiesPlugin
+    """
+    def add_event(self, e: Event):
+        """Interface for having a manager process an event."""
+
+
+M = TypeVar("M", bound=Manager)
+
+
+class Replay:
+    """
+    Feeds events to any number of managers in a single chronological pass.
+
+    Managers are registered under a key, and registering the same key again returns the manager already registered,
+    so that e.g. every plugin asking for a DeathManager during `Generate Pages` shares one.
+    Within each event, managers are given the event in the order they were registered, so a manager that reads
+    other managers (e.g. an EventRenderer) sees them already updated if it is registered after them.
+
+    If given a CheckpointStore, managers registered with `checkpoint=True` are restored from the last snapshot taken
+    before the first event that has changed since, and only given the events after it. Snapshots are taken every
+    CHECKPOINT_INTERVAL events, over the last CHECKPOINTS_KEPT intervals (earlier ones wouldn't be kept).
+    All checkpointed managers are restored to the same point (the latest they can all be restored to, see
+    `checkpoints.can_restore`), so a manager that reads other managers can be checkpointed if and only if they all
+    are.
+    """
+
+    def __init__(self, checkpoints: Optional[CheckpointStore] = None):
+        self.managers: Dict[Tuple[Hashable, Optional[datetime.datetime]], Manager] = {}
+        self.checkpointed: Set[Tuple[Hashable, Optional[datetime.datetime]]] = set()
+        self.checkpoints = checkpoints
+        self.done = False
+        # so that everything using the replay agrees on what time it is (e.g. when using it as `until`)
+        self.now = get_now_dt()
+
+    def register(self,
+                 key: Hashable,
+                 factory: Callable[[], M],
+                 until: Optional[datetime.datetime] = None,
+                 checkpoint: bool = False) -> M:
+        """
+        Returns the manager registered under `key`, creating it with `factory` if there isn't one.
+        If the replay has already run, a new manager is caught up on its own.
+
+        Args:
+            key: identifies the manager. Managers that would be constructed differently need different keys.
+            factory: creates the manager
+            until: if given, the manager is only given events up to and including this time
+            checkpoint: whether the manager can be restored from a snapshot (see `checkpoints.snapshot`).
+                Its snapshots are shared by every manager registered under `key`, whatever `until` is.
+        """
+        full_key = (key, until)
+        if full_key not in self.managers:
+            manager = factory()
+            if self.done:
+                for e in EVENTS_DATABASE.iter_chronological(end=until):
+                    manager.add_event(e)
+            self.managers[full_key] = manager
+        if checkpoint:
+            self.checkpointed.add(full_key)
+        return self.managers[full_key]
+
+    def is_registered(self, key: Hashable, until: Optional[datetime.datetime] = None) -> bool:
+        return (key, until) in self.managers
+
+    def get(self,
+            key: Hashable,
+            factory: Callable[[], M],
+            until: Optional[datetime.datetime] = None,
+            checkpoint: bool = False) -> M:
+        """
+        As `register`, but runs the replay first if it hasn't run yet, so that the manager returned has been given
+        every event.
+        """
+        manager = self.register(key, factory, until, checkpoint)
+        if not self.done:
+            self.run()
+        return manager
+
+    def run(self):
+        """
+        Gives every event to every registered manager, in chronological order.
+        """
+        if self.done:
+            return
+        events = list(EVENTS_DATABASE.iter_chronological())
+        managers = [(key, until, manager) for ((key, until), manager) in self.managers.items()]
+        # number of events each manager has already been given
+        starts = [0] * len(managers)
+        saved: Dict[Hashable, Checkpoints] = {}
+        chain: List[str] = []
+        if self.checkpoints is not None and self.checkpointed:
+            chain = fingerprints(events)
+            restorable = None
+            for (key, until, _) in managers:
+                if (key, until) in self.checkpointed:
+                    if key not in saved:
+                        saved[key] = self.checkpoints.load(key, chain)
+                    # a manager with `until` could only have been snapshotted after events it was given
+                    positions = {p for p in saved[key] if until is None or events[p - 1].datetime <= until}
+                    restorable = positions if restorable is None else restorable & positions
+            # the latest position every checkpointed manager can be restored to
+            position = next((
+                p for p in sorted(restorable or (), reverse=True)
+                if all(can_restore(manager, saved[key][p][1]) for (key, until, manager) in managers
+                       if (key, until) in self.checkpointed)
+            ), None)
+            if position is not None:
+                for (i, (key, until, manager)) in enumerate(managers):
+                    if (key, until) in self.checkpointed:
+                        restore(manager, saved[key][position][1])
+                        starts[i] = position
+
+        # snapshots earlier than this wouldn't be kept
+        first_snapshot = len(events) - CHECKPOINT_INTERVAL * CHECKPOINTS_KEPT
+        for position in range(min(starts, default=0), len(events)):
+            e = events[position]
+            for (i, (_, until, manager)) in enumerate(managers):
+                if position >= starts[i] and (until is None or e.datetime <= until):
+                    manager.add_event(e)
+            if saved and position >= first_snapshot \
+                    and ((position + 1) % CHECKPOINT_INTERVAL == 0 or position + 1 == len(events)):
+                for (i, (key, until, manager)) in enumerate(managers):
+                    # only a manager that has been given all of the first position + 1 events can be snapshotted
+                    if key in saved and position >= starts[i] and (until is None or e.datetime <= until):
+                        saved[key][position + 1] = (chain[position + 1], snapshot(manager))
+
+        for (key, checkpoints) in saved.items():
+            self.checkpoints.save(key, checkpoints)
+        self.done = True
+
+
+_shared: Optional[Replay] = None
+
+
+@contextlib.contextmanager
+def shared_replay(checkpoints: Optional[CheckpointStore] = None) -> Iterator[Replay]:
+    """
+    Within this block, `current_replay` returns the same Replay, so that managers can be shared between everything
+    that uses them (e.g. all the plugins generating pages). Nested uses join the outermost replay.
+
+    Args:
+        checkpoints: if given, where the replay keeps snapshots of its managers
+    """
+    global _shared
+    if _shared is not None:
+        yield _shared
+        return
+    _shared = Replay(checkpoints)
+    try:
+        yield _shared
+    finally:
+        _shared = None
+
+
+def current_replay() -> Replay:
+    """
+    Returns the shared replay if there is one, otherwise a new Replay of one's own.
+    """
+    return _shared if _shared is not None else Replay()
+
+
+def replayed(key: Hashable, factory: Callable[[], M], until: Optional[datetime.datetime] = None) -> M:
+    """
+    Returns a manager that has been given every event (up to `until`), shared with anything else that asked for the
+    same key during the current shared replay.
+    """
+    return current_replay().get(key, factory, until)
@@ -0,0 +1,54 @@
+from AU2.database.AssassinsDatabase import AssassinsDatabase
+from AU2.test.database.test_change_tracking import make_assassin
+
+
+class TestAssassinsIndex:
+
+    def test_lookups_follow_changes(self):
+        db = AssassinsDatabase({})
+        a = make_assassin("Vendetta")
+        a.email = "Vendetta@cam.ac.uk"
+        db.add(a)
+        assert db.get_by_secret_id(a._secret_id) is a
+        assert db.get_by_secret_id(int(a._secret_id)) is a
+        assert db.get_by_pseudonym("VENDETTA PSEUDONYM") == [a]
+        assert db.get_by_email("vendetta@cam.ac.uk") == [a]
+
+        i = a.add_pseudonym("Nemesis", None)
+        assert db.get_by_pseudonym("nemesis") == [a]
+        a.edit_pseudonym(i, "Retribution", None)
+        assert db.get_by_pseudonym("nemesis") == []
+        assert db.get_by_pseudonym("retribution") == [a]
+        a.delete_pseudonym(i)
+        assert db.get_by_pseudonym("retribution") == []
+
+        a.email = "other@cam.ac.uk"
+        assert db.get_by_email("vendetta@cam.ac.uk") == []
+        assert db.get_by_email("other@cam.ac.uk") == [a]
+
+        a.is_city_watch = True
+        assert db.get_city_watch_identifiers() == {a.identifier}
+        a.hidden = True
+        assert db.get_city_watch_identifiers() == set()
+        assert db.get_city_watch_identifiers(include_hidden=True) == {a.identifier}
+        assert db.get_hidden_identifiers() == {a.identifier}
+
+    def test_add_clone_and_delete(self):
+        db = AssassinsDatabase({})
+        a = make_assassin("Vendetta")
+        db.add(a)
+        clone = a.clone(is_city_watch=True)
+        db.add(clone)
+        assert db.get_by_secret_id(clone._secret_id) is clone
+        assert db.get_by_pseudonym("vendetta pseudonym") == sorted([a, clone], key=lambda x: x.identifier)
+        assert db.get_city_watch_identifiers() == {clone.identifier}
+
+        db.delete(a)
+        assert db.get_by_secret_id(a._secret_id) is None
+        assert db.get_by_pseudonym("vendetta pseudonym") == [clone]
+        # a deleted assassin no longer affects the index
+        a.is_city_watch = True
+        assert db.get_city_watch_identifiers() == {clone.identifier}
+
+        db.assassins = {}
+        assert db.get_by_secret_id(clone._secret_id) is None
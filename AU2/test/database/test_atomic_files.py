@@ -0,0 +1,61 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from AU2.database.model import atomic_files
+from AU2.database.model.atomic_files import after_commit, group_commit, write_atomically
+
+
+class TestAtomicFiles:
+
+    def test_write_atomically(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "db.json")
+            write_atomically(path, "old")
+            write_atomically(path, "new")
+            assert open(path).read() == "new"
+            assert os.listdir(tmpdir) == ["db.json"]
+
+    def test_failed_write_leaves_file_alone(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "db.json")
+            write_atomically(path, "old")
+            with patch("os.fsync", side_effect=OSError("disk full")), pytest.raises(OSError):
+                write_atomically(path, "new")
+            assert open(path).read() == "old"
+            assert os.listdir(tmpdir) == ["db.json"]
+
+    def test_group_commit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a, b = os.path.join(tmpdir, "a.json"), os.path.join(tmpdir, "b.json")
+            done = []
+            with group_commit() as timings:
+                write_atomically(a, "a")
+                write_atomically(b, "b")
+                after_commit(lambda: done.append(True))
+                # nothing is replaced until the end of the group
+                assert not os.path.exists(a) and not os.path.exists(b) and not done
+            assert open(a).read() == "a" and open(b).read() == "b" and done
+            assert set(timings) == {"a.json", "b.json", "total"}
+
+    def test_failed_group_replaces_nothing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a, b = os.path.join(tmpdir, "a.json"), os.path.join(tmpdir, "b.json")
+            write_atomically(a, "old")
+            with pytest.raises(RuntimeError):
+                with group_commit():
+                    write_atomically(a, "new")
+                    raise RuntimeError("failed to encode b")
+            assert open(a).read() == "old"
+            assert os.listdir(tmpdir) == ["a.json"]
+
+    def test_slow_commits_are_logged(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(atomic_files, "SLOW_COMMIT_SECONDS", 0), \
+                patch.object(atomic_files, "SLOW_WRITE_LOG", os.path.join(tmpdir, "slow_writes.log")):
+            with group_commit():
+                write_atomically(os.path.join(tmpdir, "a.json"), "a")
+            with open(atomic_files.SLOW_WRITE_LOG) as F:
+                assert "a.json" in F.read()
@@ -0,0 +1,126 @@
+import copy
+import os
+import pickle
+import tempfile
+from unittest.mock import patch
+
+from AU2.database.AssassinsDatabase import AssassinsDatabase
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.database.GenericStateDatabase import GenericStateDatabase
+from AU2.database.model import Assassin
+from AU2.plugins.AbstractPlugin import AbstractPlugin
+from AU2.test.database.test_journal import make_event
+
+
+def make_assassin(name: str) -> Assassin:
+    return Assassin(
+        pseudonyms=[name + " pseudonym"],
+        real_name=name,
+        pronouns="",
+        email="",
+        address="",
+        water_status="",
+        college="",
+        notes="",
+        is_city_watch=False
+    )
+
+
+class TestChangeTracking:
+
+    def test_reading_does_not_dirty(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")):
+            db = EventsDatabase.load()
+            db.add(make_event("event"))
+            db.save()
+            db = EventsDatabase.load()
+            assert not db.is_dirty()
+            for e in sorted(db.events.values(), key=lambda e: e.datetime):
+                e.pluginState.get("PageGeneratorPlugin", {}).get("hidden_event", False)
+                e.text_display()
+            assert not db.is_dirty()
+
+            mtime = os.stat(EventsDatabase.WRITE_LOCATION).st_mtime_ns
+            db.save()
+            assert os.stat(EventsDatabase.WRITE_LOCATION).st_mtime_ns == mtime
+            assert not os.path.exists(EventsDatabase.journal_location())
+
+    def test_record_edits_dirty_that_record(self):
+        db = EventsDatabase({})
+        e1, e2 = make_event("one"), make_event("two")
+        db.add(e1)
+        db.add(e2)
+        db._clear_dirty()
+
+        e1.pluginState.setdefault("CompetencyPlugin", {})["attempts"] = []
+        assert db._dirty_keys == {e1.identifier}
+        e1.pluginState["CompetencyPlugin"]["attempts"].append("someone")
+        e2.headline = "changed"
+        assert db._dirty_keys == {e1.identifier, e2.identifier}
+
+        db._clear_dirty()
+        del db.events[e2.identifier]
+        assert db._dirty_keys == {e2.identifier}
+        # removed records no longer report to the database
+        db._clear_dirty()
+        e2.headline = "changed again"
+        assert not db.is_dirty()
+
+    def test_arb_state_edits(self):
+        db = GenericStateDatabase()
+        db._clear_dirty()
+        db.arb_state.setdefault("CorePlugin", {}).setdefault("export_priorities", {})
+        assert db._dirty_keys == {"arb_state"}
+        db._clear_dirty()
+        db.arb_state["CorePlugin"]["export_priorities"]["some_export"] = 1
+        assert db._dirty_keys == {"arb_state"}
+        db._clear_dirty()
+        db.get_unique_str()
+        assert db._dirty_keys == {"uniqueId"}
+
+    def test_stored_containers_are_copied(self):
+        db = EventsDatabase({})
+        e = make_event("event")
+        db.add(e)
+        db._clear_dirty()
+
+        inner = {}
+        e.pluginState["a"] = inner
+        # what's stored is a tracked copy, so edits have to go through the event
+        assert e.pluginState["a"] is not inner
+        inner["x"] = 1
+        assert e.pluginState == {"a": {}}
+        db._clear_dirty()
+        e.pluginState["a"]["x"] = 1
+        assert db._dirty_keys == {e.identifier}
+        assert e.pluginState == {"a": {"x": 1}}
+
+        # setdefault hands back the copy it stored
+        db._clear_dirty()
+        state = e.pluginState.setdefault("b", {})
+        state["y"] = [1]
+        state["y"].append(2)
+        assert e.pluginState["b"] == {"y": [1, 2]}
+        assert db._dirty_keys == {e.identifier}
+
+    def test_assassin_property(self):
+        db = AssassinsDatabase({})
+        a = make_assassin("Vendetta")
+        db.add(a)
+        db._clear_dirty()
+
+        prop = AbstractPlugin("TestPlugin").assassin_property("prop", 0, store_default=False)
+        assert prop.fget(a) == 0
+        assert not db.is_dirty()
+        prop.fset(a, 5)
+        assert db._dirty_keys == {a.identifier}
+
+    def test_copies_are_plain(self):
+        e = make_event("event")
+        e.pluginState["x"] = {"y": [1]}
+        EventsDatabase({}).add(e)
+        for clone in (copy.deepcopy(e), pickle.loads(pickle.dumps(e))):
+            assert type(clone.pluginState["x"]) is dict
+            assert type(clone.pluginState["x"]["y"]) is list
+            assert clone.to_json() == e.to_json()
@@ -0,0 +1,73 @@
+import datetime
+import json
+
+from AU2 import TIMEZONE
+from AU2.database.AssassinsDatabase import AssassinsDatabase
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.database.model import Assassin, Event
+from AU2.database.model.codec import decode_assassin, decode_event, encode_assassin, encode_event
+from AU2.test.database.test_change_tracking import make_assassin
+from AU2.test.database.test_journal import make_event
+
+
+def sample_event() -> Event:
+    e = make_event("Vendetta killed Blaze — with a spoon")
+    e.assassins = {"Vendetta identifier": 0, "Blaze identifier": 1}
+    e.reports = [("Vendetta identifier", 0, "I did it"), ("Blaze identifier", None, "\"ouch\"")]
+    e.kills = [("Vendetta identifier", "Blaze identifier")]
+    e.pluginState = {
+        "CompetencyPlugin": {"attempts": ["Vendetta identifier"], "competency": {"Vendetta identifier": 7}},
+        "Nested": {"when": datetime.datetime(2022, 9, 2, tzinfo=TIMEZONE), "nums": (1, 2.5, None, True)},
+    }
+    return e
+
+
+def sample_assassin() -> Assassin:
+    a = make_assassin("Vendetta")
+    a.add_pseudonym("second é", datetime.datetime(2022, 10, 30, 1, 30).astimezone(TIMEZONE))
+    a.add_pseudonym("always", None)
+    a.plugin_state["TeamPlugin"] = {"team": 3}
+    return a
+
+
+class TestCodec:
+
+    def test_event_round_trip(self):
+        e = sample_event()
+        dump = encode_event(e)
+        assert dump == e.to_json()
+        decoded = decode_event(json.loads(dump))
+        reference = Event.from_json(dump)
+        assert decoded == reference
+        assert type(decoded.reports[0]) is type(reference.reports[0])
+        assert decoded.datetime.tzinfo is reference.datetime.tzinfo
+        assert decoded.get_numerical_id() == e.get_numerical_id()
+
+    def test_assassin_round_trip(self):
+        a = sample_assassin()
+        dump = encode_assassin(a)
+        assert dump == a.to_json()
+        decoded = decode_assassin(json.loads(dump))
+        assert decoded == Assassin.from_json(dump)
+        assert decoded.get_pseudonym_validity(1) == a.get_pseudonym_validity(1)
+
+    def test_missing_fields_take_defaults(self):
+        # e.g. save files from before pseudonym validities were added
+        raw = json.loads(sample_assassin().to_json())
+        del raw["pseudonym_datetimes"]
+        del raw["hidden"]
+        assert decode_assassin(raw) == Assassin.from_dict(raw)
+
+    def test_databases(self):
+        events = EventsDatabase({})
+        for e in (sample_event(), make_event("another")):
+            events.add(e)
+        assert events._dump() == events.to_json()
+        assert EventsDatabase._from_raw(json.loads(events._dump())) == EventsDatabase.from_json(events.to_json())
+
+        assassins = AssassinsDatabase({})
+        assert assassins._dump() == assassins.to_json()
+        assassins.add(sample_assassin())
+        assert assassins._dump() == assassins.to_json()
+        assert AssassinsDatabase._from_raw(json.loads(assassins._dump())) == \
+               AssassinsDatabase.from_json(assassins.to_json())
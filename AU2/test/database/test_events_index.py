@@ -0,0 +1,104 @@
+import datetime
+
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.test.database.test_journal import make_event
+
+
+def stable_sorted(db: EventsDatabase):
+    return sorted(db.events.values(), key=lambda e: e.datetime)
+
+
+class TestEventsIndex:
+
+    def test_chronological_order_follows_changes(self):
+        db = EventsDatabase({})
+        events = [make_event(f"event {i}") for i in range(6)]
+        for (i, e) in enumerate(events):
+            # two events at each time, to check ties keep insertion order
+            e.datetime += datetime.timedelta(hours=(5 - i) // 2)
+            db.add(e)
+        assert list(db.iter_chronological()) == stable_sorted(db)
+
+        events[0].datetime -= datetime.timedelta(days=1)
+        assert list(db.iter_chronological()) == stable_sorted(db)
+
+        del db.events[events[3].identifier]
+        assert list(db.iter_chronological()) == stable_sorted(db)
+
+        db.add(events[3])
+        assert list(db.iter_chronological()) == stable_sorted(db)
+
+        db.events = dict(reversed(list(db.events.items())))
+        assert list(db.iter_chronological()) == stable_sorted(db)
+
+    def test_chronological_bounds(self):
+        db = EventsDatabase({})
+        events = [make_event(f"event {i}") for i in range(5)]
+        for (i, e) in enumerate(events):
+            e.datetime += datetime.timedelta(hours=i)
+            db.add(e)
+        start = events[1].datetime
+        end = events[3].datetime
+        assert list(db.iter_chronological(start=start)) == events[1:]
+        assert list(db.iter_chronological(end=end)) == events[:4]
+        assert list(db.iter_chronological(start=start, end=end)) == events[1:4]
+
+    def test_by_creation(self):
+        db = EventsDatabase({})
+        events = [make_event(f"event {i}") for i in range(5)]
+        for e in reversed(events):
+            db.add(e)
+        assert list(db.iter_by_creation()) == events
+        assert list(db.iter_by_creation(upto=events[2].get_numerical_id())) == events[:3]
+        assert list(db.iter_by_creation(upto=float("inf"))) == events
+        assert list(db.iter_by_creation(after=events[1].get_numerical_id())) == events[2:]
+        assert list(db.iter_by_creation(after=float("-inf"), upto=events[3].get_numerical_id())) == events[:4]
+
+    def test_player_indexes_follow_changes(self):
+        db = EventsDatabase({})
+        first = make_event("first")
+        second = make_event("second")
+        second.datetime += datetime.timedelta(hours=1)
+        db.add(second)
+        db.add(first)
+        first.kills = [("a", "b")]
+        second.kills.append(("a", "c"))
+        second.reports.append(("d", None, "report"))
+
+        assert db.get_kills_by("a") == [first, second]
+        assert db.get_deaths_of("b") == [first]
+        assert db.get_events_involving("d") == [second]
+        assert db.get_events_involving("a") == [first, second]
+        assert db.get_victims() == {"b", "c"}
+
+        second.kills.pop()
+        assert db.get_kills_by("a") == [first]
+        assert db.get_victims() == {"b"}
+
+        del db.events[first.identifier]
+        assert db.get_kills_by("a") == []
+        assert db.get_deaths_of("b") == []
+        assert db.get_victims() == set()
+        assert db.get_events_involving("nobody") == []
+
+    def test_change_tokens(self):
+        db = EventsDatabase({})
+        events = [make_event(f"event {i}") for i in range(4)]
+        for e in events[:3]:
+            db.add(e)
+        token = db.get_change_token()
+        assert db.earliest_change_since(token) is None
+
+        db.add(events[3])
+        assert db.earliest_change_since(token) == events[3].get_numerical_id()
+
+        events[1].pluginState["plugin"] = {"changed": True}
+        events[2].headline = "changed"
+        assert db.earliest_change_since(token) == events[1].get_numerical_id()
+
+        token = db.get_change_token()
+        del db.events[events[0].identifier]
+        assert db.earliest_change_since(token) == events[0].get_numerical_id()
+
+        db.events = {}
+        assert db.earliest_change_since(token) == float("-inf")
@@ -0,0 +1,98 @@
+import datetime
+import os
+import tempfile
+from unittest.mock import patch
+
+from AU2 import TIMEZONE
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.database.GenericStateDatabase import GenericStateDatabase
+from AU2.database.model import Event
+
+
+def make_event(headline: str) -> Event:
+    return Event(
+        assassins={},
+        datetime=datetime.datetime(year=2022, month=9, day=1, hour=10).astimezone(TIMEZONE),
+        headline=headline,
+        reports=[],
+        kills=[],
+    )
+
+
+class TestJournal:
+
+    def test_save_appends_only_changed_records(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")):
+            db = EventsDatabase.load()
+            for i in range(5):
+                db.add(make_event(f"event {i}"))
+            db.save()
+            snapshot = open(EventsDatabase.WRITE_LOCATION).read()
+            assert not os.path.exists(EventsDatabase.journal_location())
+
+            db = EventsDatabase.load()
+            changed, deleted = list(db.events.values())[:2]
+            changed.headline = "changed"
+            del db.events[deleted.identifier]
+            db.save()
+
+            # the snapshot is left alone and only the two changes are journaled
+            assert open(EventsDatabase.WRITE_LOCATION).read() == snapshot
+            with open(EventsDatabase.journal_location()) as F:
+                assert len(F.read().splitlines()) == 3
+
+            reloaded = EventsDatabase.load()
+            assert reloaded.to_json() == db.to_json()
+            assert reloaded.get(changed.identifier).headline == "changed"
+            assert reloaded.get(deleted.identifier) is None
+
+    def test_compaction(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")), \
+                patch.object(EventsDatabase, "JOURNAL_COMPACTION_THRESHOLD", 2):
+            db = EventsDatabase.load()
+            db.save()
+            db.add(make_event("first"))
+            db.save()
+            db.add(make_event("second"))
+            db.save()
+            assert os.path.exists(EventsDatabase.journal_location())
+            db.add(make_event("third"))
+            db.save()
+            assert not os.path.exists(EventsDatabase.journal_location())
+            assert EventsDatabase.from_json(open(EventsDatabase.WRITE_LOCATION).read()).to_json() == db.to_json()
+
+    def test_stale_journal_is_discarded(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(GenericStateDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "GenericState.json")):
+            db = GenericStateDatabase.load()
+            db.save()
+            db.arb_state["key"] = "journaled"
+            db.save()
+
+            # e.g. restoring a backup
+            with open(GenericStateDatabase.WRITE_LOCATION, "w") as F:
+                F.write(GenericStateDatabase(uniqueId=7).to_json())
+
+            reloaded = GenericStateDatabase.load()
+            assert reloaded.uniqueId == 7
+            assert "key" not in reloaded.arb_state
+            assert not os.path.exists(GenericStateDatabase.journal_location())
+
+    def test_damaged_record_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(GenericStateDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "GenericState.json")):
+            db = GenericStateDatabase.load()
+            db.save()
+            db.arb_state["key"] = "kept"
+            db.save()
+            with open(GenericStateDatabase.journal_location(), "a") as F:
+                F.write('{"put": "uniqueId", "val')
+
+            reloaded = GenericStateDatabase.load()
+            assert reloaded.arb_state["key"] == "kept"
+            # the next save rewrites the snapshot rather than appending after the damaged record
+            reloaded.save()
+            assert not os.path.exists(GenericStateDatabase.journal_location())
+            assert GenericStateDatabase.load().arb_state["key"] == "kept"
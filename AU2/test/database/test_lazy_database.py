@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+from unittest.mock import patch
+
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.database.model.LazyDatabase import is_loaded, load_lazily
+from AU2.test.database.test_journal import make_event
+
+
+class TestLazyDatabase:
+
+    def test_loads_on_first_use(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")):
+            db = EventsDatabase.load()
+            e = make_event("event")
+            db.add(e)
+            db.save()
+
+            lazy = load_lazily(EventsDatabase)
+            # none of these need the database itself
+            assert lazy.WRITE_LOCATION == EventsDatabase.WRITE_LOCATION
+            lazy.discard_journal()
+            lazy.save()
+            lazy.compact()
+            assert not is_loaded(lazy)
+
+            assert lazy.get(e.identifier).headline == "event"
+            assert is_loaded(lazy)
+            lazy.add(make_event("another"))
+            lazy.save()
+            assert len(EventsDatabase.load().events) == 2
+
+    def test_pickles_as_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")):
+            lazy = load_lazily(EventsDatabase)
+            lazy.add(make_event("event"))
+            clone = pickle.loads(pickle.dumps(lazy))
+            assert type(clone) is EventsDatabase
+            assert clone == lazy
+
+    def test_is_a_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")):
+            db = EventsDatabase.load()
+            e = make_event("event")
+            db.add(e)
+            db.save()
+
+            lazy = load_lazily(EventsDatabase)
+            assert isinstance(lazy, EventsDatabase)
+            assert not is_loaded(lazy)
+            # dunders are looked up on the class, so they have to load the database too
+            assert lazy == EventsDatabase.load()
+            assert is_loaded(lazy)
+            assert type(lazy) is EventsDatabase
+            assert repr(load_lazily(EventsDatabase)) == repr(lazy)
+
+            # changes made once loaded are saved as usual
+            lazy.get(e.identifier).headline = "changed"
+            lazy.save()
+            assert EventsDatabase.load().get(e.identifier).headline == "changed"
+
+    def test_refresh_in_test_mode_skips_loading(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(EventsDatabase, "WRITE_LOCATION", os.path.join(tmpdir, "EventsSummary.json")), \
+                patch.object(EventsDatabase, "TEST_MODE", True), \
+                patch.object(EventsDatabase, "load", side_effect=AssertionError("loaded")):
+            lazy = load_lazily(EventsDatabase)
+            lazy._refresh()
+            assert lazy.events == {}
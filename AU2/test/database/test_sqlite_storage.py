@@ -0,0 +1,77 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from AU2.database.AssassinsDatabase import AssassinsDatabase
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.database.GenericStateDatabase import GenericStateDatabase
+from AU2.database.model.sqlite_storage import SQLITE_STORAGE
+from AU2.test.database.test_change_tracking import make_assassin
+from AU2.test.database.test_journal import make_event
+
+
+class TestSqliteStorage:
+
+    def setup_method(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(SQLITE_STORAGE, "location", os.path.join(self.tmpdir.name, "AU2.sqlite3")),
+            *(patch.object(cls, "WRITE_LOCATION", os.path.join(self.tmpdir.name, cls.__name__ + ".json"))
+              for cls in (AssassinsDatabase, EventsDatabase, GenericStateDatabase)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def teardown_method(self):
+        SQLITE_STORAGE.close()
+        for p in self.patches:
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def test_migration_both_ways(self):
+        assassins, events = AssassinsDatabase.load(), EventsDatabase.load()
+        a, b = make_assassin("Vendetta"), make_assassin("Blaze")
+        assassins.add(a)
+        assassins.add(b)
+        e = make_event("Vendetta kills Blaze")
+        e.kills = [(a.identifier, b.identifier)]
+        events.add(e)
+        assassins.compact()
+        events.compact()
+
+        SQLITE_STORAGE.create({"assassins": assassins._encode_records(), "events": events._encode_records()})
+        assert SQLITE_STORAGE.active()
+        assert EventsDatabase.load().to_json() == events.to_json()
+        assert SQLITE_STORAGE.deaths_of(b.identifier) == [e.identifier]
+
+        # changes are saved to SQLite and only written to the .json file on compaction
+        snapshot = open(EventsDatabase.WRITE_LOCATION).read()
+        e.kills = []
+        e.pluginState["TestPlugin"] = {"x": 1}
+        events.save()
+        assert open(EventsDatabase.WRITE_LOCATION).read() == snapshot
+        assert SQLITE_STORAGE.deaths_of(b.identifier) == []
+        assert SQLITE_STORAGE.query("SELECT plugin, value FROM plugin_state WHERE owner = ?", (e.identifier,)) == \
+               [("TestPlugin", '{"x": 1}')]
+        assert EventsDatabase.load().to_json() == events.to_json()
+
+        events.compact()
+        SQLITE_STORAGE.delete()
+        assert not SQLITE_STORAGE.active()
+        assert EventsDatabase.load().to_json() == events.to_json()
+        assert AssassinsDatabase.load().to_json() == assassins.to_json()
+
+    def test_replaced_files_are_imported(self):
+        SQLITE_STORAGE.create({})
+        db = GenericStateDatabase.load()
+        db.arb_state["key"] = "value"
+        db.save()
+        assert GenericStateDatabase.load().arb_state == {"key": "value"}
+
+        # e.g. restoring a backup
+        with open(GenericStateDatabase.WRITE_LOCATION, "w") as F:
+            F.write(GenericStateDatabase(uniqueId=7).to_json())
+        GenericStateDatabase.discard_journal()
+        reloaded = GenericStateDatabase.load()
+        assert reloaded.uniqueId == 7
+        assert reloaded.arb_state == {}
@@ -263,3 +263,35 @@ class TestCompetencyPlugin:
 
         for i in range(10):
             assert ASSASSINS_DATABASE.get(p[i + 10] + " identifier") in incos
+
+    @plugin_test
+    def test_timeline_matches_manager_given_events_up_to_date(self):
+        """
+        Tests that asking a manager given every event who was inco at some time gives the same answers as a manager
+        only given the events up to that time.
+        """
+        p = some_players(40)
+        game = MockGame().having_assassins(p)
+        for i in range(10):
+            game.assassin(p[i]).kills(p[i + 10], manual_competency=None)
+            game.new_datetime(minutes=60 * 24 * 2)
+        for i in range(20, 30):
+            game.add_attempts(p[i], p[i + 10])
+            game.new_datetime(minutes=60 * 24)
+        for i in range(20, 25):
+            game.assassin(p[i]).kills(p[i + 10], manual_competency=None)
+
+        manager = self.get_manager(game, auto_competency=True)
+        for days in range(0, 40, 3):
+            query_date = manager.game_start + datetime.timedelta(days=days, seconds=30)
+            expected = CompetencyManager(game_start=game.game_start)
+            expected.activated = True
+            expected.auto_competency = True
+            expected.initial_competency_period = datetime.timedelta(days=7)
+            for e in EVENTS_DATABASE.iter_chronological(end=query_date):
+                expected.add_event(e)
+
+            assert manager.get_incos_as_of(query_date) == expected.get_incos_at(query_date)
+            assert manager.get_inco_corpses_as_of(query_date) == expected.inco_corpses
+            for a in ASSASSINS_DATABASE.assassins.values():
+                assert manager.get_deadline_at(a, query_date) == expected.get_deadline_for(a)
@@ -0,0 +1,124 @@
+import random
+from typing import Dict, List, Set
+
+from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.plugins.custom_plugins.MayWeekUtilitiesPlugin import MayWeekUtilitiesPlugin
+from AU2.test.test_utils import MockGame, some_players, plugin_test
+
+
+def replayed_scores(plugin: MayWeekUtilitiesPlugin, upto: float = float("inf")) -> Dict[str, float]:
+    """
+    Works out May Week scores by going through every event (up to and including secret id `upto`) from scratch
+    """
+    param = lambda name: plugin.gsdb_get(name, 0)
+    pct = lambda name: plugin.gsdb_get(name, 0) / 100
+    teams_enabled = plugin.gsdb_get("Enable Teams?", False)
+    sharing = teams_enabled and plugin.gsdb_get("Share Multipliers?", False)
+    scores = {a.identifier: param("starting_score_casual") if a.is_city_watch else param("starting_score_full")
+              for a in ASSASSINS_DATABASE.get_filtered(include_hidden=lambda _: True)}
+    teams: Dict[str, int] = {}
+    owners: Set[str] = set()
+    for e in EVENTS_DATABASE.iter_by_creation(upto=upto):
+        teams.update((a, t) for (a, t) in plugin.eps_get(e, "Team Changes", {}).items())
+        deltas = dict(plugin.eps_get(e, "BS Points", {}))
+        for (killer, victim) in e.kills:
+            as_team = teams_enabled and (killer, victim) in plugin.eps_get(e, "Kills as Team", [])
+            team = teams.get(killer)
+            with_multiplier = killer in owners or sharing and team is not None and any(
+                teams.get(o) == team for o in owners)
+            # (multiplying by 1 and adding 0 when bonuses don't apply keeps floating point results the same)
+            t, T = (pct("team_bonus_pct"), param("team_bonus_fixed")) if as_team else (1, 0)
+            m, M = (pct("multiplier_bonus_pct"), param("multiplier_bonus_fixed")) if with_multiplier else (1, 0)
+            gain = ((scores[victim] * pct("kill_bonus_pct") + param("kill_bonus_fixed")) * t + T) * m + M
+            deltas[killer] = deltas.get(killer, 0) + gain
+            deltas[victim] = deltas.get(victim, 0) - scores[victim] * pct("death_penalty_pct") \
+                             - param("death_penalty_fixed")
+        for (player, delta) in deltas.items():
+            scores[player] = max(0, scores[player] + delta)
+        for (loser, gainer) in plugin.eps_get(e, "Multiplier Transfers", []):
+            owners.discard(loser)
+            if gainer is not None:
+                owners.add(gainer)
+    return scores
+
+
+class TestMayWeekUtilitiesPlugin:
+
+    def random_event(self, rng: random.Random, game: MockGame, idents: List[str]):
+        killer, victim = rng.sample(idents, 2)
+        kills = [(killer, victim)] if rng.random() < 0.7 else []
+        state = {
+            "team_changes": {rng.choice(idents): rng.choice([None, 0, 1, 2]) for _ in range(rng.randint(0, 2))},
+            "kills_as_team": [k for k in kills if rng.random() < 0.5],
+            "multiplier_transfers": [(rng.choice([None, *idents]), rng.choice([None, *idents]))
+                                     for _ in range(rng.randint(0, 1))],
+            "bs_points": {rng.choice(idents): rng.randint(-3, 5) for _ in range(rng.randint(0, 1))},
+        }
+        return game.assassin(killer.replace(" identifier", "")).is_involved_in_event(
+            kills=kills, pluginState={"MayWeekUtilitiesPlugin": state}).model()
+
+    @plugin_test
+    def test_ledger_matches_replay(self):
+        rng = random.Random(0)
+        p = some_players(10)
+        idents = [name + " identifier" for name in p]
+        game = MockGame().having_assassins(p)
+        game.assassin(p[0]).is_city_watch()
+        plugin = MayWeekUtilitiesPlugin()
+        plugin.gsdb_set("Enable Teams?", True)
+        plugin.gsdb_set("Share Multipliers?", True)
+
+        events = [self.random_event(rng, game, idents) for _ in range(30)]
+        assert plugin.calculate_scores() == replayed_scores(plugin)
+        for e in events[::5]:
+            assert plugin.calculate_scores(e.get_numerical_id()) == replayed_scores(plugin, e.get_numerical_id())
+
+        for _ in range(20):
+            choice = rng.random()
+            if choice < 0.4:
+                events.append(self.random_event(rng, game, idents))
+            elif choice < 0.7:
+                e = rng.choice(events)
+                e.pluginState["MayWeekUtilitiesPlugin"]["bs_points"] = {rng.choice(idents): rng.randint(0, 5)}
+            elif choice < 0.8:
+                e = events.pop(rng.randrange(len(events)))
+                del EVENTS_DATABASE.events[e.identifier]
+            else:
+                plugin.gsdb_set("kill_bonus_fixed", rng.randint(0, 3))
+            assert plugin.calculate_scores() == replayed_scores(plugin)
+            # the ledger goes back to earlier teams without adding the events again, but ends up with the same teams
+            team_manager = plugin.score_ledger().team_manager
+            replayed = plugin.TeamManager().process_events_until()
+            assert list(team_manager.member_to_team.items()) == list(replayed.member_to_team.items())
+            assert team_manager.history == replayed.history
+            assert {t: m for (t, m) in team_manager.members.items() if m} == replayed.members
+
+        # the multiplier owners before each event
+        owners = set()
+        for e in EVENTS_DATABASE.iter_by_creation():
+            assert plugin.get_multiplier_owners(before_event=e.get_numerical_id()) == sorted(owners)
+            for (loser, gainer) in plugin.eps_get(e, "Multiplier Transfers", []):
+                owners.discard(loser)
+                if gainer is not None:
+                    owners.add(gainer)
+        assert plugin.get_multiplier_owners() == sorted(owners)
+
+    @plugin_test
+    def test_team_snapshots(self):
+        rng = random.Random(1)
+        p = some_players(8)
+        idents = [name + " identifier" for name in p]
+        game = MockGame().having_assassins(p)
+        plugin = MayWeekUtilitiesPlugin()
+        events = [self.random_event(rng, game, idents) for _ in range(25)]
+
+        team_manager = plugin.TeamManager().process_events_until()
+        for e in events:
+            replayed = plugin.TeamManager().process_events_until(before_event=e.get_numerical_id() + 1)
+            assert team_manager.team_to_member_map_at(e.get_numerical_id()) == replayed.team_to_member_map()
+            for ident in idents:
+                assert team_manager.team_at(ident, e.get_numerical_id()) == replayed.member_to_team[ident]
+        for (team, members) in team_manager.team_to_member_map().items():
+            assert team_manager.members_of(team) == members
+        assert team_manager.members_of(None) == set()
@@ -1,11 +1,20 @@
+import datetime
+import os
 import random
 import math
+import tempfile
 from typing import Dict
+from unittest import mock
 
 from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
 from AU2.database.EventsDatabase import EVENTS_DATABASE
-from AU2.plugins.custom_plugins.ScoringPlugin import ScoringPlugin
+from AU2.plugins.custom_plugins.ScoringPlugin import ScoringPlugin, KILLTREE_PATH, STATS_NAVBAR_ENTRY
+import pytest
+
 from AU2.plugins.util.ScoreManager import ScoreManager
+from AU2.plugins.util.formula import InvalidFormulaException
+from AU2.plugins.util.StatsTable import StatsTable
+from AU2.plugins.util.page_manifest import PageManifest
 from AU2.test.test_utils import MockGame, some_players, plugin_test, dummy_event
 
 
@@ -239,3 +248,143 @@ class TestScoringPlugin:
 
         # check the open season list is correct
         assert manager.live_assassins == {idents[4], idents[5]}
+
+    @plugin_test
+    def test_conkers_match_search_of_kill_graph(self):
+        """
+        Tests conkers against a straightforward search of random kill graphs (with perma-death turned off, so that
+        there are loops and players reachable by several paths)
+        """
+        rng = random.Random(0)
+        p = some_players(30)
+        idents = [name + " identifier" for name in p]
+        game = MockGame().having_assassins(p)
+        for _ in range(45):
+            game.assassin(rng.choice(p)).kills(rng.choice(p)).then().new_datetime()
+
+        manager = self.get_manager(game, perma_death=False)
+        for ident in idents:
+            reachable = set()
+            to_visit = [ident]
+            while to_visit:
+                for v in manager.kill_tree.get(to_visit.pop(), []):
+                    if v not in reachable:
+                        reachable.add(v)
+                        to_visit.append(v)
+            reachable.discard(ident)
+            assert manager._conkers(ident) == len(reachable)
+
+    @plugin_test
+    def test_long_chain_of_kills(self):
+        """
+        Tests that conkers are counted for a chain of kills too long to search recursively
+        """
+        n = 3000
+        manager = ScoreManager(assassin_ids=[str(i) for i in range(n)])
+        for i in range(1, n):
+            e = dummy_event()
+            e.kills = [(str(i), str(i - 1))]
+            manager.add_event(e)
+        assert manager._conkers(str(n - 1)) == n - 1
+        assert manager._conkers("0") == 0
+
+    @plugin_test
+    def test_scores_from_formula(self):
+        p = some_players(10)
+        idents = [name + " identifier" for name in p]
+        game = MockGame().having_assassins(p)
+        attempts_map = self.random_attempts(game)
+        for i in range(1, 10, 2):
+            game.assassin(p[i]).kills(p[i - 1]).then().new_datetime()
+        game.assassin(p[9]).kills(p[7]).then().new_datetime()
+
+        manager = self.get_manager(game)
+        manager.formula = "k + 2*c + math.sqrt(a)"
+        for (name, ident) in zip(p, idents):
+            assert manager._score(ident) == manager._kills(ident) + 2 * manager._conkers(ident) \
+                   + math.sqrt(attempts_map.get(name, 0))
+
+        assert ScoringPlugin().formula_is_valid("k + 2*c + math.sqrt(a)")
+        assert not ScoringPlugin().formula_is_valid("k / a")
+        assert not ScoringPlugin().formula_is_valid("__import__('os').getcwd()")
+
+        # a formula that can't be evaluated for some players only fails if their scores are needed
+        manager = self.get_manager(game)
+        manager.formula = "k / a"
+        for (name, ident) in zip(p, idents):
+            if attempts_map.get(name):
+                assert manager._score(ident) == manager._kills(ident) / attempts_map[name]
+        # whereas an invalid one fails straight away
+        manager = self.get_manager(game)
+        manager.formula = "sum([k])"
+        with pytest.raises(InvalidFormulaException):
+            manager._score(idents[0])
+
+    @plugin_test
+    def test_invalid_formula(self):
+        game = MockGame().having_assassins(some_players(2))
+        game.assassin(game.all_assassins[0]).kills(game.all_assassins[1])
+        plugin = ScoringPlugin()
+        labels = [c.title for c in plugin.answer_set_formula({plugin.html_ids["Formula"]: "k +"})]
+        assert labels[0].startswith("[SCORING] Scoring formula not set")
+        assert plugin.gsdb_get("Formula") == ""
+
+        # e.g. a formula stored by an older version of AU2
+        plugin.gsdb_set("Formula", "len('k')")
+        labels = [c.title for c in plugin._generate_stats_page(["Real Name"], False, [])]
+        assert labels == ["[WARNING] [SCORING] Invalid scoring formula -- skipping stats page!"]
+
+    @plugin_test
+    def test_stats_table(self):
+        p = some_players(8)
+        game = MockGame().having_assassins(p)
+        self.random_attempts(game)
+        game.assassin(p[1]).kills(p[0]).then().new_datetime()
+        game.assassin(p[3]).kills(p[2]).then().new_datetime()
+        game.assassin(p[1]).kills(p[3]).then().new_datetime()
+
+        manager = self.get_manager(game)
+        manager.formula = "k"
+        manager.game_end = max(e.datetime for e in EVENTS_DATABASE.events.values()) + datetime.timedelta(days=1)
+        assassins = [ASSASSINS_DATABASE.get(name + " identifier") for name in p]
+        table = StatsTable(manager, assassins)
+        for (i, a) in enumerate(assassins):
+            assert table.kills[i] == manager.get_kills(a)
+            assert table.conkers[i] == manager.get_conkers(a)
+            assert table.get_conkers(a.identifier) == manager.get_conkers(a)
+            assert table.attempts[i] == manager.get_attempts(a)
+            assert table.scores[i] == manager.get_score(a)
+            assert table.ratings[i] == manager.get_rating(a)
+            assert table.death_events[i] == manager.get_death_events(a)
+        # players without a row (e.g. city watch in the kill tree) can still have their conkers looked up
+        partial = StatsTable(manager, assassins[:2])
+        assert partial.get_conkers(assassins[3].identifier) == manager.get_conkers(assassins[3]) == 1
+
+        order = table.by_rating()
+        assert order == sorted(range(len(p)), key=lambda i: (-manager.get_rating(assassins[i]),
+                                                             -manager.get_score(assassins[i])))
+        # survivors are ranked by score, with those who didn't kill anyone tied, and then the rest by time of death
+        assert order[0] == 1
+        assert order[5:] == [3, 2, 0]
+        assert table.tied_ranks(order) == [1, 2, 2, 2, 2, 6, 7, 8]
+
+    @plugin_test
+    def test_stats_page_with_killtree(self):
+        p = some_players(6)
+        game = MockGame().having_assassins(p).assassin(p[0]).is_city_watch()
+        game.assassin(p[1]).kills(p[2]).then().new_datetime()
+        game.assassin(p[0]).kills(p[1]).then().new_datetime()
+        game.assassin(p[3]).kills(p[4]).then().new_datetime()
+
+        plugin = ScoringPlugin()
+        plugin.gsdb_set("Formula", "k + 2*c")
+        with tempfile.TemporaryDirectory() as location:
+            manifest = PageManifest(os.path.join(location, "page_manifest"), location)
+            with mock.patch("AU2.plugins.custom_plugins.ScoringPlugin.WEBPAGE_WRITE_LOCATION", location), \
+                    mock.patch("AU2.plugins.custom_plugins.ScoringPlugin.PAGE_MANIFEST", manifest):
+                components = plugin._generate_stats_page(["Real Name", "Conkers Score"], True, [])
+            labels = [c.title for c in components]
+            assert "[SCORING] Generated killtree page." in labels
+            assert os.path.exists(os.path.join(location, KILLTREE_PATH))
+            with open(os.path.join(location, STATS_NAVBAR_ENTRY.url)) as F:
+                assert KILLTREE_PATH in F.read()
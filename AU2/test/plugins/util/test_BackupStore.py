@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+import pytest
+
+from AU2.plugins.util.BackupStore import BackupStore
+
+
+def write(directory: str, name: str, text: str):
+    with open(os.path.join(directory, name), "w") as F:
+        F.write(text)
+
+
+class TestBackupStore:
+
+    def test_backups_share_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as location:
+            store = BackupStore(location)
+            write(source, "a.json", "{\"a\": 1}")
+            write(source, "b.json", "{\"b\": 1}")
+            store.create("first", source, ["a.json", "b.json"])
+            write(source, "b.json", "{\"b\": 2}")
+            store.create("second", source, ["a.json", "b.json"])
+
+            first = store.files("first")
+            second = store.files("second")
+            assert first["a.json"] == second["a.json"]
+            assert first["b.json"] != second["b.json"]
+            blobs = [f for (_, _, files) in os.walk(os.path.join(location, BackupStore.BLOBS)) for f in files]
+            assert len(blobs) == 3
+
+            assert store.list_backups() == ["second", "first"]
+            diff = store.diff("first", "second")
+            assert diff.changed == ["b.json"]
+            assert diff.added == diff.removed == []
+
+            with pytest.raises(FileExistsError):
+                store.create("first", source, ["a.json"])
+
+    def test_restore(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as location, \
+                tempfile.TemporaryDirectory() as target:
+            store = BackupStore(location)
+            write(source, "a.json", "{\"a\": 1}")
+            store.create("backup", source, ["a.json"])
+            assert store.restore("backup", target) == ["a.json"]
+            with open(os.path.join(target, "a.json")) as F:
+                assert F.read() == "{\"a\": 1}"
+
+    def test_invalid_names(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as location:
+            store = BackupStore(os.path.join(location, "backup"))
+            write(source, "a.json", "1")
+            for name in ("", "..", "../escaped", "a/b", os.path.join("a", "b")):
+                with pytest.raises(ValueError):
+                    store.create(name, source, ["a.json"])
+                with pytest.raises(ValueError):
+                    store.restore(name, source)
+            assert os.listdir(location) == []
+
+    def test_prune_deletes_unreferenced_files(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as location:
+            store = BackupStore(location)
+            for i in range(3):
+                write(source, "a.json", str(i))
+                store.create(f"backup {i}", source, ["a.json"])
+            assert store.prune(1) == ["backup 1", "backup 0"]
+            assert store.list_backups() == ["backup 2"]
+            assert store.read("backup 2", "a.json") == b"2"
+            blobs = [f for (_, _, files) in os.walk(os.path.join(location, BackupStore.BLOBS)) for f in files]
+            assert len(blobs) == 1
+
+    def test_legacy_backups(self):
+        with tempfile.TemporaryDirectory() as location:
+            os.mkdir(os.path.join(location, "old"))
+            write(os.path.join(location, "old"), "a.json", "1")
+            store = BackupStore(location)
+            write(location, "a.json", "2")
+            store.create("new", location, ["a.json"])
+            assert store.list_backups() == ["new", "old"]
+            assert store.diff("old", "new").changed == ["a.json"]
+            assert store.read("old", "a.json") == b"1"
+            store.prune(1)
+            assert store.list_backups() == ["new"]
@@ -0,0 +1,53 @@
+import random
+
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
+from AU2.plugins.util.CityWatchRankManager import CityWatchRankManager
+from AU2.test.test_utils import MockGame, plugin_test, some_players
+
+
+class TestCityWatchRankManager:
+
+    @plugin_test
+    def test_ranks_over_time(self):
+        rng = random.Random(0)
+        p = some_players(8)
+        idents = [name + " identifier" for name in p]
+        game = MockGame().having_assassins(p)
+        for name in p[:5]:
+            game.assassin(name).is_city_watch()
+        GENERIC_STATE_DATABASE.arb_state["CityWatchPlugin"] = {
+            "CityWatchPlugin_umpires": [idents[0]],
+            "CityWatchPlugin_cop": [idents[1]],
+        }
+        for _ in range(40):
+            if rng.random() < 0.5:
+                killer, victim = rng.sample(p, 2)
+                game.assassin(killer).kills(victim)
+            else:
+                game.assassin(rng.choice(p)).is_involved_in_event(
+                    pluginState={"CityWatchPlugin": {rng.choice(idents[:5]): rng.randint(-2, 2)}})
+            if rng.random() < 0.3:
+                game.new_datetime(minutes=0)
+
+        manager = CityWatchRankManager(auto_ranking=True, city_watch_kill_ranking=False)
+        events = list(EVENTS_DATABASE.iter_chronological())
+        for e in events:
+            manager.add_event(e)
+            ranks = manager.assassin_relative_ranks.values()
+            assert manager.get_min_rank() == min(ranks, default=0)
+            assert manager.get_max_rank() == max(ranks, default=0)
+        # so that there are names for all the ranks
+        manager.generate_new_ranks_if_necessary()
+
+        # ranks as of each event, once all the events have been added
+        for e in events:
+            replayed = CityWatchRankManager(auto_ranking=True, city_watch_kill_ranking=False)
+            for earlier in EVENTS_DATABASE.iter_chronological(end=e.datetime):
+                replayed.add_event(earlier)
+            for ident in idents[2:]:
+                assert manager.get_relative_rank_at(ident, e.datetime) == replayed.assassin_relative_ranks.get(ident, 0)
+            assert manager.get_relative_rank_at(idents[0], e.datetime) == replayed.get_max_rank() + 2
+            assert manager.get_relative_rank_at(idents[1], e.datetime) == replayed.get_max_rank() + 1
+            assert manager.get_rank_name_at(idents[0], e.datetime) == \
+                   manager.ranks[replayed.get_max_rank() + 2 + manager.default_rank]
@@ -1,4 +1,12 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from AU2.database.GenericStateDatabase import GENERIC_STATE_DATABASE
 from AU2.plugins.CorePlugin import CorePlugin
+from AU2.plugins.custom_plugins.LocalBackupPlugin import LocalBackupPlugin
+from AU2.plugins.util import local_config
+from AU2.plugins.util.BackupStore import BackupStore
 from AU2.test.test_utils import MockGame, some_players, Database, plugin_test
 
 
@@ -34,3 +42,18 @@ class TestLocalBackupPlugin:
             Database.doesnt_have_assassin(player)
 
         Database.has_no_events()
+
+    @plugin_test
+    def test_retention_is_local(self):
+        """
+        Confirms the number of backups to keep isn't stored in the databases, which are synced and backed up
+        """
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(local_config, "LOCAL_CONFIG_LOCATION", os.path.join(tmpdir, "local_config")):
+            plugin = LocalBackupPlugin()
+            plugin.store = BackupStore(os.path.join(tmpdir, "backup"))
+            assert plugin.get_retention() == 0
+            plugin.answer_set_retention({plugin.html_ids["Retention"]: 3})
+            assert plugin.get_retention() == 3
+            assert plugin.identifier not in GENERIC_STATE_DATABASE.arb_state
+            assert local_config.get_local_setting(plugin.identifier + "_retention") == 3
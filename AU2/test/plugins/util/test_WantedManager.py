@@ -0,0 +1,85 @@
+import datetime
+import random
+
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.plugins.util.WantedManager import WantedManager
+from AU2.test.test_utils import MockGame, plugin_test, some_players
+
+
+def last_entry_wanted(player_id: str, time: datetime.datetime) -> bool:
+    """
+    Whether the player is wanted at `time`, judged by the last wanted or death entry for them up to `time`
+    """
+    last = None
+    for e in EVENTS_DATABASE.iter_chronological(end=time):
+        if player_id in e.pluginState.get("WantedPlugin", {}):
+            duration, _, _ = e.pluginState["WantedPlugin"][player_id]
+            last = e.datetime + datetime.timedelta(days=duration)
+        if any(victim == player_id for (_, victim) in e.kills):
+            last = None
+    return last is not None and last > time
+
+
+class TestWantedManager:
+
+    def get_manager(self) -> WantedManager:
+        m = WantedManager()
+        m.activated = True
+        for e in EVENTS_DATABASE.iter_chronological():
+            m.add_event(e)
+        return m
+
+    @plugin_test
+    def test_wanted_at_any_time(self):
+        rng = random.Random(0)
+        p = some_players(6)
+        game = MockGame().having_assassins(p)
+        for _ in range(40):
+            player = rng.choice(p)
+            if rng.random() < 0.6:
+                game.assassin(player).is_involved_in_event(pluginState={
+                    "WantedPlugin": {player + " identifier": [rng.randint(0, 3), "crime", "redemption"]}
+                })
+            else:
+                game.assassin(rng.choice(p)).kills(player, manual_competency=None)
+            game.new_datetime(minutes=rng.randint(0, 60 * 24 * 2))
+
+        manager = self.get_manager()
+        start = game.game_start
+        for hours in range(0, 24 * 90, 7):
+            time = start + datetime.timedelta(hours=hours)
+            wanted = manager.get_live_wanted_players(time=time)
+            for player in p:
+                ident = player + " identifier"
+                assert manager.is_player_wanted(ident, time) == last_entry_wanted(ident, time), (ident, time)
+                assert (ident in wanted) == last_entry_wanted(ident, time)
+                # wanted periods start at events, so a player wanted during a period was wanted at its start or
+                # at an event during it
+                end = time + datetime.timedelta(hours=7)
+                assert manager.was_player_wanted_during(ident, time, end) == any(
+                    manager.is_player_wanted(ident, t) for t in
+                    [time] + [e.datetime for e in EVENTS_DATABASE.iter_chronological(start=time, end=end)
+                              if e.datetime < end]
+                )
+
+    @plugin_test
+    def test_wanted_player_deaths(self):
+        p = some_players(4)
+        game = MockGame().having_assassins(p)
+        game.assassin(p[0]).is_involved_in_event(pluginState={
+            "WantedPlugin": {p[0] + " identifier": [1, "first crime", "redemption"]}
+        })
+        game.new_datetime(minutes=60)
+        # dies while wanted
+        game.assassin(p[1]).kills(p[0])
+        # dies again, which doesn't count
+        game.assassin(p[2]).kills(p[0])
+        game.assassin(p[1]).is_involved_in_event(pluginState={
+            "WantedPlugin": {p[1] + " identifier": [1, "second crime", "redemption"]}
+        })
+        game.new_datetime(minutes=60 * 24 * 2)
+        # dies after their wanted period is up, which doesn't count
+        game.assassin(p[2]).kills(p[1])
+
+        deaths = self.get_manager().get_wanted_player_deaths()
+        assert [(d["player_id"], d["crime"]) for d in deaths] == [(p[0] + " identifier", "first crime")]
@@ -0,0 +1,188 @@
+import datetime
+import os
+import pickle
+import random
+import tempfile
+from typing import List, Optional
+
+from AU2 import TIMEZONE
+from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.database.model import Assassin, Event
+from AU2.plugins.util import replay as replay_module
+from AU2.plugins.util.checkpoints import CheckpointStore, CHECKPOINTS_KEPT
+from AU2.plugins.util.CityWatchRankManager import CityWatchRankManager
+from AU2.plugins.util.CompetencyManager import CompetencyManager
+from AU2.plugins.util.game import get_game_start
+from AU2.plugins.util.render_cache import RenderCache
+from AU2.plugins.util.render_utils import register_renderer
+from AU2.plugins.util.replay import Replay
+from AU2.plugins.util.ScoreManager import ScoreManager
+from AU2.test.test_utils import MockGame, plugin_test, some_players
+
+START = datetime.datetime(year=2022, month=9, day=1, hour=10, minute=0, second=0, tzinfo=TIMEZONE)
+
+
+class RecordingManager:
+    """
+    Records the events it is given, and counts those given since it was constructed (or restored).
+    """
+    def __init__(self):
+        self.events: List[str] = []
+        self.given = 0
+
+    def add_event(self, e: Event):
+        self.events.append(e.identifier)
+        self.given += 1
+
+    def __getstate__(self):
+        return {"events": self.events}
+
+    def __setstate__(self, state):
+        self.events = list(state["events"])
+
+
+def comparable(obj):
+    """
+    Converts a manager's state into something that can be compared with ==.
+    """
+    if isinstance(obj, (Event, Assassin)):
+        return obj.identifier
+    if isinstance(obj, dict):
+        return {k: comparable(v) for (k, v) in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [comparable(v) for v in obj]
+    if isinstance(obj, set):
+        return sorted(obj)
+    if hasattr(obj, "__dict__"):
+        state = obj.__getstate__() if hasattr(type(obj), "__setstate__") else vars(obj)
+        return type(obj).__name__, comparable(state)
+    return obj
+
+
+def register_all(replay: Replay, until: datetime.datetime, render_cache: Optional[RenderCache] = None) -> list:
+    identifiers = ASSASSINS_DATABASE.get_identifiers()
+    start = get_game_start()
+    return [
+        register_renderer(replay, "news", render_cache=render_cache),
+        replay.register(("ScoreManager", "stats"), lambda: ScoreManager(identifiers), checkpoint=True),
+        replay.register(("CityWatchRankManager", True, False), lambda: CityWatchRankManager(True, False),
+                        checkpoint=True),
+        replay.register(("CompetencyManager", start), lambda: CompetencyManager(start), until=until,
+                        checkpoint=True),
+        replay.register("recorder", RecordingManager, checkpoint=True),
+    ]
+
+
+def random_event(rng: random.Random, players: List[str]) -> Event:
+    involved = rng.sample(players, rng.randint(1, 4))
+    plugin_state = {}
+    if rng.random() < 0.3:
+        plugin_state["CompetencyPlugin"] = {"attempts": involved[:rng.randint(1, len(involved))]}
+    if rng.random() < 0.2:
+        plugin_state["WantedPlugin"] = {involved[0]: [rng.randint(1, 5), "crime", "redemption"]}
+    if rng.random() < 0.1:
+        plugin_state["CityWatchPlugin"] = {involved[-1]: rng.choice((-1, 1))}
+    kills = []
+    if len(involved) > 1 and rng.random() < 0.6:
+        kills = [(involved[0], v) for v in involved[1:rng.randint(2, len(involved))]]
+    return Event(
+        assassins={a: 0 for a in involved},
+        datetime=START + datetime.timedelta(minutes=rng.randint(0, 20000)),
+        headline=f"[P{involved[0]}] did something",
+        reports=[],
+        kills=kills,
+        pluginState=plugin_state,
+    )
+
+
+class TestCheckpoints:
+
+    def test_checkpointed_replay_matches_full_replay(self):
+        interval = replay_module.CHECKPOINT_INTERVAL
+        replay_module.CHECKPOINT_INTERVAL = 4
+        try:
+            for seed in range(5):
+                plugin_test(self._check_random_game)(seed)
+        finally:
+            replay_module.CHECKPOINT_INTERVAL = interval
+
+    def _check_random_game(self, seed: int):
+        rng = random.Random(seed)
+        MockGame().having_assassins(some_players(10))
+        players = sorted(ASSASSINS_DATABASE.get_identifiers())
+        ASSASSINS_DATABASE.get(players[0]).is_city_watch = True
+        until = START + datetime.timedelta(minutes=10000)
+        for _ in range(20):
+            EVENTS_DATABASE.add(random_event(rng, players))
+
+        with tempfile.TemporaryDirectory() as location:
+            store = CheckpointStore(os.path.join(location, "checkpoints"))
+            render_cache = RenderCache(os.path.join(location, "render_cache"))
+            for step in range(25):
+                mutation = rng.random()
+                if mutation < 0.5 or not EVENTS_DATABASE.events:
+                    EVENTS_DATABASE.add(random_event(rng, players))
+                elif mutation < 0.8:
+                    e = rng.choice(list(EVENTS_DATABASE.events.values()))
+                    e.datetime = START + datetime.timedelta(minutes=rng.randint(0, 20000))
+                else:
+                    del EVENTS_DATABASE.events[rng.choice(list(EVENTS_DATABASE.events))]
+
+                if step == 10:
+                    # the renderer's snapshots can't be used without its renderings
+                    render_cache.clear()
+                checkpointed = Replay(store)
+                checkpointed_managers = register_all(checkpointed, until, render_cache)
+                checkpointed.run()
+                checkpointed_managers[0].save_render_cache()
+                full = Replay()
+                full_managers = register_all(full, until)
+                full.run()
+
+                # (the renderers' states only differ in the fingerprints of their renderings)
+                assert checkpointed_managers[0].get_pages() == full_managers[0].get_pages(), (seed, step)
+                for (restored, expected) in zip(checkpointed_managers[1:], full_managers[1:]):
+                    assert comparable(restored) == comparable(expected), (seed, step, type(expected).__name__)
+
+            # adding an event at the end only replays the events since the last snapshot
+            last = random_event(rng, players)
+            last.datetime = START + datetime.timedelta(days=30)
+            EVENTS_DATABASE.add(last)
+            recorder = Replay(store).get("recorder", RecordingManager, checkpoint=True)
+            assert recorder.events == [e.identifier for e in EVENTS_DATABASE.iter_chronological()]
+            assert recorder.given <= replay_module.CHECKPOINT_INTERVAL
+
+    @plugin_test
+    def test_checkpoint_size(self):
+        interval = replay_module.CHECKPOINT_INTERVAL
+        replay_module.CHECKPOINT_INTERVAL = 4
+        try:
+            rng = random.Random(0)
+            MockGame().having_assassins(some_players(10))
+            players = sorted(ASSASSINS_DATABASE.get_identifiers())
+            until = START + datetime.timedelta(minutes=10000)
+            with tempfile.TemporaryDirectory() as location:
+                store = CheckpointStore(os.path.join(location, "checkpoints"))
+                render_cache = RenderCache(os.path.join(location, "render_cache"))
+
+                def checkpoint_size(events: int) -> int:
+                    for _ in range(events):
+                        EVENTS_DATABASE.add(random_event(rng, players))
+                    replay = Replay(store)
+                    renderer = register_all(replay, until, render_cache)[0]
+                    replay.run()
+                    renderer.save_render_cache()
+                    return sum(os.path.getsize(os.path.join(store.location, f)) for f in os.listdir(store.location))
+
+                small = checkpoint_size(100)
+                # the snapshots kept are at most linear in the number of events (rather than quadratic)
+                assert checkpoint_size(100) < 2.5 * small
+                for f in os.listdir(store.location):
+                    with open(os.path.join(store.location, f), "rb") as F:
+                        (key, checkpoints) = pickle.load(F)
+                    assert len(checkpoints) <= CHECKPOINTS_KEPT, key
+                    # the renderer's snapshots don't include its renderings
+                    assert b"did something" not in pickle.dumps(checkpoints), key
+        finally:
+            replay_module.CHECKPOINT_INTERVAL = interval
@@ -0,0 +1,23 @@
+import math
+
+import pytest
+
+from AU2.plugins.util.formula import compile_formula, InvalidFormulaException
+
+
+class TestFormula:
+
+    def test_formulas_evaluate_as_python(self):
+        stats = [(0, 0, 0, 0), (1, 3, 2, 5), (4, 10, -1, 2)]
+        for formula in ("c", "k + 2*c - b", "k**2 / (a + 1)", "math.sqrt(c) + max(k, a)", "-k if a > 2 else round(c/3)",
+                        "math.pi * abs(b)"):
+            compiled = compile_formula(formula)
+            expected = [eval(formula, {"math": math}, dict(zip("kcba", s))) for s in stats]
+            assert [compiled(*s) for s in stats] == expected
+            assert compiled.evaluate_all(*map(list, zip(*stats))) == expected
+
+    def test_unsafe_formulas_are_rejected(self):
+        for formula in ("", "k +", "__import__('os')", "open('x')", "x", "math", "math.__loader__", "k.real",
+                        "(lambda: 1)()", "[k for k in range(10)]", "'k'", "max(k, key=c)", "k(1)", "math.sqrt.__call__(k)"):
+            with pytest.raises(InvalidFormulaException):
+                compile_formula(formula)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+
+from AU2.plugins.util.page_manifest import PageManifest
+
+
+class TestPageManifest:
+
+    def test_only_changed_pages_are_published(self):
+        with tempfile.TemporaryDirectory() as location:
+            pages = os.path.join(location, "pages")
+            os.makedirs(pages)
+            manifest_path = os.path.join(location, "page_manifest")
+
+            def publish(manifest: PageManifest):
+                changed = manifest.changed_pages()
+                for page in changed:
+                    manifest.mark_published(page)
+                manifest.save()
+                for page in os.listdir(pages):
+                    os.remove(os.path.join(pages, page))
+                return changed
+
+            manifest = PageManifest(manifest_path, pages)
+            assert manifest.write_page("news01.html", "week 1")
+            assert manifest.write_page("news02.html", "week 2")
+            # a page is only rewritten if it differs from the copy waiting to be published
+            assert not manifest.write_page("news02.html", "week 2")
+            assert publish(manifest) == ["news01.html", "news02.html"]
+
+            # a new manifest (e.g. next time AU2 is run) reads what was published
+            manifest = PageManifest(manifest_path, pages)
+            assert manifest.write_page("news01.html", "week 1")
+            assert manifest.write_page("news02.html", "week 2, updated")
+            assert manifest.write_page("news03.html", "week 3")
+            # pages written some other way are only published if they have changed
+            with open(os.path.join(pages, "news04.html"), "w") as F:
+                F.write("week 4")
+            assert publish(manifest) == ["news02.html", "news03.html", "news04.html"]
+
+            # a page changed back to what was published doesn't need publishing
+            assert manifest.write_page("news03.html", "week 3, updated")
+            assert manifest.write_page("news03.html", "week 3")
+            assert publish(manifest) == []
+
+            manifest.forget("news03.html")
+            assert manifest.write_page("news03.html", "week 3")
+            assert publish(manifest) == ["news03.html"]
+
+            # pages can be written a piece at a time
+            assert manifest.write_page("news04.html", iter(["week ", "4, updated"]))
+            assert not manifest.write_page("news04.html", "week 4, updated")
+            assert manifest.changed_pages() == ["news04.html"]
+
+    def test_reload(self):
+        with tempfile.TemporaryDirectory() as location:
+            pages = os.path.join(location, "pages")
+            os.makedirs(pages)
+            manifest = PageManifest(os.path.join(location, "page_manifest"), pages)
+            manifest.write_page("news01.html", "week 1")
+            assert manifest.changed_pages() == ["news01.html"]
+
+            # someone else publishes the same page, and their manifest is fetched
+            other = PageManifest(os.path.join(location, "other_manifest"), pages)
+            other.mark_published("news01.html")
+            other.save()
+            shutil.copy(other.path, manifest.path)
+            assert manifest.changed_pages() == ["news01.html"]
+            manifest.reload()
+            assert manifest.changed_pages() == []
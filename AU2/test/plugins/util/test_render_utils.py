@@ -1,5 +1,40 @@
-from AU2.plugins.util.render_utils import adjust_brightness, event_url
-from AU2.test.test_utils import dummy_event, plugin_test
+import itertools
+import random
+import re
+import tempfile
+
+from AU2.database.AssassinsDatabase import ASSASSINS_DATABASE
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.database.model import Event
+from AU2.plugins.util import render_utils
+from AU2.plugins.util.game import soft_escape
+from AU2.plugins.util.render_cache import RenderCache
+from AU2.plugins.util.render_utils import adjust_brightness, event_url, render_headline_and_reports, \
+    substitute_pseudonyms, FORMAT_SPECIFIER_REGEX, default_color_fn, register_renderer, set_real_name_brightness, \
+    PageTemplate, NEWS_TEMPLATE
+from AU2.plugins.util.replay import Replay
+from AU2.test.test_utils import dummy_event, plugin_test, MockGame, some_players
+
+
+def render_one_assassin_at_a_time(e: Event):
+    """
+    Renders the headline and reports of an event by substituting the pseudonym codes of each assassin in turn
+    """
+    headline = e.headline
+    reports = {(playerID, pseudonymID): soft_escape(report) for (playerID, pseudonymID, report) in e.reports}
+    candidates = []
+    for r in itertools.chain((headline,), reports.values()):
+        for match in re.findall(FORMAT_SPECIFIER_REGEX, r):
+            assassin = ASSASSINS_DATABASE.get_by_secret_id(int(match[0]))
+            if assassin is None or any(c[0].identifier == assassin.identifier for c in candidates):
+                continue
+            pseudonym = assassin.get_pseudonym(int(match[1] or e.assassins.get(assassin.identifier, 0)))
+            candidates.append((assassin, pseudonym, default_color_fn(pseudonym, assassin, e, ())))
+    for (assassin, pseudonym, color) in candidates:
+        headline = substitute_pseudonyms(headline, pseudonym, assassin, color, e.datetime)
+        reports = {k: substitute_pseudonyms(r, pseudonym, assassin, color, e.datetime) for (k, r) in reports.items()}
+    return headline, reports
+
 
 class TestRenderUtils:
     def test_adjust_brightness(self):
@@ -16,3 +51,110 @@ class TestRenderUtils:
         event.pluginState = {"PageGeneratorPlugin": {"HIDDEN": True}}
         # test passes so long as this doesn't crash AU2
         event_url(event)
+
+    @plugin_test
+    def test_pseudonym_codes(self):
+        rng = random.Random(0)
+        p = some_players(5)
+        MockGame().having_assassins(p)
+        assassins = [ASSASSINS_DATABASE.get(name + " identifier") for name in p]
+        assassins[0].pseudonyms.append("Second <pseudonym>")
+        assassins[1].pseudonyms.append("")
+        assassins[1].pseudonyms.append("Third")
+        ids = [a._secret_id for a in assassins] + ["0" + assassins[2]._secret_id, "999"]
+
+        def random_text():
+            parts = []
+            for _ in range(rng.randint(0, 12)):
+                kind = rng.choice("PPPDLNV,X")
+                index = rng.choice(["", "", "_0", "_1", "_2", "_02", "_"])
+                parts.append(rng.choice([f"[{kind}{rng.choice(ids)}{index}]", "text & <b>", "[", "]", "_1]", " "]))
+            return "".join(parts)
+
+        for _ in range(300):
+            e = dummy_event()
+            e.headline = random_text()
+            e.reports = [(a.identifier, 0, random_text()) for a in rng.sample(assassins, rng.randint(0, 3))]
+            e.assassins = {a.identifier: rng.randint(0, 2) for a in rng.sample(assassins, 2)}
+            assert render_headline_and_reports(e) == render_one_assassin_at_a_time(e)
+
+        # pseudonyms that are themselves pseudonym codes
+        assassins[3].pseudonyms[0] = f"[N{assassins[3]._secret_id}] [P{assassins[4]._secret_id}]"
+        e = dummy_event()
+        e.headline = f"[P{assassins[4]._secret_id}] [V{assassins[3]._secret_id}] [P{assassins[3]._secret_id}]"
+        assert render_headline_and_reports(e) == render_one_assassin_at_a_time(e)
+
+    @plugin_test
+    def test_render_cache(self):
+        p = some_players(6)
+        game = MockGame().having_assassins(p)
+        ids = {name: game.assassin_model(name)._secret_id for name in p}
+        game.assassin(p[0]).kills(p[1], headline=f"[P{ids[p[0]]}] kills [V{ids[p[1]]}]").then() \
+            .assassin(p[2]).is_involved_in_event(headline=f"[P{ids[p[2]]}] lurks").then() \
+            .assassin(p[3]).kills(p[2], headline=f"[P{ids[p[3]]}] kills [P{ids[p[2]]}]").then() \
+            .assassin(p[4]).is_involved_in_event(headline=f"[L{ids[p[5]]}] and [P{ids[p[4]]}]") \
+            .with_report(p[5], 0, f"[N{ids[p[5]]}] reporting")
+        events = list(EVENTS_DATABASE.iter_chronological())
+
+        rendered = []
+        render_event = render_utils.render_event
+
+        def counting_render_event(e, *args, **kwargs):
+            rendered.append(e.identifier)
+            return render_event(e, *args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as location:
+            cache = RenderCache(location)
+
+            def render(render_cache=cache):
+                rendered.clear()
+                replay = Replay()
+                renderer = register_renderer(replay, "news", render_cache=render_cache)
+                replay.run()
+                renderer.save_render_cache()
+                return renderer.get_pages()
+
+            render_utils.render_event = counting_render_event
+            try:
+                pages = render()
+                assert len(rendered) == len(events)
+                assert pages == render(None)
+                assert render() == pages
+                assert rendered == []
+
+                # only the edited event is rendered again
+                events[1].headline += " around"
+                pages = render()
+                assert rendered == [events[1].identifier]
+                assert pages == render(None)
+
+                # as are the events referring to a player whose colour changes
+                ASSASSINS_DATABASE.get(p[2] + " identifier").pseudonyms[0] = "Renamed"
+                pages = render()
+                assert sorted(rendered) == sorted([events[1].identifier, events[2].identifier])
+                assert pages == render(None)
+
+                # and everything when a setting changes
+                set_real_name_brightness(0.5)
+                pages = render()
+                assert len(rendered) == len(events)
+                assert pages == render(None)
+
+                # deleted events are forgotten
+                del EVENTS_DATABASE.events[events[3].identifier]
+                render()
+                assert set(cache.load(("EventRenderer", "news"))) == {e.identifier for e in events[:3]}
+            finally:
+                render_utils.render_event = render_event
+
+    def test_page_template(self):
+        for template in ("", "plain", "{A}", "{{escaped}} {A}{B} and {A}", "{B:>5} {A!r} {C:.2f}", "x{C}y{{"):
+            fields = {"A": "a<b>", "B": 12, "C": 1.5, "D": "unused"}
+            assert PageTemplate(template).format(**fields) == template.format(**fields)
+        days = ["<h3>Monday</h3>", "<h3>Tuesday</h3>"]
+        assert NEWS_TEMPLATE.format(TITLE="Week 1", DAYS=days, YEAR="2024") == \
+               "".join(NEWS_TEMPLATE.chunks(TITLE="Week 1", DAYS=iter(days), YEAR="2024"))
+        assert "<h3>Monday</h3><h3>Tuesday</h3>" in NEWS_TEMPLATE.format(TITLE="Week 1", DAYS=days, YEAR="2024")
+        inner = PageTemplate("<table>{ROWS}</table>")
+        assert PageTemplate("<p>{TABLE}</p>").format(TABLE=inner.chunks(ROWS=["<tr/>", "<tr/>"])) == \
+               "<p><table><tr/><tr/></table></p>"
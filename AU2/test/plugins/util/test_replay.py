@@ -0,0 +1,67 @@
+from typing import List
+
+from AU2.database.EventsDatabase import EVENTS_DATABASE
+from AU2.database.model import Event
+from AU2.plugins.util.render_utils import register_renderer, render_all_events
+from AU2.plugins.util.replay import Replay, replayed, shared_replay
+from AU2.test.test_utils import MockGame, plugin_test, some_players
+
+
+class RecordingManager:
+    def __init__(self):
+        self.events: List[Event] = []
+
+    def add_event(self, e: Event):
+        self.events.append(e)
+
+
+class TestReplay:
+
+    @plugin_test
+    def test_managers_are_shared_and_replayed_once(self):
+        p = some_players(6)
+        MockGame().having_assassins(p).assassin(p[0]).kills(p[1]).then() \
+                  .assassin(p[2]).kills(p[3]).then() \
+                  .assassin(p[4]).kills(p[5])
+        first_event = next(EVENTS_DATABASE.iter_chronological())
+
+        replay = Replay()
+        first = replay.register("recorder", RecordingManager)
+        assert replay.register("recorder", RecordingManager) is first
+        cutoff = replay.register("recorder", RecordingManager, until=first_event.datetime)
+        assert cutoff is not first
+        replay.run()
+        assert len(first.events) == 3
+        assert [e.datetime for e in first.events] == sorted(e.datetime for e in first.events)
+        assert cutoff.events == [first_event]
+
+        # registering after the run catches the new manager up on its own
+        late = replay.register("late", RecordingManager)
+        assert late.events == first.events
+        assert len(first.events) == 3
+
+    @plugin_test
+    def test_shared_replay(self):
+        p = some_players(2)
+        MockGame().having_assassins(p).assassin(p[0]).kills(p[1])
+
+        with shared_replay() as replay:
+            manager = replay.register("recorder", RecordingManager)
+            replay.run()
+            assert replayed("recorder", RecordingManager) is manager
+        assert replayed("recorder", RecordingManager) is not manager
+
+    @plugin_test
+    def test_rendering_in_shared_replay_matches(self):
+        p = some_players(6)
+        MockGame().having_assassins(p).assassin(p[0]).kills(p[1]).then() \
+                  .assassin(p[2]).with_accomplices(p[4]).kills(p[3]).then() \
+                  .assassin(p[5]).kills(p[4])
+
+        expected = render_all_events()
+        with shared_replay() as replay:
+            register_renderer(replay, "news")
+            replay.run()
+            assert render_all_events(replay_key="news") == expected
+            # a renderer that wasn't registered before the replay ran is given its own replay
+            assert render_all_events(replay_key="other") == expected
@@ -0,0 +1,41 @@
+"""
+Compares loading and saving the events and assassins databases through dataclasses_json (`from_dict`/`to_json`)
+against the hand-written codec in AU2.database.model.codec.
+
+Run from the repository root with `python -m benchmarks.codec [number of events]`.
+"""
+import json
+import sys
+import timeit
+
+from AU2.database.AssassinsDatabase import AssassinsDatabase
+from AU2.database.EventsDatabase import EventsDatabase
+from AU2.test.database.test_codec import sample_assassin, sample_event
+
+
+def report(name: str, old, new, repeat: int = 5):
+    t_old = min(timeit.repeat(old, number=1, repeat=repeat))
+    t_new = min(timeit.repeat(new, number=1, repeat=repeat))
+    print(f"{name:<16} dataclasses_json {t_old * 1000:8.1f}ms   codec {t_new * 1000:8.1f}ms   ({t_old / t_new:.1f}x)")
+
+
+def main(n_events: int = 5000):
+    n_assassins = max(n_events // 10, 1)
+    events = EventsDatabase({})
+    for _ in range(n_events):
+        events.add(sample_event())
+    assassins = AssassinsDatabase({})
+    for _ in range(n_assassins):
+        assassins.add(sample_assassin())
+
+    for (db, n) in ((events, n_events), (assassins, n_assassins)):
+        cls = type(db)
+        dump = db.to_json()
+        assert db._dump() == dump
+        print(f"{cls.__name__}: {n} records, {len(dump) // 1024}KiB")
+        report("save", db.to_json, db._dump)
+        report("load", lambda: cls.from_dict(json.loads(dump)), lambda: cls._from_raw(json.loads(dump)))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))